@@ -0,0 +1,216 @@
+"""
+Run the pyus ASGI app in-process, against a throwaway SQLite database.
+
+Settings are read when `pyus` is first imported, so `configure_environment`
+must be called before importing anything from it.
+"""
+
+import contextlib
+import json
+import math
+import os
+import tempfile
+from collections.abc import AsyncIterator, Mapping, Sequence
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Scope
+
+Headers = Sequence[tuple[bytes, bytes]]
+
+
+def configure_environment(workdir: str | None = None) -> str:
+    workdir = workdir or tempfile.mkdtemp(prefix="pyus-bench-")
+    os.environ["PYUS_SQLITE_HOST"] = f"sqlite+aiosqlite:///{workdir}/pyus.db"
+    os.environ["PYUS_SYNC_SQLITE_HOST"] = f"sqlite:///{workdir}/pyus.db"
+    os.environ["PYUS_SHORT_CODE_FILTER_PATH"] = f"{workdir}/pyus.filter"
+    # Everything runs on this host, where the filter is correct
+    os.environ.setdefault("PYUS_SHORT_CODE_FILTER_ENABLED", "true")
+    # Keep request logs out of the results, printed on stdout
+    os.environ.setdefault("PYUS_LOG_LEVEL", "WARNING")
+    return workdir
+
+
+def migrate() -> None:
+    from scripts.db import _upgrade
+
+    _upgrade("head")
+
+
+@contextlib.asynccontextmanager
+async def run_app(
+    *, fake_redis: bool = True, **overrides: Any
+) -> AsyncIterator[ASGIApp]:
+    """
+    Create the app with the given settings overrides and run its lifespan.
+
+    With `fake_redis`, an in-process Redis stand-in replaces the real server.
+    """
+    from pyus import app as app_module
+    from pyus.config import settings
+
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+
+    create_redis = app_module.create_redis
+    if fake_redis:
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+        app_module.create_redis = lambda process_name, **_: fakeredis.FakeAsyncRedis(  # pyright: ignore[reportAttributeAccessIssue]
+            server=server, decode_responses=True
+        )
+
+    try:
+        app = app_module.create_app()
+        async with app.router.lifespan_context(app) as state:
+
+            async def asgi(scope: Scope, receive: Any, send: Any) -> None:
+                scope["state"] = dict(state or {})
+                await app(scope, receive, send)
+
+            yield asgi
+    finally:
+        app_module.create_redis = create_redis
+
+
+async def request(
+    app: ASGIApp,
+    method: str,
+    path: str,
+    *,
+    json_body: Any = None,
+    headers: Headers = (),
+) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+    """Send a single HTTP request straight to the ASGI app, without any network."""
+    body = b"" if json_body is None else json.dumps(json_body).encode()
+    request_headers = [(b"host", b"bench"), *headers]
+    if json_body is not None:
+        request_headers.append((b"content-type", b"application/json"))
+
+    scope: Scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": request_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+    received = False
+
+    async def receive() -> Message:
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    status = 0
+    response_headers: list[tuple[bytes, bytes]] = []
+    chunks: list[bytes] = []
+
+    async def send(message: Message) -> None:
+        nonlocal status, response_headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers = list(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, response_headers, b"".join(chunks)
+
+
+async def create_urls(app: ASGIApp, count: int, batch_size: int = 1000) -> list[str]:
+    short_codes: list[str] = []
+    for start in range(0, count, batch_size):
+        items = [
+            {"original_url": f"https://example.com/{index}"}
+            for index in range(start, min(start + batch_size, count))
+        ]
+        status, _, body = await request(
+            app, "POST", "/api/v1/urls/batch", json_body={"urls": items}
+        )
+        assert status == 200, body
+        short_codes.extend(result["url"]["short_code"] for result in json.loads(body))
+    return short_codes
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Get the `q` percentile of already sorted values, using the nearest rank."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies_ns: Sequence[int]) -> dict[str, float]:
+    """Summarize latencies, in nanoseconds, as milliseconds percentiles."""
+    values = sorted(latencies_ns)
+    summary = {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) / 1e6 if values else 0.0,
+    }
+    for q in (50, 95, 99):
+        summary[f"p{q}_ms"] = percentile(values, q) / 1e6
+    return {key: round(value, 4) for key, value in summary.items()}
+
+
+def compare(
+    results: Mapping[str, Any],
+    baseline: Mapping[str, Any],
+    *,
+    tolerance: float,
+    higher_is_better: Sequence[str] = ("throughput", "ops_per_second"),
+    ignore: Sequence[str] = ("config", "count", "errors"),
+    path: str = "",
+) -> list[str]:
+    """
+    Compare the numbers of two result documents, recursively.
+
+    Keys missing from either side are skipped. A number is a regression when
+    it's worse than its baseline by more than `tolerance`, a ratio: higher for
+    latencies and durations, lower for the keys containing a `higher_is_better`
+    word. The `ignore` keys, like the run configuration, are never compared.
+
+    Returns:
+        A description of every regression found.
+    """
+    regressions: list[str] = []
+    for key, value in results.items():
+        if key not in baseline or key in ignore:
+            continue
+        expected = baseline[key]
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, Mapping) and isinstance(expected, Mapping):
+            regressions.extend(
+                compare(
+                    value,
+                    expected,
+                    tolerance=tolerance,
+                    higher_is_better=higher_is_better,
+                    ignore=ignore,
+                    path=name,
+                )
+            )
+            continue
+        if (
+            isinstance(value, bool)
+            or not isinstance(value, int | float)
+            or not isinstance(expected, int | float)
+            or expected <= 0
+        ):
+            continue
+
+        change = value / expected - 1
+        if any(word in key for word in higher_is_better):
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{name}: {expected} -> {value} ({change:+.1%} worse)")
+    return regressions
@@ -0,0 +1,227 @@
+"""
+Drive a mixed redirect, create and get workload against the app, and report
+its throughput and latency percentiles.
+
+Short codes are picked following a Zipf distribution, so a few of them get most
+of the traffic, like real links do. The workload is generated from a seed and
+replayed identically across runs.
+
+    python -m benchmarks.load --requests 20000 --output results.json
+    python -m benchmarks.load --baseline results.json
+"""
+
+import asyncio
+import bisect
+import itertools
+import json
+import random
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import typer
+
+from benchmarks.harness import (
+    compare,
+    configure_environment,
+    create_urls,
+    migrate,
+    request,
+    run_app,
+    summarize,
+)
+
+cli = typer.Typer()
+
+Operation = tuple[str, int]
+
+EXPECTED_STATUS = {"redirect": 302, "create": 201, "get": 200}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for item in mix.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in EXPECTED_STATUS:
+            raise typer.BadParameter(
+                f"Unknown operation {kind!r}, expected one of "
+                f"{', '.join(EXPECTED_STATUS)}.",
+                param_hint="--mix",
+            )
+        weights[kind] = float(weight)
+    return weights
+
+
+def generate_workload(
+    *, requests: int, urls: int, mix: dict[str, float], zipf_exponent: float, seed: int
+) -> list[Operation]:
+    """Generate `(kind, url index)` operations, the index of a create is unused."""
+    rng = random.Random(seed)
+    kinds = list(mix)
+    kind_weights = list(itertools.accumulate(mix.values()))
+    # Rank r is picked with a probability proportional to 1 / r^s
+    key_weights = list(
+        itertools.accumulate(1 / rank**zipf_exponent for rank in range(1, urls + 1))
+    )
+    return [
+        (
+            rng.choices(kinds, cum_weights=kind_weights)[0],
+            bisect.bisect(key_weights, rng.random() * key_weights[-1]),
+        )
+        for _ in range(requests)
+    ]
+
+
+async def _run(
+    *,
+    workload: list[Operation],
+    warmup: int,
+    concurrency: int,
+    urls: int,
+    fake_redis: bool,
+) -> dict[str, object]:
+    async with run_app(fake_redis=fake_redis) as app:
+        short_codes = await create_urls(app, urls)
+        created = itertools.count()
+
+        async def execute(kind: str, index: int) -> int:
+            if kind == "redirect":
+                path = f"/api/v1/{short_codes[index]}"
+                status, _, _ = await request(app, "GET", path)
+            elif kind == "get":
+                path = f"/api/v1/urls/{short_codes[index]}"
+                status, _, _ = await request(app, "GET", path)
+            else:
+                body = {"original_url": f"https://example.com/new/{next(created)}"}
+                status, _, _ = await request(
+                    app, "POST", "/api/v1/urls/", json_body=body
+                )
+            return status
+
+        latencies: dict[str, list[int]] = {kind: [] for kind in EXPECTED_STATUS}
+        errors: dict[str, int] = dict.fromkeys(EXPECTED_STATUS, 0)
+
+        async def worker(operations: Iterator[Operation], record: bool) -> None:
+            for kind, index in operations:
+                start = time.perf_counter_ns()
+                status = await execute(kind, index)
+                elapsed = time.perf_counter_ns() - start
+                if not record:
+                    continue
+                if status != EXPECTED_STATUS[kind]:
+                    errors[kind] += 1
+                latencies[kind].append(elapsed)
+
+        # Workers share the iterator, so each operation is executed once
+        operations = iter(workload[:warmup])
+        await asyncio.gather(*(worker(operations, False) for _ in range(concurrency)))
+
+        operations = iter(workload[warmup:])
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(operations, True) for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+
+    measured = len(workload) - warmup
+    return {
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(measured / duration, 1),
+        "errors": sum(errors.values()),
+        "latency": summarize(
+            [latency for values in latencies.values() for latency in values]
+        ),
+        "operations": {
+            kind: {
+                "errors": errors[kind],
+                "throughput_rps": round(len(values) / duration, 1),
+                **summarize(values),
+            }
+            for kind, values in latencies.items()
+            if values
+        },
+    }
+
+
+@cli.command()
+def main(
+    requests: int = typer.Option(20_000, help="Number of measured requests"),
+    warmup: int = typer.Option(2_000, help="Number of requests run before measuring"),
+    concurrency: int = typer.Option(32, help="Number of concurrent clients"),
+    urls: int = typer.Option(10_000, help="Number of distinct short codes"),
+    mix: str = typer.Option(
+        "redirect=0.9,get=0.05,create=0.05",
+        help="Weight of every operation, comma-separated",
+    ),
+    zipf_exponent: float = typer.Option(
+        1.1, help="Skew of the short codes popularity, 0 for uniform"
+    ),
+    seed: int = typer.Option(0, help="Seed of the generated workload"),
+    fake_redis: bool = typer.Option(
+        True, help="Use an in-process Redis stand-in instead of PYUS_REDIS_HOST"
+    ),
+    output: Path | None = typer.Option(None, help="Write the JSON results there"),
+    baseline: Path | None = typer.Option(
+        None, help="Compare the results with those of a previous run"
+    ),
+    tolerance: float = typer.Option(
+        0.1, help="Relative difference with the baseline flagged as a regression"
+    ),
+) -> None:
+    weights = parse_mix(mix)
+
+    configure_environment()
+    migrate()
+
+    workload = generate_workload(
+        requests=warmup + requests,
+        urls=urls,
+        mix=weights,
+        zipf_exponent=zipf_exponent,
+        seed=seed,
+    )
+    results: dict[str, object] = {
+        "benchmark": "load",
+        "config": {
+            "requests": requests,
+            "warmup": warmup,
+            "concurrency": concurrency,
+            "urls": urls,
+            "mix": weights,
+            "zipf_exponent": zipf_exponent,
+            "seed": seed,
+            "fake_redis": fake_redis,
+        },
+        **asyncio.run(
+            _run(
+                workload=workload,
+                warmup=warmup,
+                concurrency=concurrency,
+                urls=urls,
+                fake_redis=fake_redis,
+            )
+        ),
+    }
+
+    regressions: list[str] = []
+    if baseline is not None:
+        baseline_results = json.loads(baseline.read_text())
+        if baseline_results.get("config") != results["config"]:
+            typer.echo(
+                "Warning: the baseline was run with a different configuration",
+                err=True,
+            )
+        regressions = compare(results, baseline_results, tolerance=tolerance)
+        results["baseline"] = str(baseline)
+        results["regressions"] = regressions
+
+    payload = json.dumps(results, indent=2)
+    if output is not None:
+        output.write_text(payload)
+    print(payload)
+
+    if regressions:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    cli()
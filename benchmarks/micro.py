@@ -0,0 +1,277 @@
+"""
+Time the CPU-heavy building blocks of a request, each in isolation.
+
+Every case is run in rounds of a calibrated number of iterations, and the best
+and median time per operation are reported, as JSON.
+
+    python -m benchmarks.micro --output micro.json
+    python -m benchmarks.micro --only validate --baseline micro.json
+"""
+
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import typer
+
+from benchmarks.harness import compare, configure_environment, migrate
+
+cli = typer.Typer()
+
+Operation = Callable[[], Any]
+AsyncOperation = Callable[[], Awaitable[Any]]
+
+
+def _report(timings_ns: list[int], iterations: int) -> dict[str, float]:
+    per_op = [timing / iterations for timing in timings_ns]
+    best = min(per_op)
+    return {
+        "iterations": iterations,
+        "best_ns_per_op": round(best, 1),
+        "median_ns_per_op": round(statistics.median(per_op), 1),
+        "ops_per_second": round(1e9 / best, 1),
+    }
+
+
+def run_sync(operation: Operation, *, min_time: float, rounds: int) -> dict[str, float]:
+    def elapsed_for(iterations: int) -> int:
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            operation()
+        return time.perf_counter_ns() - start
+
+    # Double the iterations until a round lasts at least `min_time`
+    iterations = 1
+    while elapsed_for(iterations) < min_time * 1e9:
+        iterations *= 2
+    return _report([elapsed_for(iterations) for _ in range(rounds)], iterations)
+
+
+async def run_async(
+    operation: AsyncOperation, *, min_time: float, rounds: int
+) -> dict[str, float]:
+    async def elapsed_for(iterations: int) -> int:
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            await operation()
+        return time.perf_counter_ns() - start
+
+    iterations = 1
+    while await elapsed_for(iterations) < min_time * 1e9:
+        iterations *= 2
+    return _report([await elapsed_for(iterations) for _ in range(rounds)], iterations)
+
+
+def sync_cases() -> dict[str, Operation]:
+    from pyus.exceptions import ResourceNotFound
+    from pyus.kit.id import Base62ShortCodeStrategy, generate_short_code_with_id
+    from pyus.kit.responses import ORJSONResponse
+    from pyus.kit.utils import utc_now
+    from pyus.models.url import ShortenedUrl
+    from pyus.url_shortening.schemas import ShortenedUrl as ShortenedUrlSchema
+    from pyus.url_shortening.schemas import ShortenedUrlCreate, dump_shortened_url
+
+    url: Any = "https://example.com/some/long/path?with=query"
+    base62 = Base62ShortCodeStrategy(length=7, secret="benchmark")
+    create_payload = {"original_url": url, "expires_at": "2030-01-01T00:00:00Z"}
+    create_json = json.dumps(create_payload)
+    model = ShortenedUrl(
+        id=uuid.uuid4(),
+        created_at=utc_now(),
+        modified_at=None,
+        expires_at=None,
+        original_url=url,
+        short_code="abcdefg",
+    )
+
+    return {
+        "generate_short_code_with_id": lambda: generate_short_code_with_id(
+            url, 123_456_789
+        ),
+        "base62_short_code": lambda: base62.generate(url, 123_456_789),
+        "validate_create": lambda: ShortenedUrlCreate.model_validate(create_payload),
+        "validate_create_json": lambda: ShortenedUrlCreate.model_validate_json(
+            create_json
+        ),
+        "validate_url_from_attributes": lambda: ShortenedUrlSchema.model_validate(
+            model
+        ),
+        "serialize_url_json": lambda: ShortenedUrlSchema.model_validate(
+            model
+        ).model_dump_json(),
+        "serialize_url_orjson": lambda: ORJSONResponse(dump_shortened_url(model)),
+        "error_schema": ResourceNotFound.schema,
+    }
+
+
+async def async_cases(
+    *, min_time: float, rounds: int, only: str | None
+) -> dict[str, dict[str, float]]:
+    import fakeredis
+    from sqlalchemy import select
+
+    from pyus import logging
+    from pyus.kit.id import (
+        SNOWFLAKE_EPOCH_MS,
+        SnowflakeIdGenerator,
+        SQLiteHiLoAllocator,
+        UniqueIdGenerator,
+    )
+    from pyus.models.url import ShortenedUrl
+    from pyus.sqlite import (
+        create_async_engines,
+        create_async_sequence_engine,
+        create_async_sessionmaker,
+        dispose_async_engines,
+    )
+    from pyus.url_shortening.repository import ShortenedUrlRepository
+    from pyus.url_shortening.service import url as url_service
+
+    # Refills are logged at debug level, keep them out of the results
+    logging.configure()
+
+    results: dict[str, dict[str, float]] = {}
+
+    async def run(name: str, operation: AsyncOperation) -> None:
+        if only is None or only in name:
+            results[name] = await run_async(operation, min_time=min_time, rounds=rounds)
+
+    # ID allocation, against an in-process Redis: the cost of our side of a
+    # block reservation, without the network round trip.
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    generator = UniqueIdGenerator(block_size=1000, min_block_size=1000)
+
+    async def refill() -> None:
+        generator._blocks.clear()
+        await generator._refill(redis, generator.block_size)
+
+    async def take() -> None:
+        await generator.take(redis, 1)
+
+    await run("unique_id_generator_refill", refill)
+    await run("unique_id_generator_take", take)
+    await redis.aclose()
+
+    # The Redis-free allocators, for the same block size: a short write
+    # transaction on SQLite, and Snowflake IDs, computed locally
+    hilo = SQLiteHiLoAllocator(lambda: create_async_sequence_engine("script"))
+    snowflake = SnowflakeIdGenerator(node=0, node_bits=20, epoch_ms=SNOWFLAKE_EPOCH_MS)
+
+    async def sqlite_hilo_allocate() -> None:
+        await hilo.allocate(redis, 1000)
+
+    async def snowflake_allocate() -> None:
+        await snowflake.allocate(redis, 1000)
+
+    await run("sqlite_hilo_allocate", sqlite_hilo_allocate)
+    await run("snowflake_allocate", snowflake_allocate)
+    await hilo.close()
+
+    # ORM hydration, compared with fetching the same row as a plain tuple
+    engines = create_async_engines("script")
+    sessionmaker = create_async_sessionmaker(engines)
+    short_code = "bench01"
+    async with sessionmaker() as session:
+        session.add(
+            ShortenedUrl(
+                short_code=short_code,
+                original_url="https://example.com/",
+                original_url_digest=ShortenedUrl.get_original_url_digest(
+                    "https://example.com/"
+                ),
+            )
+        )
+        await session.commit()
+
+        repository = ShortenedUrlRepository.from_session(session)
+        orm_statement = repository.get_base_statement().where(
+            ShortenedUrl.short_code == short_code
+        )
+        core_statement = select(*ShortenedUrl.__table__.columns).where(
+            ShortenedUrl.short_code == short_code
+        )
+
+        async def get_one_or_none() -> None:
+            await repository.get_one_or_none(orm_statement)
+            session.expunge_all()
+
+        async def get_row() -> None:
+            (await session.execute(core_statement)).one_or_none()
+            session.expunge_all()
+
+        # The redirect lookup, through the ORM and with the column projection
+        async def url_service_get() -> None:
+            await url_service.get(session, short_code)
+            session.expunge_all()
+
+        async def url_service_get_redirect_target() -> None:
+            await url_service.get_redirect_target(session, short_code)
+
+        await run("get_one_or_none", get_one_or_none)
+        await run("get_row", get_row)
+        await run("url_service_get", url_service_get)
+        await run("url_service_get_redirect_target", url_service_get_redirect_target)
+    await dispose_async_engines(engines)
+
+    return results
+
+
+@cli.command()
+def main(
+    only: str | None = typer.Option(
+        None, help="Only run the cases whose name contains this"
+    ),
+    min_time: float = typer.Option(0.2, help="Minimum duration of a round, in seconds"),
+    rounds: int = typer.Option(5, help="Number of measured rounds per case"),
+    output: Path | None = typer.Option(None, help="Write the JSON results there"),
+    baseline: Path | None = typer.Option(
+        None, help="Compare the results with those of a previous run"
+    ),
+    tolerance: float = typer.Option(
+        0.1, help="Relative difference with the baseline flagged as a regression"
+    ),
+) -> None:
+    configure_environment()
+    migrate()
+
+    cases: dict[str, dict[str, float]] = {
+        name: run_sync(operation, min_time=min_time, rounds=rounds)
+        for name, operation in sync_cases().items()
+        if only is None or only in name
+    }
+    cases.update(asyncio.run(async_cases(min_time=min_time, rounds=rounds, only=only)))
+
+    results: dict[str, Any] = {
+        "benchmark": "micro",
+        "config": {"min_time": min_time, "rounds": rounds},
+        "cases": cases,
+    }
+
+    regressions: list[str] = []
+    if baseline is not None:
+        regressions = compare(
+            results,
+            json.loads(baseline.read_text()),
+            tolerance=tolerance,
+            # Only compare the best times, medians are too noisy
+            ignore=("config", "iterations", "median_ns_per_op", "ops_per_second"),
+        )
+        results["baseline"] = str(baseline)
+        results["regressions"] = regressions
+
+    payload = json.dumps(results, indent=2)
+    if output is not None:
+        output.write_text(payload)
+    print(payload)
+
+    if regressions:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    cli()
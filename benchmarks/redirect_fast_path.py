@@ -0,0 +1,71 @@
+"""
+Compare the per-request cost of a cached redirect served by the `redirect`
+endpoint and by the raw ASGI fast path.
+
+    python -m benchmarks.redirect_fast_path --requests 20000
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import typer
+
+from benchmarks.harness import (
+    configure_environment,
+    create_urls,
+    migrate,
+    request,
+    run_app,
+)
+
+cli = typer.Typer()
+
+
+async def _measure(*, fast_path: bool, requests: int, urls: int) -> float:
+    async with run_app(REDIRECT_FAST_PATH_ENABLED=fast_path) as app:
+        short_codes = await create_urls(app, urls)
+        paths = [f"/api/v1/{short_code}" for short_code in short_codes]
+
+        # Warm up the redirect cache, so we only measure cached redirects
+        for path in paths:
+            status, _, _ = await request(app, "GET", path)
+            assert status == 302
+
+        start = time.perf_counter_ns()
+        for index in range(requests):
+            await request(app, "GET", paths[index % len(paths)])
+        elapsed = time.perf_counter_ns() - start
+
+    return elapsed / requests / 1000
+
+
+@cli.command()
+def main(
+    requests: int = typer.Option(20_000, help="Number of measured redirects"),
+    urls: int = typer.Option(100, help="Number of distinct short codes"),
+    output: Path | None = typer.Option(None, help="Write the JSON results there"),
+) -> None:
+    configure_environment()
+    migrate()
+
+    endpoint_us = asyncio.run(_measure(fast_path=False, requests=requests, urls=urls))
+    fast_path_us = asyncio.run(_measure(fast_path=True, requests=requests, urls=urls))
+
+    results = {
+        "benchmark": "redirect_fast_path",
+        "requests": requests,
+        "endpoint_us_per_request": round(endpoint_us, 2),
+        "fast_path_us_per_request": round(fast_path_us, 2),
+        "saved_us_per_request": round(endpoint_us - fast_path_us, 2),
+        "speedup": round(endpoint_us / fast_path_us, 2),
+    }
+    payload = json.dumps(results, indent=2)
+    if output is not None:
+        output.write_text(payload)
+    print(payload)
+
+
+if __name__ == "__main__":
+    cli()
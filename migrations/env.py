@@ -7,8 +7,11 @@ from sqlalchemy import pool
 from alembic import context
 
 from pyus.config import settings
+from pyus.sharding import get_shard_dsns
 from pyus.models import Model
 from pyus.models.url import ShortenedUrl
+from pyus.models.url_clicks import ShortenedUrlClicks  # noqa: F401
+from pyus.models.id_sequence import IdSequence  # noqa: F401
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -25,7 +28,12 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = ShortenedUrl.metadata
 
-config.set_main_option("sqlalchemy.url", settings.SQLITE_HOST)
+# `scripts/db.py` passes the shard to migrate, otherwise it's the first one
+config.set_main_option(
+    "sqlalchemy.url",
+    config.attributes.get("sqlalchemy.url")
+    or next(iter(get_shard_dsns(settings.SQLITE_HOST).values())),
+)
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
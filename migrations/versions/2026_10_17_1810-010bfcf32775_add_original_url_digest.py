@@ -0,0 +1,62 @@
+"""add original_url_digest
+
+Revision ID: 010bfcf32775
+Revises: cb0caacbd7bc
+Create Date: 2026-10-17 18:10:12.481337
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010bfcf32775'
+down_revision: Union[str, Sequence[str], None] = 'cb0caacbd7bc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('urls', sa.Column('original_url_digest', sa.LargeBinary(length=16), nullable=True))
+
+    # Backfill the digest of existing rows
+    connection = op.get_bind()
+    urls = sa.table(
+        'urls',
+        sa.column('id', sa.UUID()),
+        sa.column('original_url', sa.String()),
+        sa.column('original_url_digest', sa.LargeBinary()),
+    )
+    # In batches keyed on the ID, so only one batch is ever held in memory
+    last_id = None
+    while True:
+        statement = sa.select(urls.c.id, urls.c.original_url).order_by(urls.c.id)
+        if last_id is not None:
+            statement = statement.where(urls.c.id > last_id)
+        rows = connection.execute(statement.limit(10_000)).all()
+        if not rows:
+            break
+        connection.execute(
+            urls.update()
+            .where(urls.c.id == sa.bindparam('_id'))
+            .values(original_url_digest=sa.bindparam('_digest')),
+            [
+                {'_id': id, '_digest': hashlib.sha256(original_url.encode()).digest()[:16]}
+                for id, original_url in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+    op.drop_index(op.f('ix_urls_original_url'), table_name='urls')
+    op.create_index(op.f('ix_urls_original_url_digest'), 'urls', ['original_url_digest'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_urls_original_url_digest'), table_name='urls')
+    op.create_index(op.f('ix_urls_original_url'), 'urls', ['original_url'], unique=False)
+    op.drop_column('urls', 'original_url_digest')
@@ -0,0 +1,34 @@
+"""add expires_at partial index
+
+Revision ID: 8c3d1e5f9a27
+Revises: 5f2a9c4e7b61
+Create Date: 2026-10-17 20:15:07.562913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3d1e5f9a27'
+down_revision: Union[str, Sequence[str], None] = '5f2a9c4e7b61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_urls_expires_at',
+        'urls',
+        ['expires_at'],
+        unique=False,
+        sqlite_where=sa.text('expires_at IS NOT NULL AND deleted_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_urls_expires_at', table_name='urls')
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Literal
+
+import typer
+
+from pyus.config import settings
+from pyus.redirection.warmup import warm_up
+from pyus.redis import create_redis
+from pyus.sqlite import (
+    create_async_read_engines,
+    create_async_sessionmaker,
+    dispose_async_engines,
+)
+
+cli = typer.Typer()
+
+
+async def _warm(
+    order: Literal["recent", "clicks"],
+    limit: int,
+    batch_size: int,
+    clicks_window: int,
+) -> int:
+    async_engines = create_async_read_engines("script")
+    async_sessionmaker = create_async_sessionmaker(async_engines)
+    redis = create_redis("script")
+    try:
+        async with async_sessionmaker() as session:
+            return await warm_up(
+                session,
+                redis,
+                order=order,
+                limit=limit,
+                batch_size=batch_size,
+                clicks_window=clicks_window,
+            )
+    finally:
+        await redis.close(True)
+        await dispose_async_engines(async_engines)
+
+
+@cli.command()
+def warm(
+    order: str = typer.Option(
+        settings.REDIRECT_CACHE_WARMUP_ORDER,
+        help=(
+            "Cache the most recent URLs first (recent) "
+            "or the most clicked ones (clicks)"
+        ),
+    ),
+    limit: int = typer.Option(
+        settings.REDIRECT_CACHE_WARMUP_LIMIT, help="Maximum number of URLs to cache"
+    ),
+    batch_size: int = typer.Option(
+        settings.REDIRECT_CACHE_WARMUP_BATCH_SIZE, help="Number of URLs per pipeline"
+    ),
+    clicks_window: int = typer.Option(
+        settings.REDIRECT_CACHE_WARMUP_CLICKS_WINDOW,
+        help="With --order clicks, only count clicks over this many seconds",
+    ),
+) -> None:
+    if order == "recent":
+        cached = asyncio.run(_warm("recent", limit, batch_size, clicks_window))
+    elif order == "clicks":
+        cached = asyncio.run(_warm("clicks", limit, batch_size, clicks_window))
+    else:
+        raise typer.BadParameter("must be 'recent' or 'clicks'", param_hint="--order")
+
+    print(f"Cached {cached} URLs")
+
+
+if __name__ == "__main__":
+    cli()
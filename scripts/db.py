@@ -8,6 +8,7 @@ from alembic.config import Config
 from sqlalchemy_utils import create_database, database_exists, drop_database
 
 from pyus.config import settings
+from pyus.sharding import get_shard_dsns
 
 cli = typer.Typer()
 
@@ -16,10 +17,18 @@ def get_sync_sqlite_dsn() -> str:
     return str(settings.SYNC_SQLITE_HOST)
 
 
-def get_config() -> Config:
+def get_sync_sqlite_dsns() -> dict[str, str]:
+    return get_shard_dsns(get_sync_sqlite_dsn())
+
+
+def get_config(shard_id: str | None = None) -> Config:
     config_file = os.path.join(os.path.dirname(__file__), "../alembic.ini")
     config = Config(config_file)
     config.set_main_option("sqlalchemy.url", get_sync_sqlite_dsn())
+    if shard_id is not None:
+        config.attributes["sqlalchemy.url"] = get_shard_dsns(settings.SQLITE_HOST)[
+            shard_id
+        ]
     return config
 
 
@@ -109,17 +118,20 @@ branch head: {branch_head} ({branch_migration_file})
 
 
 def _upgrade(revision: str = "head") -> None:
-    config = get_config()
-    alembic_upgrade(config, revision)
+    # Every shard has the same schema
+    for shard_id in get_sync_sqlite_dsns():
+        alembic_upgrade(get_config(shard_id), revision)
 
 
 def _recreate() -> None:
     assert_dev_or_testing()
 
-    if database_exists(get_sync_sqlite_dsn()):
-        drop_database(get_sync_sqlite_dsn())
+    for dsn in get_sync_sqlite_dsns().values():
+        if database_exists(dsn):
+            drop_database(dsn)
+
+        create_database(dsn)
 
-    create_database(get_sync_sqlite_dsn())
     _upgrade("head")
 
 
@@ -0,0 +1,31 @@
+import secrets
+
+from fastapi import Depends
+from fastapi.security import APIKeyHeader
+
+from pyus.config import settings
+from pyus.exceptions import NotPermitted, ResourceNotFound
+
+ADMIN_TOKEN_HEADER = "X-Pyus-Admin-Token"
+
+admin_token_header = APIKeyHeader(
+    name=ADMIN_TOKEN_HEADER, scheme_name="AdminToken", auto_error=False
+)
+
+
+async def require_admin_token(
+    token: str | None = Depends(admin_token_header),
+) -> None:
+    """
+    Only let through the requests carrying `ADMIN_TOKEN` in their header.
+
+    Without a token configured, the admin API doesn't exist: there's nothing to
+    authenticate against.
+    """
+    if settings.ADMIN_TOKEN is None:
+        raise ResourceNotFound()
+    # As bytes, `compare_digest` refuses non-ASCII strings
+    if token is None or not secrets.compare_digest(
+        token.encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise NotPermitted()
@@ -0,0 +1,135 @@
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from pyus.admin.auth import require_admin_token
+from pyus.admin.schemas import (
+    CacheStats,
+    GroupCommitStats,
+    ProfileSummary,
+    SessionStats,
+    ShortCodeFilterStats,
+)
+from pyus.exceptions import NotPermitted, ResourceNotFound
+from pyus.openapi import APITag
+from pyus.profiling import profile_store
+from pyus.redirection.cache import redirect_cache
+from pyus.sqlite import session_stats
+from pyus.url_shortening.filter import short_code_filter
+from pyus.url_shortening.service import url_create_coalescer
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin", APITag.private],
+    dependencies=[Depends(require_admin_token)],
+    responses={
+        403: {
+            "description": "Missing or wrong admin token.",
+            "model": NotPermitted.schema(),
+        },
+        404: {"description": "Admin API disabled.", "model": ResourceNotFound.schema()},
+    },
+)
+
+
+@router.get("/cache", summary="Get Redirect Cache Stats", response_model=CacheStats)
+async def cache_stats() -> CacheStats:
+    """Get the hit, miss, eviction and load counters of this worker's redirect cache."""
+    return CacheStats(
+        **asdict(redirect_cache.local.stats()),
+        loads=redirect_cache.loads,
+        coalesced_loads=redirect_cache.coalesced_loads,
+        lock_waits=redirect_cache.lock_waits,
+        early_refreshes=redirect_cache.early_refreshes,
+        load_time=redirect_cache.load_time,
+    )
+
+
+@router.get(
+    "/filter",
+    summary="Get Short Code Filter Stats",
+    response_model=ShortCodeFilterStats,
+)
+async def filter_stats() -> ShortCodeFilterStats:
+    """Get the size and estimated false positive rate of the short code filter."""
+    bloom = short_code_filter.bloom
+    if bloom is None:
+        return ShortCodeFilterStats(
+            enabled=False,
+            capacity=short_code_filter.capacity,
+            num_bits=0,
+            num_hashes=0,
+            fill_ratio=0.0,
+            false_positive_rate=1.0,
+        )
+
+    fill_ratio = bloom.fill_ratio()
+    return ShortCodeFilterStats(
+        enabled=True,
+        capacity=bloom.capacity,
+        num_bits=bloom.num_bits,
+        num_hashes=bloom.num_hashes,
+        fill_ratio=fill_ratio,
+        false_positive_rate=fill_ratio**bloom.num_hashes,
+    )
+
+
+@router.get(
+    "/group-commit",
+    summary="Get Group Commit Stats",
+    response_model=GroupCommitStats,
+)
+async def group_commit_stats() -> GroupCommitStats:
+    """Get the batch sizes of this worker's URL creations, and the commits saved."""
+    stats = url_create_coalescer.stats
+    return GroupCommitStats(
+        enabled=url_create_coalescer.running,
+        max_latency=url_create_coalescer.max_latency,
+        max_size=url_create_coalescer.max_size,
+        batches=stats.batches,
+        items=stats.items,
+        failed_batches=stats.failed_batches,
+        commits_saved=stats.commits_saved,
+        max_batch_size=stats.max_batch_size,
+        batch_sizes=stats.batch_sizes,
+    )
+
+
+@router.get(
+    "/sessions", summary="Get Database Session Stats", response_model=SessionStats
+)
+async def sessions_stats() -> SessionStats:
+    """Get how many requests of this worker needed a database session, per route."""
+    return SessionStats.model_validate(session_stats)
+
+
+@router.get(
+    "/profiles",
+    summary="List Request Profiles",
+    response_model=list[ProfileSummary],
+)
+async def list_profiles() -> list[ProfileSummary]:
+    """List the request profiles captured by this worker, most recent first."""
+    return [ProfileSummary.model_validate(profile) for profile in profile_store.all()]
+
+
+@router.get(
+    "/profiles/{id}",
+    summary="Download Request Profile",
+    response_class=PlainTextResponse,
+    responses={
+        200: {"description": "Folded stacks, one per line, with their sample count."},
+        404: {"description": "Profile not found.", "model": ResourceNotFound.schema()},
+    },
+)
+async def get_profile(id: str) -> PlainTextResponse:
+    """Download a request profile in the folded stacks format of flamegraphs."""
+    profile = profile_store.get(id)
+    if profile is None:
+        raise ResourceNotFound()
+
+    return PlainTextResponse(
+        profile.folded,
+        headers={"Content-Disposition": f'attachment; filename="{id}.folded"'},
+    )
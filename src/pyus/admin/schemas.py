@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from pyus.kit.schemas import Schema
+
+
+class CacheStats(Schema):
+    maxsize: int
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    loads: int
+    coalesced_loads: int
+    lock_waits: int
+    early_refreshes: int
+    load_time: float
+
+
+class GroupCommitStats(Schema):
+    enabled: bool
+    max_latency: float
+    max_size: int
+    batches: int
+    items: int
+    failed_batches: int
+    commits_saved: int
+    max_batch_size: int
+    batch_sizes: dict[int, int]
+
+
+class ProfileSummary(Schema):
+    id: str
+    method: str
+    path: str
+    route: str | None
+    status: int
+    started_at: datetime
+    duration: float
+    interval: float
+    samples: int
+
+
+class ShortCodeFilterStats(Schema):
+    enabled: bool
+    capacity: int
+    num_bits: int
+    num_hashes: int
+    fill_ratio: float
+    false_positive_rate: float
+
+
+class RouteSessionStats(Schema):
+    requests: int
+    write_sessions: int
+    read_sessions: int
+
+
+class SessionStats(Schema):
+    total: RouteSessionStats
+    routes: dict[str, RouteSessionStats]
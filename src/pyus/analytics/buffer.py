@@ -0,0 +1,173 @@
+import asyncio
+import contextlib
+import json
+import time
+
+import structlog
+from redis import RedisError
+
+from pyus.config import settings
+from pyus.metrics import clicks_dropped
+from pyus.redis import Redis, redis_circuit_breaker
+
+log = structlog.get_logger()
+
+
+class ClickBuffer:
+    """
+    In-process buffer of redirect clicks, flushed to a Redis stream in batches.
+
+    Clicks are aggregated per time bucket and short code as they're recorded,
+    so recording one is a couple of dictionary operations and a flush writes a
+    single stream entry per bucket, whatever the traffic. The buffer is flushed
+    every `flush_interval` seconds, or as soon as `max_size` clicks are pending.
+
+    While Redis is unavailable, clicks are kept for the next flush, retried
+    with an exponential backoff, up to `max_retry_interval` seconds, and not at
+    all while the Redis circuit breaker is open. Beyond `max_pending` clicks,
+    new ones are dropped.
+
+    Args:
+        enabled: Whether clicks are recorded at all.
+        stream: Key of the Redis stream.
+        maxlen: Approximate maximum length of the stream.
+        bucket_size: Duration of a time bucket, in seconds.
+        flush_interval: Maximum time a click stays in the buffer, in seconds.
+        max_size: Number of pending clicks triggering an early flush.
+        max_pending: Number of pending clicks beyond which new ones are dropped.
+        max_retry_interval: Maximum time between two failing flushes, in seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool,
+        stream: str,
+        maxlen: int,
+        bucket_size: int,
+        flush_interval: float,
+        max_size: int,
+        max_pending: int,
+        max_retry_interval: float,
+    ) -> None:
+        self.enabled = enabled
+        self.stream = stream
+        self.maxlen = maxlen
+        self.bucket_size = bucket_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.max_pending = max_pending
+        self.max_retry_interval = max_retry_interval
+        self._buckets: dict[int, dict[str, int]] = {}
+        self._size = 0
+        # Clicks being flushed, put back if the flush fails
+        self._flushing = 0
+        # Created by `run`, so it's bound to the running event loop
+        self._full: asyncio.Event | None = None
+
+    def record(self, short_code: str) -> None:
+        if not self.enabled:
+            return
+
+        if self._size + self._flushing >= self.max_pending:
+            clicks_dropped.inc()
+            return
+
+        bucket = int(time.time()) // self.bucket_size * self.bucket_size
+        try:
+            counts = self._buckets[bucket]
+        except KeyError:
+            counts = self._buckets[bucket] = {}
+        counts[short_code] = counts.get(short_code, 0) + 1
+
+        self._size += 1
+        # Only when crossing the threshold: after a failed flush, the buffer
+        # stays above it until the next retry
+        if self._size == self.max_size and self._full is not None:
+            self._full.set()
+
+    def __len__(self) -> int:
+        return self._size
+
+    async def flush(self, redis: Redis) -> None:
+        """Write the pending clicks. On failure, they're kept for the next flush."""
+        if not self._buckets:
+            return
+
+        buckets, size = self._buckets, self._size
+        self._buckets, self._size = {}, 0
+        self._flushing = size
+
+        pipe = redis.pipeline(transaction=False)
+        for bucket, counts in buckets.items():
+            pipe.xadd(
+                self.stream,
+                {"bucket": str(bucket), "clicks": json.dumps(counts)},
+                maxlen=self.maxlen,
+                approximate=True,
+            )
+        try:
+            await pipe.execute()
+        except RedisError:
+            for bucket, counts in buckets.items():
+                pending = self._buckets.setdefault(bucket, {})
+                for short_code, count in counts.items():
+                    pending[short_code] = pending.get(short_code, 0) + count
+            self._size += size
+            raise
+        finally:
+            self._flushing = 0
+
+    async def run(self, redis: Redis) -> None:
+        """Flush the buffer periodically, until cancelled. Flushes a last time then."""
+        self._full = full = asyncio.Event()
+        failures = 0
+        try:
+            while True:
+                if failures:
+                    await asyncio.sleep(
+                        min(
+                            self.flush_interval * 2 ** min(failures, 16),
+                            self.max_retry_interval,
+                        )
+                    )
+                else:
+                    with contextlib.suppress(TimeoutError):
+                        await asyncio.wait_for(full.wait(), self.flush_interval)
+                full.clear()
+
+                # No point in a round trip bound to fail
+                if redis_circuit_breaker.is_open:
+                    continue
+
+                try:
+                    await self.flush(redis)
+                except RedisError as e:
+                    # Once per outage, not once per retry
+                    if not failures:
+                        log.warning(
+                            "click_buffer.flush.error", error=str(e), clicks=len(self)
+                        )
+                    failures += 1
+                else:
+                    if failures:
+                        log.info("click_buffer.flush.recovered", failures=failures)
+                    failures = 0
+        finally:
+            self._full = None
+            try:
+                await self.flush(redis)
+            except RedisError as e:
+                log.warning("click_buffer.flush.error", error=str(e), clicks=len(self))
+
+
+click_buffer = ClickBuffer(
+    enabled=settings.CLICK_ANALYTICS_ENABLED,
+    stream=settings.CLICK_STREAM_KEY,
+    maxlen=settings.CLICK_STREAM_MAXLEN,
+    bucket_size=settings.CLICK_BUCKET_SIZE,
+    flush_interval=settings.CLICK_BUFFER_FLUSH_INTERVAL,
+    max_size=settings.CLICK_BUFFER_MAX_SIZE,
+    max_pending=settings.CLICK_BUFFER_MAX_PENDING,
+    max_retry_interval=settings.CLICK_BUFFER_MAX_RETRY_INTERVAL,
+)
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import socket
+from collections import Counter
+from datetime import UTC, datetime
+
+import structlog
+from redis import RedisError, ResponseError
+from sqlalchemy.exc import SQLAlchemyError
+
+from pyus.analytics.service import clicks as clicks_service
+from pyus.config import settings
+from pyus.kit.db.sqlite import AsyncSessionMaker
+from pyus.redis import Redis
+
+log = structlog.get_logger()
+
+StreamEntry = tuple[str, dict[str, str]]
+
+
+class ClickRollupConsumer:
+    """
+    Consume the click stream and add its counts to the rollup table.
+
+    Every batch read from the stream is aggregated in memory and written with a
+    single upsert statement, then acknowledged and deleted from the stream.
+    Delivery is at-least-once: a batch committed but not yet acknowledged when
+    the worker dies is counted again.
+
+    Entries left pending by a consumer that died are claimed after `claim_idle`
+    milliseconds.
+
+    Redis and database errors don't stop the consumer: they're logged, and the
+    pending entries, the failed batch included, are read again after a backoff
+    doubling from `retry_interval` up to `max_retry_interval` seconds.
+
+    Args:
+        stream: Key of the Redis stream.
+        group: Name of the consumer group.
+        consumer: Name of this consumer in the group.
+        batch_size: Maximum number of stream entries per batch.
+        block: How long to wait for new entries, in milliseconds.
+        claim_idle: Idle time after which pending entries are claimed, in milliseconds.
+        retry_interval: Time before the first retry after an error, in seconds.
+        max_retry_interval: Maximum time between two retries, in seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        stream: str,
+        group: str,
+        consumer: str,
+        batch_size: int,
+        block: int,
+        claim_idle: int,
+        retry_interval: float,
+        max_retry_interval: float,
+    ) -> None:
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.block = block
+        self.claim_idle = claim_idle
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+
+    async def create_group(self, redis: Redis) -> None:
+        try:
+            await redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def claim(self, redis: Redis) -> None:
+        start_id = "0-0"
+        while True:
+            response = await redis.xautoclaim(
+                self.stream,
+                self.group,
+                self.consumer,
+                self.claim_idle,
+                start_id=start_id,
+                count=self.batch_size,
+                justid=True,
+            )
+            # The reply starts with the cursor of the next call, 0-0 once done
+            if not response or response[0] == "0-0":
+                return
+            start_id = response[0]
+
+    async def run(self, redis: Redis, sessionmaker: AsyncSessionMaker) -> None:
+        """Consume the stream until cancelled."""
+        ready = False
+        last_id = "0"
+        failures = 0
+        while True:
+            try:
+                if not ready:
+                    await self.create_group(redis)
+                    # Take over entries abandoned by dead consumers, then our
+                    # own pending ones
+                    await self.claim(redis)
+                    ready = True
+
+                response = await redis.xreadgroup(
+                    self.group,
+                    self.consumer,
+                    {self.stream: last_id},
+                    count=self.batch_size,
+                    block=self.block if last_id == ">" else None,
+                )
+                entries: list[StreamEntry] = response[0][1] if response else []
+                if entries:
+                    await self.process(redis, sessionmaker, entries)
+                else:
+                    last_id = ">"
+            except (RedisError, SQLAlchemyError) as e:
+                failures += 1
+                log.warning("click_rollup.error", error=str(e), failures=failures)
+                # Read our pending entries again, the failed batch among them
+                last_id = "0"
+                await asyncio.sleep(
+                    min(
+                        self.retry_interval * 2 ** min(failures - 1, 16),
+                        self.max_retry_interval,
+                    )
+                )
+            else:
+                if failures:
+                    log.info("click_rollup.recovered", failures=failures)
+                failures = 0
+
+    async def process(
+        self,
+        redis: Redis,
+        sessionmaker: AsyncSessionMaker,
+        entries: list[StreamEntry],
+    ) -> None:
+        clicks: Counter[tuple[str, datetime]] = Counter()
+        for _, fields in entries:
+            # Claimed entries may have been deleted in the meantime
+            if not fields:
+                continue
+            bucket = datetime.fromtimestamp(int(fields["bucket"]), UTC)
+            for short_code, count in json.loads(fields["clicks"]).items():
+                clicks[short_code, bucket] += count
+
+        async with sessionmaker() as session:
+            await clicks_service.rollup(session, clicks)
+            await session.commit()
+
+        ids = [id for id, _ in entries]
+        pipe = redis.pipeline(transaction=True)
+        pipe.xack(self.stream, self.group, *ids)
+        pipe.xdel(self.stream, *ids)
+        await pipe.execute()
+
+        log.debug(
+            "click_rollup.processed",
+            entries=len(entries),
+            rows=len(clicks),
+            clicks=clicks.total(),
+        )
+
+
+click_rollup_consumer = ClickRollupConsumer(
+    stream=settings.CLICK_STREAM_KEY,
+    group=settings.CLICK_ROLLUP_GROUP,
+    consumer=settings.CLICK_ROLLUP_CONSUMER or socket.gethostname(),
+    batch_size=settings.CLICK_ROLLUP_BATCH_SIZE,
+    block=settings.CLICK_ROLLUP_BLOCK,
+    claim_idle=settings.CLICK_ROLLUP_CLAIM_IDLE,
+    retry_interval=settings.CLICK_ROLLUP_RETRY_INTERVAL,
+    max_retry_interval=settings.CLICK_ROLLUP_MAX_RETRY_INTERVAL,
+)
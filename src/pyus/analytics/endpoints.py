@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+
+from pyus.analytics.schemas import ShortenedUrlStats
+from pyus.analytics.service import clicks as clicks_service
+from pyus.config import settings
+from pyus.exceptions import ResourceNotFound
+from pyus.kit.db.sqlite import AsyncReadSession
+from pyus.openapi import APITag
+from pyus.sqlite import get_db_read_session
+from pyus.url_shortening.endpoints import UrlNotFound
+from pyus.url_shortening.filter import short_code_filter
+from pyus.url_shortening.service import url as url_service
+
+router = APIRouter(prefix="/urls", tags=["urls", APITag.public])
+
+
+@router.get(
+    "/{short_code}/stats",
+    summary="Get Shortened URL Stats",
+    response_model=ShortenedUrlStats,
+    responses={404: UrlNotFound},
+)
+async def stats(
+    short_code: str,
+    start: datetime | None = Query(
+        None, description="Only count clicks from this date, inclusive."
+    ),
+    end: datetime | None = Query(
+        None, description="Only count clicks until this date, exclusive."
+    ),
+    session: AsyncReadSession = Depends(get_db_read_session),
+) -> ShortenedUrlStats:
+    """
+    Get the number of redirects served for a Shortened URL, per time bucket.
+
+    Clicks are aggregated in the background, they show up here after a short delay.
+    """
+    if short_code not in short_code_filter:
+        raise ResourceNotFound()
+
+    url = await url_service.get(session, short_code)
+
+    if url is None:
+        raise ResourceNotFound()
+
+    buckets = await clicks_service.get_all(session, short_code, start=start, end=end)
+
+    return ShortenedUrlStats.model_validate(
+        {
+            "short_code": short_code,
+            "bucket_size": settings.CLICK_BUCKET_SIZE,
+            "total_clicks": sum(bucket.clicks for bucket in buckets),
+            "buckets": buckets,
+        }
+    )
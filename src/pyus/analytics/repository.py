@@ -0,0 +1,54 @@
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert
+
+from pyus.kit.repository.base import RepositoryBase
+from pyus.models.url_clicks import ShortenedUrlClicks
+from pyus.sharding import group_by_shard, route
+
+
+class ShortenedUrlClicksRepository(RepositoryBase[ShortenedUrlClicks]):
+    model = ShortenedUrlClicks
+
+    async def get_all_by_short_code(
+        self,
+        short_code: str,
+        *,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> Sequence[ShortenedUrlClicks]:
+        statement = (
+            self.get_base_statement()
+            .where(ShortenedUrlClicks.short_code == short_code)
+            .order_by(ShortenedUrlClicks.bucket)
+        )
+        if start is not None:
+            statement = statement.where(ShortenedUrlClicks.bucket >= start)
+        if end is not None:
+            statement = statement.where(ShortenedUrlClicks.bucket < end)
+        return await self.get_all(route(statement, short_code))
+
+    async def increment_many(self, clicks: Mapping[tuple[str, datetime], int]) -> None:
+        """Add clicks to their rollup rows, in one statement, creating missing ones."""
+        if not clicks:
+            return
+
+        table = ShortenedUrlClicks.__table__
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.short_code, table.c.bucket],
+            set_={"clicks": table.c.clicks + statement.excluded.clicks},
+        )
+        values = [
+            {"short_code": short_code, "bucket": bucket, "clicks": count}
+            for (short_code, bucket), count in clicks.items()
+        ]
+        for shard_id, shard_values in group_by_shard(
+            values, lambda value: value["short_code"]
+        ).items():
+            await self.session.execute(
+                statement,
+                shard_values,
+                bind_arguments={"shard_id": shard_id} if shard_id is not None else None,
+            )
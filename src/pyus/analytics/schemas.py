@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from pydantic import Field
+
+from pyus.kit.schemas import Schema
+
+
+class ShortenedUrlClicks(Schema):
+    bucket: datetime = Field(description="Start of the time bucket.")
+    clicks: int = Field(description="Number of redirects served in the bucket.")
+
+
+class ShortenedUrlStats(Schema):
+    short_code: str = Field(description="Short code of the URL.")
+    bucket_size: int = Field(description="Duration of a time bucket, in seconds.")
+    total_clicks: int = Field(description="Number of redirects served in the range.")
+    buckets: list[ShortenedUrlClicks] = Field(
+        description="Redirects served per time bucket, oldest first."
+    )
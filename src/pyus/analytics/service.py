@@ -0,0 +1,28 @@
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+
+from pyus.analytics.repository import ShortenedUrlClicksRepository
+from pyus.kit.db.sqlite import AsyncReadSession, AsyncSession
+from pyus.models.url_clicks import ShortenedUrlClicks
+
+
+class ShortenedUrlClicksService:
+    async def get_all(
+        self,
+        session: AsyncReadSession,
+        short_code: str,
+        *,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> Sequence[ShortenedUrlClicks]:
+        repository = ShortenedUrlClicksRepository.from_session(session)
+        return await repository.get_all_by_short_code(short_code, start=start, end=end)
+
+    async def rollup(
+        self, session: AsyncSession, clicks: Mapping[tuple[str, datetime], int]
+    ) -> None:
+        repository = ShortenedUrlClicksRepository.from_session(session)
+        await repository.increment_many(clicks)
+
+
+clicks = ShortenedUrlClicksService()
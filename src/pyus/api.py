@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 
+from pyus.admin.endpoints import router as admin_router
+from pyus.analytics.endpoints import router as analytics_router
 from pyus.redirection.endpoints import router as redirection_router
 from pyus.url_shortening.endpoints import router as url_router
 
@@ -10,3 +12,7 @@ router.include_router(redirection_router)
 
 # /urls
 router.include_router(url_router)
+router.include_router(analytics_router)
+
+# /admin
+router.include_router(admin_router)
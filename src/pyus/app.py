@@ -1,56 +1,149 @@
+import asyncio
 import contextlib
 from typing import AsyncIterator, TypedDict
 
+import structlog
 from fastapi import FastAPI
 
+from pyus import logging
+from pyus.analytics.buffer import click_buffer
 from pyus.api import router
-from pyus.kit.db.sqlite import AsyncEngine, AsyncSessionMaker, create_async_sessionmaker
-from pyus.redis import Redis, create_redis
-from pyus.sqlite import AsyncSessionMiddleware, create_async_engine
+from pyus.config import settings
+from pyus.exception_handlers import add_exception_handlers
+from pyus.kit.db.sqlite import AsyncEngine, AsyncSessionMaker
+from pyus.kit.id import unique_id_generator
+from pyus.kit.rate_limit import TokenBucketLimiter
+from pyus.metrics import MetricsMiddleware
+from pyus.metrics import router as metrics_router
+from pyus.profiling import ProfilingMiddleware
+from pyus.rate_limit import RateLimitMiddleware, get_rules
+from pyus.redirection.cache import redirect_cache
+from pyus.redirection.fast_path import RedirectFastPathMiddleware
+from pyus.redirection.warmup import warm_up_on_startup
+from pyus.redis import Redis, create_redis, redis_circuit_breaker
+from pyus.sqlite import (
+    AsyncSessionMiddleware,
+    create_async_engines,
+    create_async_read_engines,
+    create_async_sessionmaker,
+    dispose_async_engines,
+)
+from pyus.url_shortening.filter import short_code_filter
+from pyus.url_shortening.service import url as url_service
+
+log = structlog.get_logger()
 
 
 class State(TypedDict):
-    async_engine: AsyncEngine
+    async_engines: dict[str, AsyncEngine]
     async_sessionmaker: AsyncSessionMaker
-    async_read_engine: AsyncEngine
+    async_read_engines: dict[str, AsyncEngine]
     async_read_sessionmaker: AsyncSessionMaker
 
     redis: Redis
+    rate_limit_redis: Redis
 
 
 @contextlib.asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[State]:
-    print("Starting pyus API")
+    log.info("api.starting")
 
-    async_engine = async_read_engine = create_async_engine("app")
-    async_sessionmaker = async_read_sessionmaker = create_async_sessionmaker(
-        async_engine
-    )
+    async_engines = create_async_engines("app")
+    async_sessionmaker = create_async_sessionmaker(async_engines)
+    async_read_engines = create_async_read_engines("app")
+    async_read_sessionmaker = create_async_sessionmaker(async_read_engines)
+
+    async with async_read_sessionmaker() as session:
+        await short_code_filter.open(url_service.stream_short_codes(session))
 
-    redis = create_redis("app")
+    circuit_breaker = (
+        redis_circuit_breaker if settings.REDIS_CIRCUIT_BREAKER_ENABLED else None
+    )
+    redis = create_redis("app", circuit_breaker=circuit_breaker)
+    # A pool of its own, so rate limiting doesn't wait behind the app's traffic
+    rate_limit_redis = create_redis("rate-limit", circuit_breaker=circuit_breaker)
+    redirect_cache_listener = asyncio.create_task(redirect_cache.listen(redis))
+    click_buffer_flusher = asyncio.create_task(click_buffer.run(redis))
+    background_tasks = [redirect_cache_listener, click_buffer_flusher]
+    # Without the breaker, or the probe would never reach Redis while it's open
+    probe_redis = create_redis("app")
+    if circuit_breaker is not None:
+        background_tasks.append(
+            asyncio.create_task(circuit_breaker.run_probe(probe_redis.ping))
+        )
+    if settings.REDIRECT_CACHE_WARMUP_ON_STARTUP:
+        background_tasks.append(
+            asyncio.create_task(warm_up_on_startup(async_read_sessionmaker, redis))
+        )
+    if settings.URL_GROUP_COMMIT_ENABLED:
+        background_tasks.append(
+            asyncio.create_task(url_service.run_group_commit(async_sessionmaker, redis))
+        )
 
     yield {
-        "async_engine": async_engine,
+        "async_engines": async_engines,
         "async_sessionmaker": async_sessionmaker,
-        "async_read_engine": async_read_engine,
+        "async_read_engines": async_read_engines,
         "async_read_sessionmaker": async_read_sessionmaker,
         "redis": redis,
+        "rate_limit_redis": rate_limit_redis,
     }
 
+    for task in background_tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    short_code_filter.close()
+    await unique_id_generator.close()
+
     await redis.close(True)
-    await async_engine.dispose()
-    if async_read_engine is not async_engine:
-        await async_read_engine.dispose()
+    await rate_limit_redis.close(True)
+    await probe_redis.close(True)
+    await dispose_async_engines(async_engines)
+    await dispose_async_engines(async_read_engines)
 
-    print("pyus API stopped")
+    log.info("api.stopped")
 
 
 def create_app() -> FastAPI:
+    logging.configure()
+
     app = FastAPI(lifespan=lifespan)
 
     app.add_middleware(AsyncSessionMiddleware)
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+    if settings.REDIRECT_FAST_PATH_ENABLED:
+        app.add_middleware(RedirectFastPathMiddleware, prefix=f"{router.prefix}/")
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(
+            RateLimitMiddleware,
+            rules=get_rules(
+                settings.RATE_LIMITS_PER_IP, settings.RATE_LIMITS_PER_API_KEY
+            ),
+            api_key_header=settings.RATE_LIMIT_API_KEY_HEADER,
+            limiter=TokenBucketLimiter(
+                lease_size=settings.RATE_LIMIT_LEASE_SIZE,
+                lease_ttl=settings.RATE_LIMIT_LEASE_TTL,
+                max_keys=settings.RATE_LIMIT_MAX_KEYS,
+            ),
+        )
+    app.add_middleware(logging.LogContextMiddleware)
+    # Outermost, so fast path redirects can be profiled too
+    if settings.PROFILER_TOKEN is not None or settings.PROFILER_SAMPLE_RATE > 0:
+        app.add_middleware(
+            ProfilingMiddleware,
+            token=settings.PROFILER_TOKEN,
+            sample_rate=settings.PROFILER_SAMPLE_RATE,
+            interval=settings.PROFILER_INTERVAL,
+        )
+
+    add_exception_handlers(app)
 
     app.include_router(router)
+    if settings.METRICS_ENABLED:
+        app.include_router(metrics_router)
 
     return app
 
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 env_file = ".env"
@@ -10,11 +12,127 @@ class Settings(BaseSettings):
     SQLITE_DATABASE: str = "pyus"
     SYNC_SQLITE_HOST: str = f"sqlite:///{SQLITE_DATABASE}.db"
     SQLITE_HOST: str = f"sqlite+aiosqlite:///{SQLITE_DATABASE}.db"
+    SQLITE_ECHO: bool = False
+    SQLITE_POOL_SIZE: int = 5
+    SQLITE_READ_POOL_SIZE: int = 10
+    SQLITE_JOURNAL_MODE: str = "wal"
+    SQLITE_SYNCHRONOUS: str = "normal"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64 * 1024
+    SQLITE_BUSY_TIMEOUT: int = 5000
+    SQLITE_SHARDS: int = 1
 
     # Redis
     REDIS_HOST: str = "127.0.0.1"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_CIRCUIT_BREAKER_ENABLED: bool = True
+    REDIS_CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    REDIS_CIRCUIT_BREAKER_PROBE_INTERVAL: float = 1.0
+    REDIS_CIRCUIT_BREAKER_PROBE_TIMEOUT: float = 1.0
+
+    # Redirect cache
+    REDIRECT_CACHE_SIZE: int = 10_000
+    REDIRECT_CACHE_TTL: float = 60.0
+    REDIRECT_CACHE_REDIS_TTL: int = 3600
+    REDIRECT_CACHE_INVALIDATION_CHANNEL: str = "pyus:redirect:invalidate"
+    REDIRECT_CACHE_LOCK_TIMEOUT: float | None = None
+    REDIRECT_CACHE_LOCK_WAIT: float = 1.0
+    REDIRECT_CACHE_LOCK_POLL_INTERVAL: float = 0.02
+    REDIRECT_CACHE_EARLY_REFRESH_BETA: float = 1.0
+    REDIRECT_FAST_PATH_ENABLED: bool = False
+    REDIRECT_CACHE_WARMUP_ON_STARTUP: bool = False
+    REDIRECT_CACHE_WARMUP_ORDER: Literal["recent", "clicks"] = "recent"
+    REDIRECT_CACHE_WARMUP_LIMIT: int = 100_000
+    REDIRECT_CACHE_WARMUP_BATCH_SIZE: int = 1000
+    REDIRECT_CACHE_WARMUP_CLICKS_WINDOW: int = 7 * 24 * 3600
+    REDIRECT_CACHE_WARMUP_LOCK_TTL: int = 300
+
+    # ID allocation
+    ID_ALLOCATOR: Literal["redis", "sqlite", "snowflake"] = "redis"
+    ID_SQLITE_SEQUENCE_START: int = 0
+    ID_SNOWFLAKE_NODE: int | None = None
+    ID_BLOCK_SIZE: int = 1000
+    ID_BLOCK_MIN_SIZE: int = 100
+    ID_BLOCK_MAX_SIZE: int = 100_000
+    ID_BLOCK_LOW_WATER_RATIO: float = 0.25
+    ID_BLOCK_TARGET_DURATION: float = 10.0
+    ID_LOCAL_FALLBACK_ENABLED: bool = True
+
+    # Short codes
+    SHORT_CODE_STRATEGY: Literal["hash", "base62"] = "hash"
+    SHORT_CODE_LENGTH: int = 7
+    SHORT_CODE_SECRET: str | None = None
+    SHORT_CODE_MAX_ATTEMPTS: int = 5
+
+    # URL shortening
+    URL_BATCH_MAX_SIZE: int = 10_000
+    # Concurrent creates of a URL only share one short code within a worker,
+    # across workers deduplication is best-effort
+    URL_DEDUP_ENABLED: bool = False
+    URL_DEDUP_CACHE_TTL: int = 3600
+    URL_GROUP_COMMIT_ENABLED: bool = False
+    URL_GROUP_COMMIT_MAX_LATENCY: float = 0.005
+    URL_GROUP_COMMIT_MAX_SIZE: int = 500
+
+    # Short code filter, only correct if all the workers run on a single host
+    SHORT_CODE_FILTER_ENABLED: bool = False
+    SHORT_CODE_FILTER_PATH: str | None = f"{SQLITE_DATABASE}.filter"
+    SHORT_CODE_FILTER_CAPACITY: int = 10_000_000
+    SHORT_CODE_FILTER_ERROR_RATE: float = 0.001
+
+    # Rate limiting
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMITS_PER_IP: dict[str, tuple[float, int]] = {
+        "POST /api/v1/urls/": (1.0, 20),
+        "POST /api/v1/urls/batch": (0.1, 5),
+    }
+    RATE_LIMITS_PER_API_KEY: dict[str, tuple[float, int]] = {}
+    RATE_LIMIT_API_KEY_HEADER: str = "X-API-Key"
+    RATE_LIMIT_LEASE_SIZE: int = 5
+    RATE_LIMIT_LEASE_TTL: float = 1.0
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["console", "json"] = "console"
+    LOG_QUEUE_SIZE: int = 10_000
+    LOG_SAMPLE_RATES: dict[str, float] = {}
+
+    # Metrics
+    METRICS_ENABLED: bool = True
+
+    # Admin API, disabled unless a token is set
+    ADMIN_TOKEN: str | None = None
+
+    # Profiling
+    PROFILER_TOKEN: str | None = None
+    PROFILER_SAMPLE_RATE: float = 0.0
+    PROFILER_INTERVAL: float = 0.001
+    PROFILER_MAX_PROFILES: int = 100
+
+    # Expired URL sweep
+    EXPIRED_URL_SWEEP_INTERVAL: float = 60.0
+    EXPIRED_URL_SWEEP_GRACE_PERIOD: int = 86_400
+    EXPIRED_URL_SWEEP_CHUNK_SIZE: int = 500
+    EXPIRED_URL_SWEEP_CHUNK_PAUSE: float = 0.05
+
+    # Click analytics
+    CLICK_ANALYTICS_ENABLED: bool = True
+    CLICK_BUCKET_SIZE: int = 3600
+    CLICK_BUFFER_FLUSH_INTERVAL: float = 1.0
+    CLICK_BUFFER_MAX_SIZE: int = 10_000
+    CLICK_BUFFER_MAX_PENDING: int = 1_000_000
+    CLICK_BUFFER_MAX_RETRY_INTERVAL: float = 30.0
+    CLICK_STREAM_KEY: str = "pyus:clicks"
+    CLICK_STREAM_MAXLEN: int = 100_000
+    CLICK_ROLLUP_GROUP: str = "pyus:clicks:rollup"
+    CLICK_ROLLUP_CONSUMER: str | None = None
+    CLICK_ROLLUP_BATCH_SIZE: int = 1000
+    CLICK_ROLLUP_BLOCK: int = 5000
+    CLICK_ROLLUP_CLAIM_IDLE: int = 60_000
+    CLICK_ROLLUP_RETRY_INTERVAL: float = 1.0
+    CLICK_ROLLUP_MAX_RETRY_INTERVAL: float = 30.0
 
     model_config = SettingsConfigDict(
         env_prefix="pyus_",
@@ -0,0 +1,16 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from pyus.exceptions import PyusError
+
+
+async def pyus_exception_handler(request: Request, exc: PyusError) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": type(exc).__name__, "detail": exc.message},
+        headers=exc.headers,
+    )
+
+
+def add_exception_handlers(app: FastAPI) -> None:
+    app.add_exception_handler(PyusError, pyus_exception_handler)  # pyright: ignore[reportArgumentType]
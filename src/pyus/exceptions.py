@@ -45,6 +45,11 @@ class InternalServerError(PyusError):
         super().__init__(message, status_code)
 
 
+class NotPermitted(PyusError):
+    def __init__(self, message: str = "Not permitted", status_code: int = 403) -> None:
+        super().__init__(message, status_code)
+
+
 class ResourceNotFound(PyusError):
     def __init__(self, message: str = "Not found", status_code: int = 404) -> None:
         super().__init__(message, status_code)
@@ -53,3 +58,13 @@ class ResourceNotFound(PyusError):
 class ResourceExpired(PyusError):
     def __init__(self, message: str = "Expired", status_code: int = 410) -> None:
         super().__init__(message, status_code)
+
+
+class RateLimitExceeded(PyusError):
+    def __init__(
+        self,
+        retry_after: int,
+        message: str = "Rate limit exceeded",
+        status_code: int = 429,
+    ) -> None:
+        super().__init__(message, status_code, {"Retry-After": str(retry_after)})
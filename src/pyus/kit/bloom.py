@@ -0,0 +1,153 @@
+import contextlib
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+from collections.abc import Iterable, Iterator
+
+_MAGIC = b"pyusblm1"
+_HEADER = struct.Struct("<8sQI")
+
+
+class BloomFilter:
+    """
+    A Bloom filter stored in a memory-mapped file.
+
+    When `path` is given, every process mapping the same file shares the same
+    bits: additions made by one process are immediately visible to the others.
+    Writes are serialized with an exclusive `flock` so concurrent additions
+    never lose bits. Reads are lock-free, since bits only ever go from 0 to 1.
+    A file built with different parameters is only reset when no other
+    process has it open, as truncating it under them would crash them;
+    otherwise opening it fails. Every filter holds a shared `flock` on the
+    `{path}.lock` file while it has the file open, so a reset can tell.
+
+    Sharing only works between processes of the same host: on another one, the
+    file is a different filter, missing the keys added here.
+
+    Without `path`, the filter lives in anonymous memory and is private to the
+    current process.
+
+    Args:
+        capacity: Expected number of items.
+        error_rate: Target false positive rate at `capacity` items.
+        path: Path of the backing file.
+    """
+
+    def __init__(
+        self, capacity: int, error_rate: float, path: str | None = None
+    ) -> None:
+        num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_bytes = max(math.ceil(num_bits / 8), 1)
+        self.num_bits = self.num_bytes * 8
+        self.num_hashes = max(round(self.num_bits / capacity * math.log(2)), 1)
+        self.capacity = capacity
+        self.path = path
+
+        size = _HEADER.size + self.num_bytes
+        header = _HEADER.pack(_MAGIC, self.num_bits, self.num_hashes)
+
+        self._fd: int | None = None
+        self._in_use_fd: int | None = None
+        if path is None:
+            self._mm = mmap.mmap(-1, size)
+            self._mm[: _HEADER.size] = header
+            return
+
+        self._in_use_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._in_use_fd, fcntl.LOCK_SH)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with self._lock():
+                if os.fstat(self._fd).st_size == 0:
+                    # Just created: it's only mapped once initialized
+                    self._reset(header, size)
+                elif os.pread(self._fd, _HEADER.size, 0) != header:
+                    self._reset_unused(header, size)
+        except BaseException:
+            self._close_fds()
+            raise
+        self._mm = mmap.mmap(self._fd, size)
+
+    def _reset(self, header: bytes, size: int) -> None:
+        assert self._fd is not None
+        os.ftruncate(self._fd, 0)
+        os.ftruncate(self._fd, size)
+        os.pwrite(self._fd, header, 0)
+
+    def _reset_unused(self, header: bytes, size: int) -> None:
+        assert self._in_use_fd is not None
+        try:
+            fcntl.flock(self._in_use_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError(
+                f"The Bloom filter {self.path} is in use with other parameters"
+            ) from None
+        try:
+            self._reset(header, size)
+        finally:
+            fcntl.flock(self._in_use_fd, fcntl.LOCK_SH)
+
+    def _close_fds(self) -> None:
+        for fd in (self._fd, self._in_use_fd):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._in_use_fd = None
+
+    @contextlib.contextmanager
+    def _lock(self) -> Iterator[None]:
+        if self._fd is None:
+            yield
+            return
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        self.update((key,))
+
+    def update(self, keys: Iterable[str]) -> None:
+        positions = [position for key in keys for position in self._positions(key)]
+        with self._lock():
+            for position in positions:
+                self._mm[_HEADER.size + (position >> 3)] |= 1 << (position & 7)
+
+    def merge(self, other: "BloomFilter") -> None:
+        if (other.num_bits, other.num_hashes) != (self.num_bits, self.num_hashes):
+            raise ValueError("Cannot merge Bloom filters with different parameters")
+
+        other_bits = int.from_bytes(other._mm[_HEADER.size :], "little")
+        with self._lock():
+            bits = int.from_bytes(self._mm[_HEADER.size :], "little") | other_bits
+            self._mm[_HEADER.size :] = bits.to_bytes(self.num_bytes, "little")
+
+    def __contains__(self, key: str) -> bool:
+        mm = self._mm
+        for position in self._positions(key):
+            if not mm[_HEADER.size + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def fill_ratio(self) -> float:
+        bits = int.from_bytes(self._mm[_HEADER.size :], "little")
+        return bits.bit_count() / self.num_bits
+
+    def false_positive_rate(self) -> float:
+        """Estimate the current false positive rate from the ratio of set bits."""
+        return self.fill_ratio() ** self.num_hashes
+
+    def close(self) -> None:
+        self._mm.close()
+        self._close_fds()
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class LRUCacheStats:
+    maxsize: int
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+
+class LRUCache[V]:
+    """
+    A bounded, TTL-aware, in-process LRU cache.
+
+    Every entry carries its own deadline, so callers can cap the lifetime of
+    an entry to the lifetime of the underlying resource. Expired entries are
+    dropped lazily on access; when the cache is full, the least recently used
+    entry is evicted.
+
+    Args:
+        maxsize: Maximum number of entries kept in memory.
+        ttl: Default time-to-live of an entry, in seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[V, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> V | None:
+        try:
+            value, deadline = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        if deadline <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: V, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            self._entries.pop(key, None)
+            return
+
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> LRUCacheStats:
+        return LRUCacheStats(
+            maxsize=self.maxsize,
+            size=len(self._entries),
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            expirations=self.expirations,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
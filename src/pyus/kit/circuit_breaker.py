@@ -0,0 +1,81 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import structlog
+
+from pyus.metrics import circuit_breaker_open, circuit_breaker_rejections
+
+log = structlog.get_logger()
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing dependency, and probe it until it recovers.
+
+    The breaker trips after `failure_threshold` consecutive failures. While it's
+    open, callers are expected to fail fast, checking `is_open` before every
+    call, and `run_probe` calls `probe` every `probe_interval` seconds, closing
+    the breaker again as soon as one succeeds within `probe_timeout`.
+
+    The breaker is only closed by the probe: there is no half-open state letting
+    some of the traffic through to find out whether the dependency is back.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int,
+        probe_interval: float,
+        probe_timeout: float,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.failures = 0
+        self.trips = 0
+        self._open = False
+        self._open_gauge = circuit_breaker_open.labels(name)
+        self._rejections = circuit_breaker_rejections.labels(name)
+
+    @property
+    def is_open(self) -> bool:
+        return self._open
+
+    def record_success(self) -> None:
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if not self._open and self.failures >= self.failure_threshold:
+            self._open = True
+            self.trips += 1
+            self._open_gauge.set(1)
+            log.warning(
+                "circuit_breaker.opened", name=self.name, failures=self.failures
+            )
+
+    def record_rejection(self) -> None:
+        self._rejections.inc()
+
+    def close(self) -> None:
+        self.failures = 0
+        if self._open:
+            self._open = False
+            self._open_gauge.set(0)
+            log.info("circuit_breaker.closed", name=self.name)
+
+    async def run_probe(self, probe: Callable[[], Awaitable[object]]) -> None:
+        """Probe the dependency while the breaker is open, until cancelled."""
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            if not self._open:
+                continue
+            try:
+                async with asyncio.timeout(self.probe_timeout):
+                    await probe()
+            except Exception:
+                log.debug("circuit_breaker.probe.error", name=self.name, exc_info=True)
+            else:
+                self.close()
@@ -0,0 +1,113 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field
+
+import structlog
+
+log = structlog.get_logger()
+
+
+@dataclass(slots=True)
+class WriteCoalescerStats:
+    batches: int = 0
+    items: int = 0
+    failed_batches: int = 0
+    max_batch_size: int = 0
+    batch_sizes: dict[int, int] = field(default_factory=dict)
+    """Number of batches per size, rounded up to a power of two."""
+
+    @property
+    def commits_saved(self) -> int:
+        return self.items - self.batches
+
+    def record(self, size: int) -> None:
+        self.batches += 1
+        self.items += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        bucket = 1 << (size - 1).bit_length()
+        self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+
+
+class WriteCoalescer[I, R]:
+    """
+    Group concurrent writes so they're handled, and committed, together.
+
+    Callers `submit` an item and wait for its result. A single writer task
+    collects the items submitted within `max_latency` seconds of the first one,
+    up to `max_size` items, and hands them to the handler in one call. The
+    handler returns one result per item, in the same order. If it fails, every
+    caller of the batch gets its exception.
+
+    Args:
+        max_latency: Maximum time an item waits for others before being handled.
+        max_size: Maximum number of items per batch.
+    """
+
+    def __init__(self, *, max_latency: float, max_size: int) -> None:
+        self.max_latency = max_latency
+        self.max_size = max_size
+        self.stats = WriteCoalescerStats()
+        self._queue: asyncio.Queue[tuple[I, asyncio.Future[R]]] | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    async def submit(self, item: I) -> R:
+        if self._queue is None:
+            raise RuntimeError("The write coalescer is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def run(self, handler: Callable[[list[I]], Awaitable[Sequence[R]]]) -> None:
+        """Handle the submitted items in batches, until cancelled."""
+        loop = asyncio.get_running_loop()
+        self._queue = queue = asyncio.Queue()
+        batch: list[tuple[I, asyncio.Future[R]]] = []
+        try:
+            while True:
+                batch = [await queue.get()]
+                deadline = loop.time() + self.max_latency
+                while len(batch) < self.max_size:
+                    if not queue.empty():
+                        batch.append(queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except TimeoutError:
+                        break
+
+                await self._handle(handler, batch)
+                batch = []
+        finally:
+            self._queue = None
+            # Don't leave anyone waiting forever
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            for _, future in batch:
+                future.cancel()
+
+    async def _handle(
+        self,
+        handler: Callable[[list[I]], Awaitable[Sequence[R]]],
+        batch: list[tuple[I, asyncio.Future[R]]],
+    ) -> None:
+        try:
+            results = await handler([item for item, _ in batch])
+        except Exception as e:
+            log.exception("write_coalescer.batch.error", size=len(batch))
+            self.stats.failed_batches += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats.record(len(batch))
+        for (_, future), result in zip(batch, results, strict=True):
+            if not future.done():
+                future.set_result(result)
@@ -1,9 +1,13 @@
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
 from typing import Any, NewType, TypeAlias
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession as _AsyncSession
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine as _create_async_engine
+from sqlalchemy.ext.horizontal_shard import ShardChooser, ShardedSession
 
 AsyncReadSession = NewType("AsyncReadSession", _AsyncSession)
 """
@@ -25,6 +29,61 @@ AsyncReadSession, using AsyncSession signals intent for read-write database
 access and helps prevent accidental reads in write-only contexts.
 """
 
+AfterCommitCallback: TypeAlias = Callable[[], Awaitable[None]]
+
+_AFTER_COMMIT = "after_commit"
+
+
+def after_commit(session: AsyncSession, callback: AfterCommitCallback) -> None:
+    """
+    Run `callback` once the current transaction of `session` is committed.
+
+    Only commits made with `commit` run the callbacks. They're dropped if the
+    commit fails, so side effects, like caching the rows written, never
+    outlive a transaction that didn't happen.
+    """
+    session.info.setdefault(_AFTER_COMMIT, []).append(callback)
+
+
+async def commit(session: AsyncSession) -> None:
+    """Commit `session`, then run the callbacks registered with `after_commit`."""
+    callbacks: list[AfterCommitCallback] = session.info.pop(_AFTER_COMMIT, [])
+    await session.commit()
+    for callback in callbacks:
+        await callback()
+
+
+@dataclass(frozen=True, slots=True)
+class SQLitePragmas:
+    """
+    PRAGMAs set on every new connection. `None` leaves the SQLite default.
+
+    Args:
+        busy_timeout: Milliseconds to wait for a lock before failing.
+        journal_mode: `wal` lets readers run concurrently with the writer.
+        synchronous: `normal` is safe with WAL and avoids an fsync per commit.
+        mmap_size: Bytes of the database file to memory-map for reads.
+        cache_size: Page cache size; negative values are in KiB.
+        query_only: Refuse any write on the connection.
+    """
+
+    busy_timeout: int | None = None
+    journal_mode: str | None = None
+    synchronous: str | None = None
+    mmap_size: int | None = None
+    cache_size: int | None = None
+    query_only: bool | None = None
+
+    def statements(self) -> list[str]:
+        # Set in field order: `busy_timeout` goes first, changing the journal
+        # mode takes a lock, which processes starting together contend for.
+        # `query_only` goes last, changing the journal mode is a write.
+        return [
+            f"PRAGMA {field} = {int(value) if isinstance(value, bool) else value}"
+            for field in self.__slots__
+            if (value := getattr(self, field)) is not None
+        ]
+
 
 def create_async_engine(
     *,
@@ -32,6 +91,8 @@ def create_async_engine(
     application_name: str | None = None,
     debug: bool = False,
     check_same_thread: bool = False,
+    pragmas: SQLitePragmas | None = None,
+    pool_size: int | None = None,
 ) -> AsyncEngine:
     connect_args: dict[str, Any] = {}
     # if application_name is not None:
@@ -39,12 +100,28 @@ def create_async_engine(
     if check_same_thread is not None:
         connect_args["check_same_thread"] = check_same_thread
 
-    return _create_async_engine(
+    engine_args: dict[str, Any] = {}
+    if pool_size is not None:
+        engine_args["pool_size"] = pool_size
+
+    engine = _create_async_engine(
         dsn,
         echo=debug,
         connect_args=connect_args,
+        **engine_args,
     )
 
+    if pragmas is not None and (statements := pragmas.statements()):
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def set_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+            cursor = dbapi_connection.cursor()
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.close()
+
+    return engine
+
 
 AsyncSessionMaker: TypeAlias = async_sessionmaker[AsyncSession]
 AsyncReadSessionMaker: TypeAlias = async_sessionmaker[AsyncReadSession]
@@ -52,3 +129,26 @@ AsyncReadSessionMaker: TypeAlias = async_sessionmaker[AsyncReadSession]
 
 def create_async_sessionmaker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
     return async_sessionmaker(engine, autocommit=False, autoflush=False)  # pyright: ignore[reportReturnType]
+
+
+def create_async_sharded_sessionmaker(
+    engines: Mapping[str, AsyncEngine], shard_chooser: ShardChooser
+) -> async_sessionmaker[AsyncSession]:
+    """
+    Create a sessionmaker spreading rows over several databases.
+
+    New objects are written to the shard picked by `shard_chooser`. Statements
+    run on a single shard when given one, with the `set_shard_id` option or a
+    `shard_id` bind argument; otherwise they run on every shard and their
+    results are concatenated.
+    """
+    shard_ids = list(engines)
+    return async_sessionmaker(  # pyright: ignore[reportReturnType]
+        sync_session_class=ShardedSession,
+        autocommit=False,
+        autoflush=False,
+        shards={shard_id: engine.sync_engine for shard_id, engine in engines.items()},
+        shard_chooser=shard_chooser,
+        identity_chooser=lambda *args, **kwargs: shard_ids,
+        execute_chooser=lambda orm_context: shard_ids,
+    )
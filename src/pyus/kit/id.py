@@ -1,52 +1,477 @@
+import asyncio
 import base64
-from collections import deque
 import hashlib
+import secrets
+import string
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from datetime import UTC, datetime
+from typing import NamedTuple, Protocol
 
+import structlog
 from pydantic import HttpUrl
+from redis import RedisError
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.sqlite import insert
 
+from pyus.config import settings
+from pyus.kit.db.sqlite import AsyncEngine
+from pyus.metrics import ID_REFILL, ids_allocated_locally
+from pyus.models.id_sequence import IdSequence
 from pyus.redis import Redis
+from pyus.sqlite import create_async_sequence_engine
+
+log = structlog.get_logger()
+
+
+class SnowflakeIdGenerator:
+    """
+    Unique IDs made of a timestamp, a node ID and a sequence, without any
+    coordination between nodes, as long as their node IDs differ.
+
+    The timestamp is in milliseconds since `epoch_ms`. When the sequence of a
+    millisecond is exhausted, the next one is used, ahead of the clock, so IDs
+    keep increasing, even if the clock goes backwards. IDs start at `offset`.
+
+    It can also be the allocator of a `UniqueIdGenerator`, a block being as
+    many IDs taken at once. IDs aren't `unique` then: nodes can clash, and a
+    restarted node can reuse timestamps if the clock went back meanwhile.
+    """
+
+    unique = False
+
+    def __init__(
+        self,
+        *,
+        node: int,
+        node_bits: int = 10,
+        sequence_bits: int = 12,
+        epoch_ms: int = 0,
+        offset: int = 0,
+    ) -> None:
+        if not 0 <= node < 1 << node_bits:
+            raise ValueError(f"node must fit in {node_bits} bits")
+        self._node = node << sequence_bits
+        self._timestamp_shift = node_bits + sequence_bits
+        self._max_sequence = (1 << sequence_bits) - 1
+        self._epoch_ms = epoch_ms
+        self.offset = offset
+        self._last_ms = -1
+        self._sequence = 0
+
+    def take(self, count: int) -> list[int]:
+        ids: list[int] = []
+        now_ms = time.time_ns() // 1_000_000 - self._epoch_ms
+        for _ in range(count):
+            if now_ms > self._last_ms:
+                self._last_ms, self._sequence = now_ms, 0
+            elif self._sequence < self._max_sequence:
+                self._sequence += 1
+            else:
+                self._last_ms, self._sequence = self._last_ms + 1, 0
+            ids.append(
+                self.offset
+                + (self._last_ms << self._timestamp_shift | self._node | self._sequence)
+            )
+        return ids
+
+    async def allocate(self, redis: Redis, size: int) -> list[int]:
+        return self.take(size)
+
+    async def close(self) -> None:
+        pass
+
+
+class IdAllocator(Protocol):
+    """Where `UniqueIdGenerator` reserves its blocks of IDs."""
+
+    unique: bool
+    """
+    Whether IDs are guaranteed never to be reserved twice, by any process.
+    Short codes of IDs which aren't are checked for collisions.
+    """
+
+    async def allocate(self, redis: Redis, size: int) -> Sequence[int]:
+        """Reserve `size` IDs, never reserved before if `unique`."""
+        ...
+
+    async def close(self) -> None: ...
+
+
+class RedisCounterAllocator:
+    """Blocks reserved from a Redis counter, with a single atomic INCRBY."""
+
+    unique = True
+
+    def __init__(self, *, counter_key: str = "url_id") -> None:
+        self._counter_key = counter_key
+
+    async def allocate(self, redis: Redis, size: int) -> range:
+        end = await redis.incrby(self._counter_key, size)
+        return range(end - size, end)
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteHiLoAllocator:
+    """
+    Blocks reserved from a sequence stored in SQLite, so IDs survive the loss
+    of Redis, or don't need it at all.
+
+    A block is reserved by a single upsert, moving the sequence forward, in a
+    transaction of its own: the write lock is only held for that statement, and
+    concurrent processes wait for it up to the busy timeout. The sequence
+    starts at `start`, to continue from where another allocator stopped.
+    """
+
+    unique = True
+
+    def __init__(
+        self,
+        engine_factory: Callable[[], AsyncEngine],
+        *,
+        name: str = "url_id",
+        start: int = 0,
+    ) -> None:
+        self._engine_factory = engine_factory
+        self._engine: AsyncEngine | None = None
+        self._name = name
+        self._start = start
+        table = IdSequence.__table__
+        statement = insert(table).values(
+            name=bindparam("name"), next_value=bindparam("first_end")
+        )
+        self._statement = statement.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={"next_value": table.c.next_value + bindparam("size")},
+        ).returning(table.c.next_value)
+
+    async def allocate(self, redis: Redis, size: int) -> range:
+        # Only processes actually allocating IDs get an engine
+        if self._engine is None:
+            self._engine = self._engine_factory()
+        async with self._engine.begin() as connection:
+            end = await connection.scalar(
+                self._statement,
+                {"name": self._name, "first_end": self._start + size, "size": size},
+            )
+        assert end is not None
+        return range(end - size, end)
+
+    async def close(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
 
 
 class UniqueIdGenerator:
-    def __init__(self):
-        self._counter_key = "url_id"
-        self._incr_value = 1000
-        self._ids: deque = deque()
+    """
+    Hand out unique integer IDs, reserved by blocks from `allocator`, a Redis
+    counter by default.
+
+    Allocators never reserve an ID twice, even across processes and restarts:
+    unused IDs of a block are simply lost when the process exits.
+
+    Refills are single-flight: concurrent callers finding the local blocks empty
+    wait for one reservation instead of each sending their own. When the
+    remaining IDs cross a low-water mark, the next block is prefetched in the
+    background. The block size adapts to the allocation rate so a block lasts
+    about `target_duration` seconds.
+
+    When Redis is unavailable, IDs are taken from `fallback` instead, if set.
+    Its IDs must all be above the allocator's, from `fallback.offset`. Its node
+    is random, so they may have been handed out before by another process:
+    callers must check the IDs that aren't `is_unique` for collisions.
+    """
+
+    def __init__(
+        self,
+        *,
+        allocator: IdAllocator | None = None,
+        block_size: int = 1000,
+        min_block_size: int = 100,
+        max_block_size: int = 100_000,
+        low_water_ratio: float = 0.25,
+        target_duration: float = 10.0,
+        fallback: SnowflakeIdGenerator | None = None,
+    ) -> None:
+        self._allocator = allocator or RedisCounterAllocator()
+        self._block_size = block_size
+        self._min_block_size = min_block_size
+        self._max_block_size = max_block_size
+        self._low_water_ratio = low_water_ratio
+        self._target_duration = target_duration
+        self._fallback = fallback
+        self._blocks: deque[Sequence[int]] = deque()
+        self._lock = asyncio.Lock()
+        self._prefetch: asyncio.Task[None] | None = None
+        self._last_refill_at: float | None = None
+
+    @property
+    def block_size(self) -> int:
+        return self._block_size
+
+    @property
+    def available(self) -> int:
+        return sum(len(block) for block in self._blocks)
+
+    def is_unique(self, id: int) -> bool:
+        """Whether `id` is guaranteed never to have been handed out before."""
+        if self._fallback is not None and id >= self._fallback.offset:
+            return False
+        return self._allocator.unique
+
+    async def close(self) -> None:
+        if self._prefetch is not None:
+            # Not cancelled, it could be holding a database connection
+            await asyncio.wait([self._prefetch])
+        await self._allocator.close()
+
+    async def take(self, redis: Redis, count: int) -> list[int]:
+        ids = self._pop(count)
+
+        if len(ids) < count:
+            async with self._lock:
+                # Another caller may have refilled while we were waiting
+                ids.extend(self._pop(count - len(ids)))
+                if missing := count - len(ids):
+                    try:
+                        await self._refill(redis, max(missing, self._block_size))
+                    except RedisError as e:
+                        if self._fallback is None:
+                            raise
+                        log.debug("unique_id_generator.fallback", error=str(e))
+                        ids.extend(self._fallback.take(missing))
+                        ids_allocated_locally.inc(missing)
+                        # No point in prefetching from Redis
+                        return ids
+                    ids.extend(self._pop(missing))
 
-    async def get_ids(self, redis: Redis) -> deque:
-        if not self._ids:
-            print(f"Requesting {self._incr_value} values from key generation service")
-            self._ids = await self._get_ids(redis)
+        self._maybe_prefetch(redis)
 
-        return self._ids
+        return ids
 
-    async def _get_ids(self, redis: Redis) -> deque:
-        pipe = redis.pipeline()
-        pipe.setnx(self._counter_key, 0)
-        pipe.get(self._counter_key)
-        pipe.incrby(self._counter_key, self._incr_value)
-        res = await pipe.execute()
+    def _pop(self, count: int) -> list[int]:
+        ids: list[int] = []
+        while count > 0 and self._blocks:
+            block = self._blocks[0]
+            ids.extend(block[:count])
+            if count >= len(block):
+                self._blocks.popleft()
+            else:
+                self._blocks[0] = block[count:]
+            count -= len(block)
+        return ids
 
-        return deque(range(int(res[1]), res[-1]))
+    async def _refill(self, redis: Redis, size: int) -> None:
+        log.debug("unique_id_generator.refill", size=size)
+        with ID_REFILL.time():
+            self._blocks.append(await self._allocator.allocate(redis, size))
+        self._adapt_block_size()
 
+    def _adapt_block_size(self) -> None:
+        now = time.monotonic()
+        if self._last_refill_at is not None:
+            elapsed = now - self._last_refill_at
+            if elapsed < self._target_duration / 2:
+                self._block_size = min(self._block_size * 2, self._max_block_size)
+            elif elapsed > self._target_duration * 2:
+                self._block_size = max(self._block_size // 2, self._min_block_size)
+        self._last_refill_at = now
 
-unique_id_generator = UniqueIdGenerator()
+    def _maybe_prefetch(self, redis: Redis) -> None:
+        if (
+            self._lock.locked()
+            or (self._prefetch is not None and not self._prefetch.done())
+            or self.available > self._block_size * self._low_water_ratio
+        ):
+            return
+        self._prefetch = asyncio.create_task(self._prefetch_block(redis))
 
+    async def _prefetch_block(self, redis: Redis) -> None:
+        async with self._lock:
+            if self.available > self._block_size * self._low_water_ratio:
+                return
+            try:
+                await self._refill(redis, self._block_size)
+            except Exception:
+                # Not fatal: the next caller running out of IDs refills inline
+                log.warning("unique_id_generator.prefetch.error", exc_info=True)
 
-async def get_next_id(redis: Redis):
-    next_ids = await unique_id_generator.get_ids(redis)
-    return next_ids.popleft()
 
+# 2025-01-01, Snowflake timestamps fit in fewer bits, and codes are shorter
+SNOWFLAKE_EPOCH_MS = int(datetime(2025, 1, 1, tzinfo=UTC).timestamp() * 1000)
 
-def generate_short_code_with_id(url: HttpUrl, id: int) -> str:
+
+def create_id_allocator() -> IdAllocator:
+    if settings.ID_ALLOCATOR == "sqlite":
+        return SQLiteHiLoAllocator(
+            lambda: create_async_sequence_engine("id-sequence"),
+            start=settings.ID_SQLITE_SEQUENCE_START,
+        )
+    if settings.ID_ALLOCATOR == "snowflake":
+        # Every process needs a node of its own: a random one, unless set. With
+        # 20 bits, collisions between a few dozen processes are unlikely, and
+        # short codes are checked for them anyway.
+        node = settings.ID_SNOWFLAKE_NODE
+        return SnowflakeIdGenerator(
+            node=secrets.randbits(20) if node is None else node,
+            node_bits=20,
+            epoch_ms=SNOWFLAKE_EPOCH_MS,
+        )
+    return RedisCounterAllocator()
+
+
+unique_id_generator = UniqueIdGenerator(
+    allocator=create_id_allocator(),
+    block_size=settings.ID_BLOCK_SIZE,
+    min_block_size=settings.ID_BLOCK_MIN_SIZE,
+    max_block_size=settings.ID_BLOCK_MAX_SIZE,
+    low_water_ratio=settings.ID_BLOCK_LOW_WATER_RATIO,
+    target_duration=settings.ID_BLOCK_TARGET_DURATION,
+    # Redis counters are signed 64-bit integers, fallback IDs are all above them.
+    # They're longer than counter IDs, and so are their base62 short codes. The
+    # node is random, processes can't agree on one without Redis, so their short
+    # codes are checked for collisions.
+    fallback=(
+        SnowflakeIdGenerator(node=secrets.randbits(20), node_bits=20, offset=1 << 63)
+        if settings.ID_LOCAL_FALLBACK_ENABLED and settings.ID_ALLOCATOR == "redis"
+        else None
+    ),
+)
+
+
+async def get_next_id(redis: Redis) -> int:
+    (id,) = await unique_id_generator.take(redis, 1)
+    return id
+
+
+async def get_next_ids(redis: Redis, count: int) -> list[int]:
+    return await unique_id_generator.take(redis, count)
+
+
+def generate_short_code_with_id(url: HttpUrl, id: int, length: int = 7) -> str:
     hash_object = hashlib.sha512(f"{url}{id}".encode())
     hash_base64 = base64.urlsafe_b64encode(str.encode(hash_object.hexdigest())).decode(
         "utf-8"
     )
-    return hash_base64[:7]
+    return hash_base64[:length]
+
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+
+
+def base62_encode(value: int, length: int = 0) -> str:
+    chars: list[str] = []
+    while value:
+        value, remainder = divmod(value, 62)
+        chars.append(BASE62_ALPHABET[remainder])
+    return "".join(reversed(chars)).rjust(length, BASE62_ALPHABET[0])
+
+
+def base62_decode(code: str) -> int:
+    value = 0
+    for char in code:
+        value = value * 62 + BASE62_ALPHABET.index(char)
+    return value
+
+
+class ShortCodeStrategy(Protocol):
+    collision_free: bool
+    """Whether two distinct IDs are guaranteed to give two distinct codes."""
+
+    def generate(self, url: HttpUrl, id: int) -> str: ...
+
+
+class HashShortCodeStrategy:
+    """Truncated hash of the URL and its ID. Codes may collide."""
+
+    collision_free = False
+
+    def __init__(self, *, length: int = 7) -> None:
+        self.length = length
+
+    def generate(self, url: HttpUrl, id: int) -> str:
+        return generate_short_code_with_id(url, id, self.length)
+
+
+class Base62ShortCodeStrategy:
+    """
+    Bijective base62 encoding of the ID, so codes never collide.
+
+    With a `secret`, IDs are first scrambled by a keyed Feistel permutation of
+    `[0, 62**length)` so consecutive IDs don't give sequential codes. Being a
+    permutation, it keeps codes unique. IDs beyond that range are encoded
+    as-is, on more than `length` characters, so they can't collide either.
+    """
+
+    collision_free = True
+
+    def __init__(
+        self, *, length: int = 7, secret: str | None = None, rounds: int = 4
+    ) -> None:
+        self.length = length
+        self.rounds = rounds
+        self._domain = 62**length
+        self._half_bits = ((self._domain - 1).bit_length() + 1) // 2
+        self._half_mask = (1 << self._half_bits) - 1
+        self._key = hashlib.sha256(secret.encode()).digest() if secret else None
+
+    def generate(self, url: HttpUrl, id: int) -> str:
+        if self._key is not None and id < self._domain:
+            id = self._permute(id)
+        return base62_encode(id, self.length)
+
+    def _round(self, value: int, round: int) -> int:
+        assert self._key is not None
+        digest = hashlib.blake2b(
+            value.to_bytes(8, "little"),
+            key=self._key,
+            person=round.to_bytes(16, "little"),
+            digest_size=8,
+        ).digest()
+        return int.from_bytes(digest, "little") & self._half_mask
+
+    def _permute(self, value: int) -> int:
+        # Cycle-walk: the Feistel network permutes [0, 2**(2 * half_bits)),
+        # repeat until we land back in our domain.
+        while True:
+            left, right = value >> self._half_bits, value & self._half_mask
+            for round in range(self.rounds):
+                left, right = right, left ^ self._round(right, round)
+            value = (left << self._half_bits) | right
+            if value < self._domain:
+                return value
+
+
+def create_short_code_strategy() -> ShortCodeStrategy:
+    if settings.SHORT_CODE_STRATEGY == "base62":
+        return Base62ShortCodeStrategy(
+            length=settings.SHORT_CODE_LENGTH, secret=settings.SHORT_CODE_SECRET
+        )
+    return HashShortCodeStrategy(length=settings.SHORT_CODE_LENGTH)
+
+
+short_code_strategy = create_short_code_strategy()
 
 
 async def generate_short_code(url: HttpUrl, redis: Redis) -> str:
     id = await get_next_id(redis)
-    hash_key = generate_short_code_with_id(url, id)
-    return hash_key
+    return short_code_strategy.generate(url, id)
+
+
+class ShortCodes(NamedTuple):
+    codes: list[str]
+    collision_free: bool
+    """Whether the codes are guaranteed not to collide with existing ones."""
+
+
+async def generate_short_codes(urls: list[HttpUrl], redis: Redis) -> ShortCodes:
+    ids = await get_next_ids(redis, len(urls))
+    return ShortCodes(
+        [short_code_strategy.generate(url, id) for url, id in zip(urls, ids)],
+        short_code_strategy.collision_free
+        and all(unique_id_generator.is_unique(id) for id in ids),
+    )
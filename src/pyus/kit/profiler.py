@@ -0,0 +1,65 @@
+import asyncio
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+
+
+def fold_stack(frame: FrameType | None) -> str:
+    """Format a stack, outermost frame first, as a folded flamegraph line."""
+    names: list[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class TaskStackSampler:
+    """
+    Sample the stack of an asyncio task from a background thread.
+
+    Every `interval` seconds, the thread looks at the event loop: if the task
+    is the one running, its stack is recorded, otherwise the sample is skipped.
+    Other tasks sharing the loop are left out of the profile, and so is the time
+    the task spends awaiting, so the samples add up to its CPU time.
+
+    The thread needs the GIL to take a sample, so a busy loop is sampled about
+    once per `sys.getswitchinterval()` at most, whatever the `interval`.
+
+    The samples are aggregated as folded stacks, the input format of
+    flamegraph.pl, speedscope and most flamegraph viewers.
+    """
+
+    def __init__(self, task: asyncio.Task[object], *, interval: float) -> None:
+        self.task = task
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+        self._loop = task.get_loop()
+        self._thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="pyus-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if asyncio.current_task(self._loop) is not self.task:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            # The loop may have switched tasks while we were getting the frame
+            if frame is None or asyncio.current_task(self._loop) is not self.task:
+                continue
+            self.stacks[fold_stack(frame)] += 1
+            self.samples += 1
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from redis.commands.core import AsyncScript
+
+from pyus.kit.cache import LRUCache
+from pyus.metrics import RATE_LIMIT_LEASE
+from pyus.redis import Redis
+
+# Refill the bucket for the time elapsed since its last update, then take up
+# to ARGV[3] tokens from it. Returns the number of tokens taken and, when none
+# could be, the milliseconds until the next one is available. The bucket
+# expires once it would be full again, as a missing bucket is a full one.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+
+local taken = math.min(requested, math.floor(tokens))
+tokens = tokens - taken
+redis.call("HSET", KEYS[1], "tokens", tokens, "updated_at", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1)
+
+if taken > 0 then
+    return {taken, 0}
+end
+return {0, math.ceil((1 - tokens) / rate * 1000)}
+"""
+
+
+@dataclass(slots=True, frozen=True)
+class Limit:
+    """`rate` tokens per second, with bursts of up to `burst` tokens."""
+
+    rate: float
+    burst: int
+
+
+class _Lease:
+    __slots__ = ("retry_at", "tokens")
+
+    def __init__(self, tokens: int, retry_at: float = 0.0) -> None:
+        self.tokens = tokens
+        self.retry_at = retry_at
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets stored in Redis, updated atomically by a Lua script.
+
+    Tokens are taken from Redis in leases of up to `lease_size`, kept locally
+    for at most `lease_ttl` seconds, so most requests are decided without a
+    round trip. Denials are kept locally too, until a token is available again.
+
+    Leasing makes the limit approximate: tokens can be spent up to `lease_ttl`
+    after they were taken, so over short windows a key can exceed its limit by
+    up to `lease_size` tokens per process; the tokens a process doesn't spend
+    before its lease expires are lost, until the bucket refills. A `lease_size`
+    of 1 makes the limit exact, at the cost of a round trip per request.
+
+    Leases of the same key are coalesced: while one is being taken, concurrent
+    requests for the key wait for it instead of going to Redis on their own.
+    """
+
+    def __init__(self, *, lease_size: int, lease_ttl: float, max_keys: int) -> None:
+        self.lease_size = lease_size
+        self.leases = LRUCache[_Lease](max_keys, lease_ttl)
+        self._leasing: dict[str, asyncio.Task[None]] = {}
+        self._script: AsyncScript | None = None
+
+    async def acquire(self, redis: Redis, key: str, limit: Limit) -> float | None:
+        """
+        Take a token from the bucket of `key`.
+
+        Returns `None` if one was taken, otherwise the number of seconds until
+        one is available.
+        """
+        while True:
+            if (lease := self.leases.get(key)) is not None:
+                if lease.tokens > 0:
+                    lease.tokens -= 1
+                    return None
+                if lease.retry_at > 0:
+                    return max(lease.retry_at - time.monotonic(), 0.0)
+
+            if (task := self._leasing.get(key)) is None:
+                task = asyncio.create_task(self._lease(redis, key, limit))
+                self._leasing[key] = task
+                task.add_done_callback(lambda _: self._leasing.pop(key, None))
+            await asyncio.shield(task)
+
+    async def _lease(self, redis: Redis, key: str, limit: Limit) -> None:
+        if self._script is None:
+            self._script = redis.register_script(_TOKEN_BUCKET_SCRIPT)
+
+        with RATE_LIMIT_LEASE.time():
+            taken, retry_after_ms = await self._script(
+                keys=[key],
+                args=[limit.rate, limit.burst, min(self.lease_size, limit.burst)],
+                client=redis,
+            )
+        if taken > 0:
+            self.leases.set(key, _Lease(taken))
+        else:
+            retry_after = retry_after_ms / 1000
+            self.leases.set(key, _Lease(0, time.monotonic() + retry_after), retry_after)
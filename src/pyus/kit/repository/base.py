@@ -1,7 +1,8 @@
+from collections.abc import Mapping, Sequence
 from datetime import datetime
 from typing import Any, Protocol, Self
 
-from sqlalchemy import Select, select
+from sqlalchemy import Row, Select, insert, inspect, select
 from sqlalchemy.orm import Mapped
 
 from pyus.kit.db.sqlite import AsyncReadSession, AsyncSession
@@ -17,10 +18,16 @@ class RepositoryProtocol[M](Protocol):
 
     async def get_one_or_none(self, statement: Select[tuple[M]]) -> M | None: ...
 
+    async def get_all(self, statement: Select[tuple[M]]) -> Sequence[M]: ...
+
     def get_base_statement(self) -> Select[tuple[M]]: ...
 
     async def create(self, object: M, *, flush: bool = False) -> M: ...
 
+    async def create_many(
+        self, values: Sequence[dict[str, Any]], *, shard_id: str | None = None
+    ) -> None: ...
+
     async def update(
         self,
         object: M,
@@ -40,6 +47,31 @@ class RepositoryBase[M]:
         result = await self.session.execute(statement)
         return result.unique().scalar_one_or_none()
 
+    async def get_all(self, statement: Select[tuple[M]]) -> Sequence[M]:
+        result = await self.session.execute(statement)
+        return result.scalars().unique().all()
+
+    async def get_row[T: tuple[Any, ...]](
+        self,
+        statement: Select[T],
+        params: Mapping[str, Any] | None = None,
+        *,
+        shard_id: str | None = None,
+    ) -> Row[T] | None:
+        """
+        Get a single row of a Core statement, without hydrating any entity.
+
+        Meant for hot lookups: build the statement once, selecting only the
+        needed table columns, with bound parameters, and reuse it. Its compiled
+        form is then cached after the first call.
+        """
+        result = await self.session.execute(
+            statement,
+            params,
+            bind_arguments={"shard_id": shard_id} if shard_id is not None else None,
+        )
+        return result.one_or_none()
+
     def get_base_statement(self) -> Select[tuple[M]]:
         return select(self.model)
 
@@ -51,6 +83,18 @@ class RepositoryBase[M]:
 
         return object
 
+    async def create_many(
+        self, values: Sequence[dict[str, Any]], *, shard_id: str | None = None
+    ) -> None:
+        if values:
+            # A Core insert, always a single executemany, and unlike ORM bulk
+            # inserts, supported by sharded sessions.
+            await self.session.execute(
+                insert(inspect(self.model).local_table),
+                values,
+                bind_arguments={"shard_id": shard_id} if shard_id is not None else None,
+            )
+
     async def update(
         self,
         object: M,
@@ -1,10 +1,56 @@
+import heapq
 import uuid
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Sequence
 from datetime import UTC, datetime
+from typing import Any
 
 
 def utc_now() -> datetime:
     return datetime.now(UTC)
 
 
+def as_utc(value: datetime) -> datetime:
+    # SQLite doesn't store the timezone, so we get naive datetimes back
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value
+
+
 def generate_uuid() -> uuid.UUID:
     return uuid.uuid4()
+
+
+class _Descending:
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.value < self.value
+
+
+async def merge_sorted[T](
+    iterables: Sequence[AsyncIterable[T]],
+    *,
+    key: Callable[[T], Any],
+    reverse: bool = False,
+) -> AsyncIterator[T]:
+    """Merge async iterables, each sorted by `key`, into one, like `heapq.merge`."""
+    iterators = [aiter(iterable) for iterable in iterables]
+    heap: list[tuple[Any, int, T]] = []
+
+    async def push(index: int) -> None:
+        try:
+            item = await anext(iterators[index])
+        except StopAsyncIteration:
+            return
+        value = key(item)
+        heapq.heappush(heap, (_Descending(value) if reverse else value, index, item))
+
+    for index in range(len(iterators)):
+        await push(index)
+    while heap:
+        _, index, item = heapq.heappop(heap)
+        yield item
+        await push(index)
@@ -0,0 +1,186 @@
+"""
+Structured logging, with formatting and I/O moved off the event loop.
+
+`configure` routes structlog, and the standard library loggers, to a bounded
+queue. A listener thread renders the records and writes them out, so logging
+from a request costs building an event dictionary and a non-blocking put. When
+the queue is full, records are dropped rather than blocking the loop.
+
+Requests get an ID, taken from their `X-Request-ID` header or generated,
+bound to every record logged while they're handled, and sent back in the
+response. `LOG_SAMPLE_RATES` keeps only a fraction of the requests of the
+given routes, keyed by route path, `unmatched` for requests not going through
+the router, like fast path redirects: all the info and debug records of a
+request are kept or dropped together. Warnings and errors are always kept.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import secrets
+import sys
+import time
+from contextvars import ContextVar
+
+import structlog
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from structlog.typing import EventDict, Processor, WrappedLogger
+
+from pyus.config import settings
+from pyus.metrics import log_records_dropped
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+log = structlog.get_logger()
+
+# The request being handled, its ID and its sampling draw. A single context
+# variable, cheaper to set than binding structlog context variables.
+_request: ContextVar[tuple[Scope, str, float] | None] = ContextVar(
+    "pyus_log_request", default=None
+)
+_listener: logging.handlers.QueueListener | None = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as they are, and drop them when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The base class formats the record here, on the event loop
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+
+def _get_route_path(scope: Scope) -> str:
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def _add_request_id(
+    logger: WrappedLogger, method_name: str, event_dict: EventDict
+) -> EventDict:
+    if (request := _request.get()) is None:
+        return event_dict
+
+    scope, request_id, draw = request
+    if method_name in ("debug", "info") and draw >= settings.LOG_SAMPLE_RATES.get(
+        _get_route_path(scope), 1.0
+    ):
+        raise structlog.DropEvent
+    event_dict["request_id"] = request_id
+    return event_dict
+
+
+def _capture_exc_info(
+    logger: WrappedLogger, method_name: str, event_dict: EventDict
+) -> EventDict:
+    # The exception is rendered by the listener thread, where it's long gone
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+def configure() -> None:
+    """Configure logging for this process. Calling it again reconfigures it."""
+    global _listener
+
+    level = logging.getLevelNamesMapping()[settings.LOG_LEVEL.upper()]
+    shared_processors: list[Processor] = [
+        structlog.contextvars.merge_contextvars,
+        structlog.processors.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso", utc=True),
+    ]
+    structlog.configure(
+        processors=[
+            *shared_processors,
+            _add_request_id,
+            _capture_exc_info,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        # Records below the level are discarded before any processing
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+
+    renderers: list[Processor] = (
+        [structlog.processors.format_exc_info, structlog.processors.JSONRenderer()]
+        if settings.LOG_FORMAT == "json"
+        else [structlog.dev.ConsoleRenderer()]
+    )
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(
+        structlog.stdlib.ProcessorFormatter(
+            foreign_pre_chain=shared_processors,
+            processors=[
+                structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                *renderers,
+            ],
+        )
+    )
+
+    records: queue.Queue[logging.LogRecord] = queue.Queue(settings.LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    root.handlers = [_QueueHandler(records)]
+    root.setLevel(level)
+
+    if _listener is not None:
+        _listener.stop()
+    else:
+        atexit.register(lambda: _listener.stop() if _listener is not None else None)
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+
+
+class LogContextMiddleware:
+    """Bind a request ID to the logs of every request, and log its completion."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id: bytes | None = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value
+                break
+        if request_id is None or len(request_id) > 128:
+            request_id = secrets.token_hex(16).encode()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", []),
+                        (REQUEST_ID_HEADER, request_id),
+                    ],
+                }
+            await send(message)
+
+        token = _request.set((scope, request_id.decode("latin-1"), random.random()))
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            log.info(
+                "request.completed",
+                method=scope["method"],
+                path=scope["path"],
+                route=_get_route_path(scope),
+                status=status,
+                duration=round(time.perf_counter() - start, 6),
+            )
+            _request.reset(token)
@@ -0,0 +1,169 @@
+"""
+Prometheus metrics of the API.
+
+Observations are cheap enough to stay on in production, a couple of
+microseconds at most, and label values are bound once, at import time, for the
+per-stage metrics. Nothing is timed on the fastest paths, like local redirect
+cache hits, where it would cost more than the work itself.
+
+With several worker processes, set `PROMETHEUS_MULTIPROC_DIR` to an empty
+directory shared by all of them: each process then writes its values to
+memory-mapped files there, and `/metrics` aggregates them, whichever worker
+serves it.
+"""
+
+import os
+import time
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+request_duration = Histogram(
+    "pyus_request_duration_seconds",
+    "Total time spent handling a request, per route and status.",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+stage_duration = Histogram(
+    "pyus_stage_duration_seconds",
+    "Time spent in a stage of request handling.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+redirect_cache_lookups = Counter(
+    "pyus_redirect_cache_lookups",
+    "Redirect cache lookups, per result: local or Redis hit, or miss.",
+    ["result"],
+)
+redirects = Counter(
+    "pyus_redirects",
+    "Redirect requests, per outcome: found, not found or expired.",
+    ["outcome"],
+)
+rate_limit_decisions = Counter(
+    "pyus_rate_limit_decisions",
+    "Rate limited requests, per decision: allowed or limited.",
+    ["decision"],
+)
+circuit_breaker_open = Gauge(
+    "pyus_circuit_breaker_open",
+    "Whether a circuit breaker is open, per dependency.",
+    ["name"],
+    multiprocess_mode="livemax",
+)
+circuit_breaker_rejections = Counter(
+    "pyus_circuit_breaker_rejections",
+    "Calls failed fast by an open circuit breaker, per dependency.",
+    ["name"],
+)
+ids_allocated_locally = Counter(
+    "pyus_ids_allocated_locally",
+    "IDs allocated by the local fallback, while Redis was unavailable.",
+)
+clicks_dropped = Counter(
+    "pyus_clicks_dropped",
+    "Clicks dropped because the click buffer was full, while Redis was unavailable.",
+)
+log_records_dropped = Counter(
+    "pyus_log_records_dropped",
+    "Log records dropped because the logging queue was full.",
+)
+
+CACHE_LOOKUP = stage_duration.labels("cache_lookup")
+"""Lookups of the Redis tier of the redirect cache, local hits aren't timed."""
+SERVICE_GET = stage_duration.labels("service_get")
+SERVICE_GET_REDIRECT = stage_duration.labels("service_get_redirect")
+SERVICE_CREATE = stage_duration.labels("service_create")
+SERVICE_CREATE_MANY = stage_duration.labels("service_create_many")
+ID_REFILL = stage_duration.labels("id_refill")
+SESSION_OPEN = stage_duration.labels("session_open")
+SESSION_COMMIT = stage_duration.labels("session_commit")
+SESSION_CLOSE = stage_duration.labels("session_close")
+RATE_LIMIT_LEASE = stage_duration.labels("rate_limit_lease")
+
+CACHE_LOCAL_HIT = redirect_cache_lookups.labels("local_hit")
+CACHE_REDIS_HIT = redirect_cache_lookups.labels("redis_hit")
+CACHE_MISS = redirect_cache_lookups.labels("miss")
+
+REDIRECT_FOUND = redirects.labels("found")
+REDIRECT_NOT_FOUND = redirects.labels("not_found")
+REDIRECT_EXPIRED = redirects.labels("expired")
+
+RATE_LIMIT_ALLOWED = rate_limit_decisions.labels("allowed")
+RATE_LIMIT_LIMITED = rate_limit_decisions.labels("limited")
+
+
+class MetricsMiddleware:
+    """Record the total handling time of every HTTP request."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            request_duration.labels(
+                route.path if route is not None else "unmatched",
+                scope["method"],
+                str(status),
+            ).observe(time.perf_counter() - start)
+
+
+def get_registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+router = APIRouter(include_in_schema=False)
+
+
+@router.get("/metrics")
+def metrics() -> Response:
+    """Expose the metrics in the Prometheus text format."""
+    return Response(generate_latest(get_registry()), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,13 @@
+from sqlalchemy import BigInteger, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from pyus.kit.db.models import Model
+
+
+class IdSequence(Model):
+    """Next value of a hi/lo ID sequence, reserved by blocks."""
+
+    __tablename__ = "id_sequences"
+
+    name: Mapped[str] = mapped_column(Text, primary_key=True)
+    next_value: Mapped[int] = mapped_column(BigInteger, nullable=False)
@@ -1,5 +1,6 @@
+import hashlib
 from datetime import datetime
-from sqlalchemy import TIMESTAMP, Text
+from sqlalchemy import TIMESTAMP, Index, LargeBinary, Text, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from pyus.kit.db.models.base import RecordModel
@@ -7,7 +8,22 @@ from pyus.kit.db.models.base import RecordModel
 
 class ShortenedUrl(RecordModel):
     __tablename__ = "urls"
+    __table_args__ = (
+        # Only live URLs with an expiration date are ever looked up by it
+        Index(
+            "ix_urls_expires_at",
+            "expires_at",
+            sqlite_where=text("expires_at IS NOT NULL AND deleted_at IS NULL"),
+        ),
+    )
 
     expires_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True, default=None)
     original_url: Mapped[str] = mapped_column(Text, nullable=False)
+    original_url_digest: Mapped[bytes | None] = mapped_column(
+        LargeBinary(16), nullable=True, default=None, index=True
+    )
     short_code: Mapped[str] = mapped_column(Text, nullable=False)
+
+    @staticmethod
+    def get_original_url_digest(original_url: str) -> bytes:
+        return hashlib.sha256(original_url.encode()).digest()[:16]
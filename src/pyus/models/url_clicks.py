@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import TIMESTAMP, BigInteger, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from pyus.kit.db.models import Model
+
+
+class ShortenedUrlClicks(Model):
+    """Number of redirects served for a short code, per time bucket."""
+
+    __tablename__ = "url_clicks"
+
+    short_code: Mapped[str] = mapped_column(Text, primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True)
+    clicks: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,158 @@
+"""
+On-demand CPU profiling of live requests.
+
+A request is profiled when it carries the `X-Pyus-Profile` header set to
+`PROFILER_TOKEN`, or at random, for a `PROFILER_SAMPLE_RATE` fraction of the
+traffic. Profiles are kept in memory, in the worker that served the request,
+and can be downloaded as folded stacks from the admin API, with the
+`ADMIN_TOKEN`. The ID of the profile is returned in the `X-Pyus-Profile-Id`
+response header.
+
+The middleware is only installed when one of the two triggers is configured.
+"""
+
+import asyncio
+import random
+import secrets
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from pyus.config import settings
+from pyus.kit.profiler import TaskStackSampler
+from pyus.kit.utils import utc_now
+
+PROFILE_HEADER = "x-pyus-profile"
+PROFILE_ID_HEADER = b"x-pyus-profile-id"
+
+
+@dataclass(slots=True)
+class Profile:
+    id: str
+    method: str
+    path: str
+    route: str | None
+    status: int
+    started_at: datetime
+    duration: float
+    interval: float
+    samples: int
+    folded: str
+
+
+class ProfileStore:
+    """The last profiles captured by this worker, oldest ones dropped first."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._profiles: deque[Profile] = deque(maxlen=maxsize)
+
+    def add(self, profile: Profile) -> None:
+        self._profiles.append(profile)
+
+    def get(self, id: str) -> Profile | None:
+        return next((profile for profile in self._profiles if profile.id == id), None)
+
+    def all(self) -> list[Profile]:
+        return list(reversed(self._profiles))
+
+
+profile_store = ProfileStore(settings.PROFILER_MAX_PROFILES)
+
+
+class ProfilingMiddleware:
+    """
+    Profile the requests asking for it, or a random sample of them.
+
+    At most one sampled request is profiled at a time, so a high sample rate
+    can't start a sampling thread per request. Requests profiled on demand,
+    with the header, are always profiled.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        token: str | None,
+        sample_rate: float,
+        interval: float,
+    ) -> None:
+        self.app = app
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._sampling = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if self._is_requested(scope):
+            return await self._profile(scope, receive, send)
+
+        if (
+            self.sample_rate > 0
+            and not self._sampling
+            and random.random() < self.sample_rate
+        ):
+            self._sampling = True
+            try:
+                return await self._profile(scope, receive, send)
+            finally:
+                self._sampling = False
+
+        await self.app(scope, receive, send)
+
+    def _is_requested(self, scope: Scope) -> bool:
+        if self.token is None:
+            return False
+        value = Headers(scope=scope).get(PROFILE_HEADER)
+        return value is not None and secrets.compare_digest(value, self.token)
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        task = asyncio.current_task()
+        assert task is not None
+
+        id = uuid.uuid4().hex
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", []),
+                        (PROFILE_ID_HEADER, id.encode()),
+                    ],
+                }
+            await send(message)
+
+        sampler = TaskStackSampler(task, interval=self.interval)
+        started_at = utc_now()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            route = scope.get("route")
+            profile_store.add(
+                Profile(
+                    id=id,
+                    method=scope["method"],
+                    path=scope["path"],
+                    route=route.path if route is not None else None,
+                    status=status,
+                    started_at=started_at,
+                    duration=time.perf_counter() - start,
+                    interval=self.interval,
+                    samples=sampler.samples,
+                    folded=sampler.folded(),
+                )
+            )
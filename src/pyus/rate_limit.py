@@ -0,0 +1,144 @@
+"""
+Per client rate limiting of the API routes.
+
+Limits are configured per route, as `"{METHOD} {path}"` keys, where the path
+can use the same `{parameter}` placeholders as the routes themselves. Every
+request is limited per client IP by `RATE_LIMITS_PER_IP`; requests carrying an
+API key in the `RATE_LIMIT_API_KEY_HEADER` header are also limited per key by
+`RATE_LIMITS_PER_API_KEY`. Each route and client has its own token bucket.
+
+Limited requests get a 429 response, with a `Retry-After` header. When Redis
+is unavailable, requests are let through: rate limiting protects the API, it
+shouldn't take it down.
+"""
+
+import hashlib
+import math
+import re
+from collections.abc import Iterable
+
+import structlog
+from redis import RedisError
+from starlette.requests import Request
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from pyus.exception_handlers import pyus_exception_handler
+from pyus.exceptions import RateLimitExceeded
+from pyus.kit.rate_limit import Limit, TokenBucketLimiter
+from pyus.metrics import RATE_LIMIT_ALLOWED, RATE_LIMIT_LIMITED
+from pyus.redis import Redis, redis_circuit_breaker
+
+log = structlog.get_logger()
+
+
+class RateLimitRule:
+    __slots__ = ("api_key_limit", "ip_limit", "method", "name", "path_regex")
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        ip_limit: Limit | None,
+        api_key_limit: Limit | None,
+    ) -> None:
+        method, path = name.split(" ", 1)
+        self.name = name
+        self.method = method.upper()
+        self.path_regex: re.Pattern[str] = compile_path(path)[0]
+        self.ip_limit = ip_limit
+        self.api_key_limit = api_key_limit
+
+    def matches(self, scope: Scope) -> bool:
+        return (
+            scope["method"] == self.method
+            and self.path_regex.match(scope["path"]) is not None
+        )
+
+
+def get_rules(
+    ip_limits: dict[str, tuple[float, int]],
+    api_key_limits: dict[str, tuple[float, int]],
+) -> list[RateLimitRule]:
+    return [
+        RateLimitRule(
+            name,
+            ip_limit=Limit(*ip_limits[name]) if name in ip_limits else None,
+            api_key_limit=(
+                Limit(*api_key_limits[name]) if name in api_key_limits else None
+            ),
+        )
+        for name in {**ip_limits, **api_key_limits}
+    ]
+
+
+def _get_api_key(scope: Scope, header: bytes) -> str | None:
+    for name, value in scope["headers"]:
+        if name == header:
+            # Not stored in Redis as is, it's a credential
+            return hashlib.blake2b(value, digest_size=16).hexdigest()
+    return None
+
+
+class RateLimitMiddleware:
+    """Limit the rate of the requests matching a rule, per client IP and API key."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        rules: Iterable[RateLimitRule],
+        api_key_header: str,
+        limiter: TokenBucketLimiter,
+    ) -> None:
+        self.app = app
+        self.rules = list(rules)
+        self.api_key_header = api_key_header.lower().encode("latin-1")
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        rule = next((rule for rule in self.rules if rule.matches(scope)), None)
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            retry_after = await self._acquire(scope, rule)
+        except RedisError as e:
+            # Not worth a log line per request while the breaker is open
+            if not redis_circuit_breaker.is_open:
+                log.warning("rate_limit.redis_error", rule=rule.name, error=str(e))
+            retry_after = None
+
+        if retry_after is None:
+            RATE_LIMIT_ALLOWED.inc()
+            return await self.app(scope, receive, send)
+
+        RATE_LIMIT_LIMITED.inc()
+        response = await pyus_exception_handler(
+            Request(scope), RateLimitExceeded(max(math.ceil(retry_after), 1))
+        )
+        await response(scope, receive, send)
+
+    async def _acquire(self, scope: Scope, rule: RateLimitRule) -> float | None:
+        redis: Redis = scope["state"]["rate_limit_redis"]
+
+        if rule.ip_limit is not None:
+            client = scope.get("client")
+            ip = client[0] if client is not None else "unknown"
+            retry_after = await self.limiter.acquire(
+                redis, f"rate-limit:{rule.name}:ip:{ip}", rule.ip_limit
+            )
+            if retry_after is not None:
+                return retry_after
+
+        if rule.api_key_limit is not None and (
+            api_key := _get_api_key(scope, self.api_key_header)
+        ):
+            return await self.limiter.acquire(
+                redis, f"rate-limit:{rule.name}:api-key:{api_key}", rule.api_key_limit
+            )
+
+        return None
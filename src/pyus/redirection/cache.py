@@ -0,0 +1,353 @@
+import asyncio
+import contextlib
+import math
+import random
+import secrets
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import datetime
+from urllib.parse import quote
+
+import structlog
+from redis import RedisError
+
+from pyus.config import settings
+from pyus.kit.cache import LRUCache
+from pyus.kit.utils import as_utc, utc_now
+from pyus.metrics import CACHE_LOCAL_HIT, CACHE_LOOKUP, CACHE_MISS, CACHE_REDIS_HIT
+from pyus.redis import Redis
+
+log = structlog.get_logger()
+
+
+RedirectLoader = Callable[[], Awaitable[tuple[str, datetime | None]]]
+"""Load the original URL and expiration date of a short code from the database."""
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class RedirectEntry:
+    """
+    A cached redirect, with its response headers built once.
+
+    The `Location` header is quoted the same way `RedirectResponse` does it.
+    `expires` is the monotonic time at which the Redis copy of the entry expires.
+    """
+
+    __slots__ = ("expires", "headers", "original_url")
+
+    def __init__(self, original_url: str, expires: float = math.inf) -> None:
+        self.original_url = original_url
+        self.expires = expires
+        self.headers: list[tuple[bytes, bytes]] = [
+            (b"content-length", b"0"),
+            (
+                b"location",
+                quote(original_url, safe=":/%#?=@[]!$&'()*+,;").encode("latin-1"),
+            ),
+        ]
+
+
+class RedirectCache:
+    """
+    Two-tier cache of short code to original URL.
+
+    The first tier is an in-process LRU, the second one is Redis. Entries never
+    outlive the `expires_at` of their URL, in any tier. Invalidations are
+    broadcast over a Redis pub/sub channel so every worker drops its local copy.
+
+    Misses are coalesced: concurrent loads of the same short code in a process
+    share a single database query. With `lock_timeout`, a Redis lock extends
+    this across processes; the processes not holding it wait up to `lock_wait`
+    seconds for the holder to fill the cache, then load on their own. They
+    load as soon as the lock is released without the cache being filled, as
+    for unknown or expired short codes.
+
+    Hot entries are refreshed shortly before they expire in Redis, using
+    probabilistic early expiration (XFetch): a hit is turned into a miss with a
+    probability growing as the expiration nears, scaled by the average load
+    time and `early_refresh_beta`. Setting it to 0 disables early refreshes.
+    """
+
+    def __init__(
+        self,
+        *,
+        maxsize: int,
+        ttl: float,
+        redis_ttl: int,
+        channel: str,
+        lock_timeout: float | None = None,
+        lock_wait: float = 1.0,
+        lock_poll_interval: float = 0.02,
+        early_refresh_beta: float = 1.0,
+    ) -> None:
+        self.local = LRUCache[RedirectEntry](maxsize, ttl)
+        self.redis_ttl = redis_ttl
+        self.channel = channel
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+        self.lock_poll_interval = lock_poll_interval
+        self.early_refresh_beta = early_refresh_beta
+        self.load_time = 0.0
+        self.loads = 0
+        self.coalesced_loads = 0
+        self.lock_waits = 0
+        self.early_refreshes = 0
+        self._loading: dict[str, asyncio.Task[str]] = {}
+
+    async def get(self, redis: Redis, short_code: str) -> str | None:
+        entry = await self.get_entry(redis, short_code)
+        return entry.original_url if entry is not None else None
+
+    async def get_entry(self, redis: Redis, short_code: str) -> RedirectEntry | None:
+        # Local hits are only counted: timing them would cost more than the lookup
+        if (entry := self.local.get(short_code)) is not None:
+            if self._should_refresh_early(entry):
+                CACHE_MISS.inc()
+                return None
+            CACHE_LOCAL_HIT.inc()
+            return entry
+
+        start = time.perf_counter()
+        pipe = redis.pipeline(transaction=False)
+        pipe.get(short_code)
+        pipe.pttl(short_code)
+        try:
+            original_url, pttl = await pipe.execute()
+        except RedisError:
+            # Redis is down: fall back to the database, the source of truth
+            CACHE_MISS.inc()
+            return None
+        CACHE_LOOKUP.observe(time.perf_counter() - start)
+
+        if original_url is None:
+            CACHE_MISS.inc()
+            return None
+
+        # A negative PTTL means the key has no expiry
+        ttl = pttl / 1000 if pttl > 0 else None
+        entry = RedirectEntry(
+            original_url, time.monotonic() + ttl if ttl is not None else math.inf
+        )
+        self.local.set(short_code, entry, ttl)
+        if self._should_refresh_early(entry):
+            CACHE_MISS.inc()
+            return None
+        CACHE_REDIS_HIT.inc()
+        return entry
+
+    def _should_refresh_early(self, entry: RedirectEntry) -> bool:
+        if self.early_refresh_beta <= 0 or entry.expires == math.inf:
+            return False
+
+        # XFetch: -log(u) follows an exponential distribution
+        gap = (
+            -self.load_time * self.early_refresh_beta * math.log(1.0 - random.random())
+        )
+        if time.monotonic() + gap < entry.expires:
+            return False
+
+        self.early_refreshes += 1
+        return True
+
+    async def get_or_load(
+        self,
+        redis: Redis,
+        short_code: str,
+        loader: RedirectLoader,
+        *,
+        missed: bool = False,
+    ) -> str:
+        """
+        Get the original URL of a short code, loading it on a miss.
+
+        With `missed`, the caller already got a miss from `get_entry` for this
+        request: the lookup isn't repeated, nor is its early refresh decision.
+
+        Exceptions raised by `loader`, like not found or expired errors, are
+        raised to every caller sharing the load.
+        """
+        entry = None if missed else await self.get_entry(redis, short_code)
+        if entry is not None:
+            return entry.original_url
+
+        if (task := self._loading.get(short_code)) is not None:
+            self.coalesced_loads += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.create_task(self._load(redis, short_code, loader))
+        self._loading[short_code] = task
+        task.add_done_callback(lambda _: self._loading.pop(short_code, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, redis: Redis, short_code: str, loader: RedirectLoader) -> str:
+        if self.lock_timeout is None:
+            return await self._fill(redis, short_code, loader)
+
+        lock = f"lock:redirect:{short_code}"
+        token = secrets.token_hex(8)
+        try:
+            locked = await redis.set(
+                lock, token, nx=True, px=int(self.lock_timeout * 1000)
+            )
+        except RedisError:
+            # No coordination without Redis, load on our own
+            return await self._fill(redis, short_code, loader)
+
+        if locked:
+            try:
+                return await self._fill(redis, short_code, loader)
+            finally:
+                # The lock expires anyway
+                with contextlib.suppress(RedisError):
+                    await redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock, token)
+
+        # Another process is loading it, wait for it to show up in Redis
+        self.lock_waits += 1
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.lock_poll_interval)
+            pipe = redis.pipeline(transaction=False)
+            pipe.get(short_code)
+            pipe.exists(lock)
+            try:
+                original_url, locked = await pipe.execute()
+            except RedisError:
+                break
+            if original_url is not None:
+                return original_url
+            if not locked:
+                # Released without caching anything: not found or expired,
+                # don't wait any longer to tell which
+                break
+
+        # Not cached: not found, expired, or the holder is stuck
+        return await self._fill(redis, short_code, loader)
+
+    async def _fill(self, redis: Redis, short_code: str, loader: RedirectLoader) -> str:
+        start = time.perf_counter()
+        original_url, expires_at = await loader()
+        # Exponential moving average of the time it takes to load an entry
+        self.load_time += (time.perf_counter() - start - self.load_time) * 0.1
+        self.loads += 1
+
+        await self.set(redis, short_code, original_url, expires_at)
+        return original_url
+
+    async def set(
+        self,
+        redis: Redis,
+        short_code: str,
+        original_url: str,
+        expires_at: datetime | None,
+    ) -> None:
+        ttl = self._get_ttl(expires_at)
+        if ttl <= 0:
+            return
+
+        # Without Redis, the entry is still worth caching locally
+        with contextlib.suppress(RedisError):
+            await redis.set(short_code, original_url, px=max(int(ttl * 1000), 1))
+        self.local.set(
+            short_code, RedirectEntry(original_url, time.monotonic() + ttl), ttl
+        )
+
+    async def set_many(
+        self,
+        redis: Redis,
+        entries: Iterable[tuple[str, str, datetime | None]],
+        *,
+        local: bool = True,
+    ) -> int:
+        """
+        Cache `(short_code, original_url, expires_at)` entries in a single pipeline.
+
+        Args:
+            local: Whether to also cache the entries in this process. If so, they
+                are cached locally even when Redis is unavailable.
+
+        Returns:
+            The number of entries cached, expired ones are skipped.
+        """
+        pipe = redis.pipeline(transaction=False)
+        cached: list[tuple[str, str, float]] = []
+        for short_code, original_url, expires_at in entries:
+            ttl = self._get_ttl(expires_at)
+            if ttl <= 0:
+                continue
+            pipe.set(short_code, original_url, px=max(int(ttl * 1000), 1))
+            cached.append((short_code, original_url, ttl))
+
+        if not cached:
+            return 0
+
+        try:
+            await pipe.execute()
+        except RedisError:
+            if not local:
+                raise
+
+        if local:
+            now = time.monotonic()
+            for short_code, original_url, ttl in cached:
+                self.local.set(short_code, RedirectEntry(original_url, now + ttl), ttl)
+
+        return len(cached)
+
+    def _get_ttl(self, expires_at: datetime | None) -> float:
+        if expires_at is None:
+            return float(self.redis_ttl)
+        return min((as_utc(expires_at) - utc_now()).total_seconds(), self.redis_ttl)
+
+    async def invalidate(self, redis: Redis, *short_codes: str) -> None:
+        if not short_codes:
+            return
+
+        for short_code in short_codes:
+            self.local.delete(short_code)
+
+        pipe = redis.pipeline(transaction=False)
+        pipe.delete(*short_codes)
+        for short_code in short_codes:
+            pipe.publish(self.channel, short_code)
+        await pipe.execute()
+
+    async def listen(self, redis: Redis) -> None:
+        """Evict local entries invalidated by any worker, until cancelled."""
+        subscribed = False
+        while True:
+            try:
+                async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    subscribed = True
+                    # We may have missed invalidations while (re)connecting
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.local.delete(message["data"])
+            except RedisError as e:
+                # Entries cached before losing the subscription may be stale.
+                # Those cached since were loaded from the database and expire
+                # like any other, so they keep serving while Redis is down.
+                if subscribed:
+                    log.warning("redirect_cache.listen.error", error=str(e))
+                    self.local.clear()
+                    subscribed = False
+                await asyncio.sleep(1)
+
+
+redirect_cache = RedirectCache(
+    maxsize=settings.REDIRECT_CACHE_SIZE,
+    ttl=settings.REDIRECT_CACHE_TTL,
+    redis_ttl=settings.REDIRECT_CACHE_REDIS_TTL,
+    channel=settings.REDIRECT_CACHE_INVALIDATION_CHANNEL,
+    lock_timeout=settings.REDIRECT_CACHE_LOCK_TIMEOUT,
+    lock_wait=settings.REDIRECT_CACHE_LOCK_WAIT,
+    lock_poll_interval=settings.REDIRECT_CACHE_LOCK_POLL_INTERVAL,
+    early_refresh_beta=settings.REDIRECT_CACHE_EARLY_REFRESH_BETA,
+)
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, status
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Request, status
 from fastapi.responses import RedirectResponse
 
+from pyus.analytics.buffer import click_buffer
 from pyus.exceptions import ResourceExpired, ResourceNotFound
-from pyus.kit.db.sqlite import AsyncReadSession
-from pyus.kit.utils import utc_now
+from pyus.kit.utils import as_utc, utc_now
+from pyus.metrics import REDIRECT_EXPIRED, REDIRECT_FOUND, REDIRECT_NOT_FOUND
 from pyus.openapi import APITag
+from pyus.redirection.cache import redirect_cache
+from pyus.redirection.fast_path import CACHE_MISSED_STATE
 from pyus.redis import Redis, get_redis
-from pyus.sqlite import get_db_read_session
+from pyus.sqlite import LazySession, get_db_lazy_session
 from pyus.url_shortening.endpoints import UrlExpired, UrlNotFound
+from pyus.url_shortening.filter import short_code_filter
 from pyus.url_shortening.service import url as url_service
 
 router = APIRouter(prefix="", tags=["urls", APITag.public])
@@ -22,22 +28,46 @@ router = APIRouter(prefix="", tags=["urls", APITag.public])
 )
 async def redirect(
     short_code: str,
-    session: AsyncReadSession = Depends(get_db_read_session),
+    request: Request,
+    lazy_session: LazySession = Depends(get_db_lazy_session),
     redis: Redis = Depends(get_redis),
 ) -> str:
     """Redirect to an original URL by its short code."""
-    if (cached_url := await redis.get(short_code)) is not None:
-        return cached_url
+    if short_code not in short_code_filter:
+        REDIRECT_NOT_FOUND.inc()
+        raise ResourceNotFound()
 
-    url = await url_service.get(session, short_code)
+    async def load() -> tuple[str, datetime | None]:
+        # Only open a session on cache misses. The load is shared by every
+        # request missing the same code, and outlives this one if its client
+        # goes away: it can't use the session of this request.
+        async with lazy_session.open_read() as session:
+            target = await url_service.get_redirect_target(session, short_code)
 
-    if url is None:
-        raise ResourceNotFound()
+        if target is None:
+            raise ResourceNotFound()
+
+        if target.expires_at is not None and utc_now() >= as_utc(target.expires_at):
+            raise ResourceExpired()
+
+        return target
 
-    if url.expires_at is not None and utc_now() >= url.expires_at:
-        raise ResourceExpired()
+    try:
+        original_url = await redirect_cache.get_or_load(
+            redis,
+            short_code,
+            load,
+            # Don't roll the early refresh dice twice for the same request
+            missed=getattr(request.state, CACHE_MISSED_STATE, None) == short_code,
+        )
+    except ResourceNotFound:
+        REDIRECT_NOT_FOUND.inc()
+        raise
+    except ResourceExpired:
+        REDIRECT_EXPIRED.inc()
+        raise
 
-    ex = (url.expires_at - utc_now()) if url.expires_at is not None else 3600
-    await redis.set(url.short_code, url.original_url, ex=ex)
+    REDIRECT_FOUND.inc()
+    click_buffer.record(short_code)
 
-    return url.original_url
+    return original_url
@@ -0,0 +1,64 @@
+import time
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from pyus.analytics.buffer import click_buffer
+from pyus.metrics import REDIRECT_FOUND, request_duration
+from pyus.redirection.cache import redirect_cache
+from pyus.url_shortening.filter import short_code_filter
+
+_EMPTY_BODY = {"type": "http.response.body", "body": b"", "more_body": False}
+
+CACHE_MISSED_STATE = "redirect_cache_missed"
+"""Request state key of the short code the fast path missed in the cache."""
+
+
+class RedirectFastPathMiddleware:
+    """
+    Serve cached redirects straight from ASGI, ahead of the FastAPI router.
+
+    On `GET {prefix}{short_code}`, the code is resolved through the redirect
+    cache tiers and, on a hit, the prebuilt 302 headers are written right away,
+    skipping routing, dependency injection and response construction.
+    Anything else, including cache misses, falls back to the `redirect`
+    endpoint, which remains the source of truth. Misses are recorded in the
+    request state so the endpoint loads the code without looking it up again.
+
+    Redirects served here are recorded under their own route in the request
+    duration metrics, as they never reach the router.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = "/api/v1/") -> None:
+        self.app = app
+        self.prefix = prefix
+        self._request_duration = request_duration.labels(
+            f"{prefix}{{short_code}} (fast path)", "GET", "302"
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+
+        path: str = scope["path"]
+        short_code = path[len(self.prefix) :]
+        if (
+            not path.startswith(self.prefix)
+            or not short_code
+            or "/" in short_code
+            or short_code not in short_code_filter
+        ):
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        entry = await redirect_cache.get_entry(scope["state"]["redis"], short_code)
+        if entry is None:
+            scope["state"][CACHE_MISSED_STATE] = short_code
+            return await self.app(scope, receive, send)
+
+        await send(
+            {"type": "http.response.start", "status": 302, "headers": entry.headers}
+        )
+        await send(_EMPTY_BODY)
+        REDIRECT_FOUND.inc()
+        click_buffer.record(short_code)
+        self._request_duration.observe(time.perf_counter() - start)
@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import Literal
+
+import structlog
+from redis import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+
+from pyus.config import settings
+from pyus.kit.db.sqlite import AsyncReadSession, AsyncReadSessionMaker
+from pyus.redirection.cache import redirect_cache
+from pyus.redis import Redis
+from pyus.url_shortening.service import url as url_service
+
+log = structlog.get_logger()
+
+WARMUP_LOCK_KEY = "lock:redirect:warmup"
+
+
+async def warm_up(
+    session: AsyncReadSession,
+    redis: Redis,
+    *,
+    order: Literal["recent", "clicks"],
+    limit: int,
+    batch_size: int,
+    clicks_window: int,
+) -> int:
+    """
+    Stream active URLs from the database into the Redis tier of the redirect cache.
+
+    Returns:
+        The number of URLs cached.
+    """
+    cached = 0
+    batch: list[tuple[str, str, datetime | None]] = []
+    async for entry in url_service.stream_redirects(
+        session,
+        order=order,
+        limit=limit,
+        clicks_window=clicks_window,
+        batch_size=batch_size,
+    ):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            cached += await redirect_cache.set_many(redis, batch, local=False)
+            batch = []
+
+    if batch:
+        cached += await redirect_cache.set_many(redis, batch, local=False)
+
+    return cached
+
+
+async def warm_up_on_startup(sessionmaker: AsyncReadSessionMaker, redis: Redis) -> None:
+    """Warm up the redirect cache, unless another worker just started doing it."""
+    try:
+        if not await redis.set(
+            WARMUP_LOCK_KEY, "1", nx=True, ex=settings.REDIRECT_CACHE_WARMUP_LOCK_TTL
+        ):
+            return
+
+        async with sessionmaker() as session:
+            cached = await warm_up(
+                session,
+                redis,
+                order=settings.REDIRECT_CACHE_WARMUP_ORDER,
+                limit=settings.REDIRECT_CACHE_WARMUP_LIMIT,
+                batch_size=settings.REDIRECT_CACHE_WARMUP_BATCH_SIZE,
+                clicks_window=settings.REDIRECT_CACHE_WARMUP_CLICKS_WINDOW,
+            )
+    except (RedisError, SQLAlchemyError) as e:
+        log.warning("redirect_cache.warmup.error", error=str(e))
+    else:
+        log.info("redirect_cache.warmup.done", cached=cached)
@@ -1,12 +1,15 @@
-from typing import TYPE_CHECKING, Literal, TypeAlias
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+from typing import TYPE_CHECKING, Any, Literal, TypeAlias
 
 from fastapi import Request
 from redis import ConnectionError, RedisError, TimeoutError
 import redis.asyncio as _async_redis
 from redis.asyncio.retry import Retry
-from redis.backoff import default_backoff
+from redis.backoff import AbstractBackoff, default_backoff
 
 from pyus.config import settings
+from pyus.kit.circuit_breaker import CircuitBreaker
 
 # https://github.com/python/typeshed/issues/7597#issuecomment-1117551641
 # Redis is generic at type checking, but not at runtime...
@@ -15,19 +18,112 @@ if TYPE_CHECKING:
 else:
     Redis = _async_redis.Redis
 
-
 REDIS_RETRY_ON_ERRROR: list[type[RedisError]] = [ConnectionError, TimeoutError]
-REDIS_RETRY = Retry(default_backoff(), retries=50)
+REDIS_RETRY_BACKOFF = default_backoff()
+REDIS_RETRIES = 50
+REDIS_RETRY = Retry(REDIS_RETRY_BACKOFF, retries=REDIS_RETRIES)
+
+ProcessName: TypeAlias = Literal["app", "rate-limit", "worker", "scheduler", "script"]
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling Redis while the circuit breaker is open."""
+
+
+class CircuitBreakerRetry(Retry):
+    """
+    Retry policy failing fast while a circuit breaker is open.
+
+    Every failed attempt counts towards tripping the breaker, and retries stop
+    as soon as it trips, so callers already retrying don't keep waiting either.
+
+    It only subclasses `Retry` to be accepted as the retry policy of a client,
+    and keeps its own backoff, retries and errors to retry on.
+    """
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        backoff: AbstractBackoff,
+        retries: int,
+        supported_errors: tuple[type[Exception], ...],
+    ) -> None:
+        super().__init__(backoff, retries, supported_errors)
+        self.breaker = breaker
+        self.backoff = backoff
+        self.retries = retries
+        self.supported_errors = supported_errors
+
+    def update_supported_errors(
+        self, specified_errors: Iterable[type[Exception]]
+    ) -> None:
+        # Called by the client with its `retry_on_error`
+        specified_errors = tuple(specified_errors)
+        super().update_supported_errors(specified_errors)
+        self.supported_errors = tuple({*self.supported_errors, *specified_errors})
+
+    def update_retries(self, value: int) -> None:
+        super().update_retries(value)
+        self.retries = value
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> "CircuitBreakerRetry":
+        # Redis copies the retry policy of every connection: keep sharing the
+        # breaker, and the backoff, which is stateless.
+        return self
+
+    async def call_with_retry[T](
+        self, do: Callable[[], Awaitable[T]], fail: Callable[[RedisError], Any]
+    ) -> T:
+        if self.breaker.is_open:
+            self.breaker.record_rejection()
+            raise CircuitOpenError("Redis circuit breaker is open")
+
+        self.backoff.reset()
+        failures = 0
+        while True:
+            try:
+                result = await do()
+            except self.supported_errors as error:
+                failures += 1
+                self.breaker.record_failure()
+                await fail(error)
+                if self.breaker.is_open or failures > self.retries >= 0:
+                    raise
+                await asyncio.sleep(self.backoff.compute(failures))
+            except OSError:
+                # Failing to connect, before redis-py wraps it in a ConnectionError
+                self.breaker.record_failure()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
 
-ProcessName: TypeAlias = Literal["app", "rate-limit", "worker", "script"]
+redis_circuit_breaker = CircuitBreaker(
+    "redis",
+    failure_threshold=settings.REDIS_CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    probe_interval=settings.REDIS_CIRCUIT_BREAKER_PROBE_INTERVAL,
+    probe_timeout=settings.REDIS_CIRCUIT_BREAKER_PROBE_TIMEOUT,
+)
 
 
-def create_redis(process_name: ProcessName) -> Redis:
+def create_redis(
+    process_name: ProcessName, *, circuit_breaker: CircuitBreaker | None = None
+) -> Redis:
     return _async_redis.Redis.from_url(
         settings.redis_url,
         decode_responses=True,
         retry_on_error=REDIS_RETRY_ON_ERRROR,
-        retry=REDIS_RETRY,
+        retry=(
+            CircuitBreakerRetry(
+                circuit_breaker,
+                REDIS_RETRY_BACKOFF,
+                REDIS_RETRIES,
+                tuple(REDIS_RETRY_ON_ERRROR),
+            )
+            if circuit_breaker is not None
+            else REDIS_RETRY
+        ),
         client_name=f"development.{process_name}",
     )
 
@@ -40,6 +136,8 @@ __all__ = [
     "Redis",
     "REDIS_RETRY_ON_ERRROR",
     "REDIS_RETRY",
+    "CircuitOpenError",
     "create_redis",
     "get_redis",
+    "redis_circuit_breaker",
 ]
@@ -0,0 +1,44 @@
+import asyncio
+import signal
+
+import structlog
+import uvloop
+
+from pyus import logging
+from pyus.redis import create_redis
+from pyus.sqlite import (
+    create_async_engines,
+    create_async_sessionmaker,
+    dispose_async_engines,
+)
+from pyus.url_shortening.sweeper import expired_url_sweeper
+
+log = structlog.get_logger()
+
+
+async def main() -> None:
+    log.info("scheduler.starting")
+
+    async_engines = create_async_engines("scheduler")
+    async_sessionmaker = create_async_sessionmaker(async_engines)
+    redis = create_redis("scheduler")
+
+    task = asyncio.create_task(expired_url_sweeper.run(async_sessionmaker, redis))
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, task.cancel)
+
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await redis.close(True)
+        await dispose_async_engines(async_engines)
+
+    log.info("scheduler.stopped")
+
+
+if __name__ == "__main__":
+    logging.configure()
+    uvloop.run(main())
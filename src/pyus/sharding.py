@@ -0,0 +1,69 @@
+import os
+import zlib
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from sqlalchemy.ext.horizontal_shard import set_shard_id
+from sqlalchemy.sql import Executable
+
+from pyus.config import settings
+
+SHARD_IDS = [str(shard) for shard in range(settings.SQLITE_SHARDS)]
+SHARDED = len(SHARD_IDS) > 1
+
+
+def get_shard_id(short_code: str) -> str:
+    """Get the shard of a URL. It only depends on its short code, so it never moves."""
+    return SHARD_IDS[zlib.crc32(short_code.encode()) % len(SHARD_IDS)]
+
+
+def get_shard_dsns(dsn: str) -> dict[str, str]:
+    """
+    Get the DSN of every shard, from the one of the unsharded database.
+
+    `sqlite:///pyus.db` gives `sqlite:///pyus.0.db`, `sqlite:///pyus.1.db`...
+    Without sharding, the DSN is used as-is.
+    """
+    if not SHARDED:
+        return {SHARD_IDS[0]: dsn}
+
+    base, extension = os.path.splitext(dsn)
+    return {shard_id: f"{base}.{shard_id}{extension}" for shard_id in SHARD_IDS}
+
+
+def shard_chooser(mapper: Any, instance: Any, clause: Any = None, **kwargs: Any) -> str:
+    short_code = getattr(instance, "short_code", None)
+    if short_code is None:
+        raise ValueError(f"Cannot choose a shard for {instance!r}")
+    return get_shard_id(short_code)
+
+
+def for_shard[E: Executable](statement: E, shard_id: str | None) -> E:
+    """Run a statement only on the given shard. `None` leaves it unchanged."""
+    if shard_id is None or not SHARDED:
+        return statement
+    return statement.options(set_shard_id(shard_id))
+
+
+def route[E: Executable](statement: E, short_code: str) -> E:
+    """Run a statement only on the shard of a short code."""
+    if not SHARDED:
+        return statement
+    return for_shard(statement, get_shard_id(short_code))
+
+
+def group_by_shard[T](
+    items: Iterable[T], short_code: Callable[[T], str]
+) -> dict[str | None, list[T]]:
+    """
+    Group items by the shard of their short code.
+
+    Without sharding, every item is in a single `None` group.
+    """
+    if not SHARDED:
+        return {None: list(items)}
+
+    groups: dict[str | None, list[T]] = {}
+    for item in items:
+        groups.setdefault(get_shard_id(short_code(item)), []).append(item)
+    return groups
@@ -1,7 +1,8 @@
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Mapping
+from dataclasses import dataclass
 from typing import Literal, TypeAlias
 
-from fastapi import Request
+from fastapi import Depends, Request
 from starlette.types import ASGIApp, Receive, Scope, Send
 
 from pyus.config import settings
@@ -11,29 +12,176 @@ from pyus.kit.db.sqlite import (
     AsyncReadSessionMaker,
     AsyncSession,
     AsyncSessionMaker,
+    SQLitePragmas,
+    commit,
+    create_async_sharded_sessionmaker,
 )
 from pyus.kit.db.sqlite import create_async_engine as _create_async_engine
-
-ProcessName: TypeAlias = Literal["app", "worker", "scheduler", "script"]
+from pyus.kit.db.sqlite import create_async_sessionmaker as _create_async_sessionmaker
+from pyus.metrics import SESSION_CLOSE, SESSION_COMMIT, SESSION_OPEN
+from pyus.sharding import SHARD_IDS, SHARDED, get_shard_dsns, shard_chooser
+
+ProcessName: TypeAlias = Literal["app", "id-sequence", "worker", "scheduler", "script"]
+
+
+def get_sqlite_pragmas(*, read_only: bool = False) -> SQLitePragmas:
+    return SQLitePragmas(
+        busy_timeout=settings.SQLITE_BUSY_TIMEOUT,
+        # The journal mode is persistent, only the writer needs to set it
+        journal_mode=None if read_only else settings.SQLITE_JOURNAL_MODE,
+        synchronous=settings.SQLITE_SYNCHRONOUS,
+        mmap_size=settings.SQLITE_MMAP_SIZE,
+        cache_size=settings.SQLITE_CACHE_SIZE,
+        query_only=True if read_only else None,
+    )
 
 
-def create_async_engine(process_name: ProcessName) -> AsyncEngine:
+def create_async_engines(process_name: ProcessName) -> dict[str, AsyncEngine]:
+    """Create an engine per shard, a single one without sharding."""
+    return {
+        shard_id: _create_async_engine(
+            dsn=dsn,
+            application_name=f"development.{process_name}",
+            debug=settings.SQLITE_ECHO,
+            check_same_thread=False,
+            pragmas=get_sqlite_pragmas(),
+            pool_size=settings.SQLITE_POOL_SIZE,
+        )
+        for shard_id, dsn in get_shard_dsns(settings.SQLITE_HOST).items()
+    }
+
+
+def create_async_read_engines(process_name: ProcessName) -> dict[str, AsyncEngine]:
+    return {
+        shard_id: _create_async_engine(
+            dsn=dsn,
+            application_name=f"development.{process_name}",
+            debug=settings.SQLITE_ECHO,
+            check_same_thread=False,
+            pragmas=get_sqlite_pragmas(read_only=True),
+            pool_size=settings.SQLITE_READ_POOL_SIZE,
+        )
+        for shard_id, dsn in get_shard_dsns(settings.SQLITE_HOST).items()
+    }
+
+
+def create_async_sequence_engine(process_name: ProcessName) -> AsyncEngine:
+    """Create an engine on the first shard, where ID sequences are kept."""
     return _create_async_engine(
-        dsn=settings.SQLITE_HOST,
+        dsn=get_shard_dsns(settings.SQLITE_HOST)[SHARD_IDS[0]],
         application_name=f"development.{process_name}",
-        debug=True,
+        debug=settings.SQLITE_ECHO,
         check_same_thread=False,
+        pragmas=get_sqlite_pragmas(),
+        # Reservations are single-flight, one connection is enough
+        pool_size=1,
     )
 
 
-def create_async_read_engine(process_name: ProcessName) -> AsyncEngine:
-    return _create_async_engine(
-        dsn=settings.SQLITE_HOST,
-        application_name=f"development.{process_name}",
-        debug=True,
-        check_same_thread=False,
+def create_async_sessionmaker(engines: Mapping[str, AsyncEngine]) -> AsyncSessionMaker:
+    if not SHARDED:
+        (engine,) = engines.values()
+        return _create_async_sessionmaker(engine)
+    return create_async_sharded_sessionmaker(engines, shard_chooser)
+
+
+async def dispose_async_engines(engines: Mapping[str, AsyncEngine]) -> None:
+    for engine in engines.values():
+        await engine.dispose()
+
+
+class LazySession:
+    """
+    Request-scoped sessions, only created the first time they're needed.
+
+    Requests served without touching the database, like cached redirects,
+    don't pay for any session setup or teardown.
+    """
+
+    __slots__ = (
+        "_read_sessionmaker",
+        "_sessionmaker",
+        "detached_read",
+        "read_session",
+        "session",
     )
 
+    def __init__(
+        self, sessionmaker: AsyncSessionMaker, read_sessionmaker: AsyncReadSessionMaker
+    ) -> None:
+        self._sessionmaker = sessionmaker
+        self._read_sessionmaker = read_sessionmaker
+        self.session: AsyncSession | None = None
+        self.read_session: AsyncReadSession | None = None
+        self.detached_read = False
+
+    def get(self) -> AsyncSession:
+        if self.session is None:
+            with SESSION_OPEN.time():
+                self.session = self._sessionmaker()
+        return self.session
+
+    def get_read(self) -> AsyncReadSession:
+        if self.read_session is None:
+            with SESSION_OPEN.time():
+                self.read_session = self._read_sessionmaker()
+        return self.read_session
+
+    def open_read(self) -> AsyncReadSession:
+        """
+        Open a read session of its own, for work that may outlive the request.
+
+        The caller closes it, but it still counts as a read session of the
+        request in the stats.
+        """
+        self.detached_read = True
+        with SESSION_OPEN.time():
+            return self._read_sessionmaker()
+
+    async def close(self) -> None:
+        if self.session is None and self.read_session is None:
+            return
+
+        with SESSION_CLOSE.time():
+            if self.session is not None:
+                await self.session.close()
+            if self.read_session is not None:
+                await self.read_session.close()
+
+
+@dataclass(slots=True)
+class RouteSessionStats:
+    requests: int = 0
+    write_sessions: int = 0
+    read_sessions: int = 0
+
+    def record(self, lazy_session: LazySession) -> None:
+        self.requests += 1
+        self.write_sessions += lazy_session.session is not None
+        self.read_sessions += (
+            lazy_session.read_session is not None or lazy_session.detached_read
+        )
+
+
+class SessionStats:
+    """How many requests actually needed a database session, per route."""
+
+    def __init__(self) -> None:
+        self.total = RouteSessionStats()
+        self.routes: dict[str, RouteSessionStats] = {}
+
+    def record(self, scope: Scope, lazy_session: LazySession) -> None:
+        route = scope.get("route")
+        key = f"{scope.get('method', 'WS')} {route.path}" if route else "unmatched"
+        if (route_stats := self.routes.get(key)) is None:
+            route_stats = self.routes[key] = RouteSessionStats()
+
+        route_stats.record(lazy_session)
+        self.total.record(lazy_session)
+
+
+session_stats = SessionStats()
+
 
 class AsyncSessionMiddleware:
     def __init__(self, app: ASGIApp) -> None:
@@ -43,46 +191,63 @@ class AsyncSessionMiddleware:
         if scope["type"] not in ("http", "websocket"):
             return await self.app(scope, receive, send)
 
-        sessionmaker: AsyncSessionMaker = scope["state"]["async_sessionmaker"]
-        async with sessionmaker() as session:
-            scope["state"]["async_session"] = session
+        lazy_session = LazySession(
+            scope["state"]["async_sessionmaker"],
+            scope["state"]["async_read_sessionmaker"],
+        )
+        scope["state"]["async_session"] = lazy_session
+        try:
             await self.app(scope, receive, send)
+        finally:
+            await lazy_session.close()
+            session_stats.record(scope, lazy_session)
 
 
 async def get_db_sessionmaker(request: Request) -> AsyncSessionMaker:
     return request.state.async_sessionmaker
 
 
-async def get_db_session(request: Request) -> AsyncGenerator[AsyncSession]:
+async def get_db_lazy_session(request: Request) -> LazySession:
     try:
-        session = request.state.async_session
+        return request.state.async_session
     except AttributeError as e:
         raise RuntimeError(
             "Session is not present in the request state. "
             "Did you forget to add AsyncSessionMiddleware?"
         ) from e
 
+
+async def get_db_session(
+    lazy_session: LazySession = Depends(get_db_lazy_session),
+) -> AsyncGenerator[AsyncSession]:
+    session = lazy_session.get()
     try:
         yield session
     except:
         await session.rollback()
         raise
     else:
-        await session.commit()
+        with SESSION_COMMIT.time():
+            await commit(session)
 
 
-async def get_db_read_session(request: Request) -> AsyncGenerator[AsyncReadSession]:
-    sessionmaker: AsyncReadSessionMaker = request.state.async_read_sessionmaker
-    async with sessionmaker() as session:
-        yield session
+async def get_db_read_session(
+    lazy_session: LazySession = Depends(get_db_lazy_session),
+) -> AsyncReadSession:
+    return lazy_session.get_read()
 
 
 __all__ = [
     "AsyncEngine",
     "AsyncSession",
     "AsyncReadSession",
-    "create_async_engine",
-    "create_async_read_engine",
+    "create_async_engines",
+    "create_async_read_engines",
+    "create_async_sequence_engine",
+    "create_async_sessionmaker",
+    "dispose_async_engines",
+    "LazySession",
+    "get_db_lazy_session",
     "get_db_session",
     "get_db_read_session",
     "get_db_sessionmaker",
@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, status
+from pydantic import ValidationError
 
 from pyus.exceptions import ResourceExpired, ResourceNotFound
-from pyus.kit.db.sqlite import AsyncReadSession, AsyncSession
-from pyus.models.url import ShortenedUrl
+from pyus.kit.db.sqlite import AsyncReadSession, AsyncSession, AsyncSessionMaker
+from pyus.kit.responses import ORJSONResponse
 from pyus.openapi import APITag
 from pyus.redis import Redis, get_redis
-from pyus.sqlite import get_db_read_session, get_db_session
+from pyus.sqlite import get_db_read_session, get_db_session, get_db_sessionmaker
+from pyus.url_shortening.filter import short_code_filter
 from pyus.url_shortening.schemas import ShortenedUrl as ShortenedUrlSchema
-from pyus.url_shortening.schemas import ShortenedUrlCreate
+from pyus.url_shortening.schemas import (
+    ShortenedUrlBatchCreate,
+    ShortenedUrlBatchResult,
+    ShortenedUrlCreate,
+    dump_shortened_url,
+)
 from pyus.url_shortening.service import url as url_service
 
 router = APIRouter(prefix="/urls", tags=["urls", APITag.public])
@@ -29,14 +36,63 @@ UrlExpired = {
     response_model=ShortenedUrlSchema,
     status_code=status.HTTP_201_CREATED,
     responses={201: {"description": "Shortened URL created."}},
+    response_class=ORJSONResponse,
 )
 async def create(
     url_create: ShortenedUrlCreate,
     session: AsyncSession = Depends(get_db_session),
+    sessionmaker: AsyncSessionMaker = Depends(get_db_sessionmaker),
     redis: Redis = Depends(get_redis),
-) -> ShortenedUrl:
+) -> ORJSONResponse:
     """Create a shortened URL."""
-    return await url_service.create(session, redis, url_create)
+    url = await url_service.create(session, sessionmaker, redis, url_create)
+    # Returning a response skips the response model: `url` is ours, no need to
+    # validate it again. The model still documents the response.
+    return ORJSONResponse(dump_shortened_url(url), status_code=status.HTTP_201_CREATED)
+
+
+@router.post(
+    "/batch",
+    summary="Create Shortened URLs in Batch",
+    response_model=list[ShortenedUrlBatchResult],
+    responses={200: {"description": "Results, in the same order as the input."}},
+)
+async def create_batch(
+    batch_create: ShortenedUrlBatchCreate,
+    session: AsyncSession = Depends(get_db_session),
+    sessionmaker: AsyncSessionMaker = Depends(get_db_sessionmaker),
+    redis: Redis = Depends(get_redis),
+) -> list[ShortenedUrlBatchResult]:
+    """
+    Create shortened URLs in batch, in a single transaction.
+
+    With sharding, every database shard commits its own transaction, and a
+    shard failing to commit after others did leaves the batch partly created.
+    """
+    results: list[ShortenedUrlBatchResult] = []
+    valid: list[tuple[ShortenedUrlBatchResult, ShortenedUrlCreate]] = []
+    for item in batch_create.urls:
+        result = ShortenedUrlBatchResult()
+        results.append(result)
+        try:
+            valid.append((result, ShortenedUrlCreate.model_validate(item)))
+        except ValidationError as e:
+            result.error = "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                for error in e.errors(include_url=False)
+            )
+
+    if valid:
+        urls = await url_service.create_many(
+            session,
+            sessionmaker,
+            redis,
+            [create_schema for _, create_schema in valid],
+        )
+        for (result, _), url in zip(valid, urls):
+            result.url = ShortenedUrlSchema.model_validate(url)
+
+    return results
 
 
 @router.get(
@@ -44,15 +100,19 @@ async def create(
     summary="Get Shortened URL",
     response_model=ShortenedUrlSchema,
     responses={404: UrlNotFound},
+    response_class=ORJSONResponse,
 )
 async def get(
     short_code: str,
     session: AsyncReadSession = Depends(get_db_read_session),
-) -> ShortenedUrl:
+) -> ORJSONResponse:
     """Get a Shortened URL by its short code."""
+    if short_code not in short_code_filter:
+        raise ResourceNotFound()
+
     url = await url_service.get(session, short_code)
 
     if url is None:
         raise ResourceNotFound()
 
-    return url
+    return ORJSONResponse(dump_shortened_url(url))
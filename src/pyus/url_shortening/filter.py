@@ -0,0 +1,81 @@
+from collections.abc import AsyncIterable, Iterable
+
+from pyus.config import settings
+from pyus.kit.bloom import BloomFilter
+
+
+class ShortCodeFilter:
+    """
+    Membership filter of every short code stored in the database.
+
+    It answers "definitely not present" without any I/O, so unknown codes can
+    be rejected before touching Redis or SQLite. Until it's opened, or when
+    it's disabled, every code is reported as possibly present.
+
+    The filter is shared by the workers of a host, through its file, but not
+    across hosts: a host would reject the codes created on another one. Only
+    enable it when every worker runs on the same host.
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool,
+        capacity: int,
+        error_rate: float,
+        path: str | None,
+    ) -> None:
+        self.enabled = enabled
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.path = path
+        self._bloom: BloomFilter | None = None
+
+    async def open(self, short_codes: AsyncIterable[str]) -> None:
+        """Open the shared filter and add every existing short code to it."""
+        if not self.enabled:
+            return
+
+        # Build in private memory, then OR into the shared filter, so bits set
+        # by other workers in the meantime are preserved.
+        snapshot = BloomFilter(self.capacity, self.error_rate)
+        batch: list[str] = []
+        async for short_code in short_codes:
+            batch.append(short_code)
+            if len(batch) >= 10_000:
+                snapshot.update(batch)
+                batch.clear()
+        snapshot.update(batch)
+
+        bloom = BloomFilter(self.capacity, self.error_rate, self.path)
+        bloom.merge(snapshot)
+        snapshot.close()
+        self._bloom = bloom
+
+    def close(self) -> None:
+        if self._bloom is not None:
+            self._bloom.close()
+            self._bloom = None
+
+    def add(self, short_code: str) -> None:
+        if self._bloom is not None:
+            self._bloom.add(short_code)
+
+    def update(self, short_codes: Iterable[str]) -> None:
+        if self._bloom is not None:
+            self._bloom.update(short_codes)
+
+    def __contains__(self, short_code: str) -> bool:
+        return self._bloom is None or short_code in self._bloom
+
+    @property
+    def bloom(self) -> BloomFilter | None:
+        return self._bloom
+
+
+short_code_filter = ShortCodeFilter(
+    enabled=settings.SHORT_CODE_FILTER_ENABLED,
+    capacity=settings.SHORT_CODE_FILTER_CAPACITY,
+    error_rate=settings.SHORT_CODE_FILTER_ERROR_RATE,
+    path=settings.SHORT_CODE_FILTER_PATH,
+)
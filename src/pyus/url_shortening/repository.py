@@ -1,8 +1,124 @@
+from collections.abc import Sequence
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import Select, bindparam, func, or_, select
+
 from pyus.kit.repository.base import RepositoryBase, RepositorySoftDeletionMixin
+from pyus.kit.utils import utc_now
 from pyus.models.url import ShortenedUrl
+from pyus.models.url_clicks import ShortenedUrlClicks
+from pyus.sharding import SHARDED, for_shard, get_shard_id, group_by_shard
+
+
+class RedirectTarget(NamedTuple):
+    original_url: str
+    expires_at: datetime | None
+
+
+_urls = ShortenedUrl.__table__
+_get_redirect_target_statement = select(_urls.c.original_url, _urls.c.expires_at).where(
+    _urls.c.short_code == bindparam("short_code"),
+    _urls.c.deleted_at.is_(None),
+)
 
 
 class ShortenedUrlRepository(
     RepositorySoftDeletionMixin[ShortenedUrl], RepositoryBase[ShortenedUrl]
 ):
     model = ShortenedUrl
+
+    async def get_taken_short_codes(self, short_codes: Sequence[str]) -> set[str]:
+        taken: set[str] = set()
+        # Only look for each short code in its own shard
+        for shard_id, shard_short_codes in group_by_shard(
+            short_codes, lambda short_code: short_code
+        ).items():
+            statement = (
+                self.get_base_statement(include_deleted=True)
+                .with_only_columns(ShortenedUrl.short_code)
+                .where(ShortenedUrl.short_code.in_(shard_short_codes))
+            )
+            taken.update(await self.session.scalars(for_shard(statement, shard_id)))
+        return taken
+
+    async def get_redirect_target(self, short_code: str) -> RedirectTarget | None:
+        """Get what a redirect needs of a URL, skipping the ORM entirely."""
+        row = await self.get_row(
+            _get_redirect_target_statement,
+            {"short_code": short_code},
+            shard_id=get_shard_id(short_code) if SHARDED else None,
+        )
+        return RedirectTarget._make(row) if row is not None else None
+
+    def get_active_statement(self) -> Select[tuple[ShortenedUrl]]:
+        return self.get_base_statement().where(
+            or_(
+                ShortenedUrl.expires_at.is_(None),
+                ShortenedUrl.expires_at > utc_now(),
+            ),
+        )
+
+    async def get_all_active_by_original_url_digests(
+        self, digests: Sequence[bytes]
+    ) -> Sequence[ShortenedUrl]:
+        statement = self.get_active_statement().where(
+            ShortenedUrl.original_url_digest.in_(digests)
+        )
+        return await self.get_all(statement)
+
+    def get_most_recent_redirects_statement(
+        self, *, limit: int
+    ) -> Select[tuple[str, str, datetime | None, datetime]]:
+        """Select the most recent redirects, with their creation date last."""
+        return (
+            self.get_active_statement()
+            .with_only_columns(
+                ShortenedUrl.short_code,
+                ShortenedUrl.original_url,
+                ShortenedUrl.expires_at,
+                ShortenedUrl.created_at,
+            )
+            .order_by(ShortenedUrl.created_at.desc())
+            .limit(limit)
+        )
+
+    def get_most_clicked_redirects_statement(
+        self, *, clicked_since: datetime, limit: int
+    ) -> Select[tuple[str, str, datetime | None, int]]:
+        """Select the most clicked redirects, with their number of clicks last."""
+        clicks = (
+            select(
+                ShortenedUrlClicks.short_code,
+                func.sum(ShortenedUrlClicks.clicks).label("clicks"),
+            )
+            .where(ShortenedUrlClicks.bucket >= clicked_since)
+            .group_by(ShortenedUrlClicks.short_code)
+            .subquery()
+        )
+        return (
+            self.get_active_statement()
+            .with_only_columns(
+                ShortenedUrl.short_code,
+                ShortenedUrl.original_url,
+                ShortenedUrl.expires_at,
+                clicks.c.clicks,
+            )
+            .join(clicks, clicks.c.short_code == ShortenedUrl.short_code)
+            .order_by(clicks.c.clicks.desc())
+            .limit(limit)
+        )
+
+    async def get_all_expired(
+        self, expired_before: datetime, *, limit: int
+    ) -> Sequence[ShortenedUrl]:
+        statement = (
+            self.get_base_statement()
+            .where(
+                ShortenedUrl.expires_at.is_not(None),
+                ShortenedUrl.expires_at <= expired_before,
+            )
+            .order_by(ShortenedUrl.expires_at)
+            .limit(limit)
+        )
+        return await self.get_all(statement)
@@ -1,6 +1,9 @@
 from datetime import datetime
-from pydantic import UUID4, Field, HttpUrl, field_validator
+from typing import Annotated, Any
 
+from pydantic import UUID4, BeforeValidator, Field, HttpUrl, field_validator
+
+from pyus.config import settings
 from pyus.kit.schemas import IDSchema, Schema, TimestampedSchema
 
 
@@ -17,6 +20,19 @@ class ShortenedUrl(ShortenedUrlBase):
     short_code: str = Field(description="Generated short code")
 
 
+_SHORTENED_URL_FIELDS = tuple(ShortenedUrl.model_fields)
+
+
+def dump_shortened_url(url: Any) -> dict[str, Any]:
+    """
+    Dump a URL as `ShortenedUrl` would, skipping its validation.
+
+    Only for URLs we stored ourselves, which have been validated on creation:
+    the values are taken as they are, for an `ORJSONResponse` to serialize.
+    """
+    return {field: getattr(url, field) for field in _SHORTENED_URL_FIELDS}
+
+
 class ShortenedUrlCreate(Schema):
     original_url: HttpUrl = Field(description="Original URL.")
     expires_at: datetime | None = Field(
@@ -28,3 +44,31 @@ class ShortenedUrlCreate(Schema):
     @classmethod
     def convert_url_to_string(cls, v):
         return str(v) if isinstance(v, HttpUrl) else v
+
+
+# Batch items are validated by the endpoint, one by one, but documented as the
+# creations they are: the no-op validator only lends them its schema
+ShortenedUrlBatchItem = Annotated[
+    dict[str, Any],
+    BeforeValidator(lambda value: value, json_schema_input_type=ShortenedUrlCreate),
+]
+
+
+class ShortenedUrlBatchCreate(Schema):
+    urls: list[ShortenedUrlBatchItem] = Field(
+        description=(
+            "URLs to shorten. Each item has the same shape as a single creation "
+            "and is validated on its own, so one invalid item doesn't fail the batch."
+        ),
+        min_length=1,
+        max_length=settings.URL_BATCH_MAX_SIZE,
+    )
+
+
+class ShortenedUrlBatchResult(Schema):
+    url: ShortenedUrl | None = Field(
+        description="Shortened URL, if the item was created.", default=None
+    )
+    error: str | None = Field(
+        description="Why the item couldn't be created.", default=None
+    )
@@ -1,12 +1,48 @@
-from pyus.kit.db.sqlite import AsyncReadSession, AsyncSession
-from pyus.kit.id import generate_short_code
+import asyncio
+import contextlib
+import functools
+import operator
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import datetime, timedelta
+from typing import Literal
+
+from pydantic import HttpUrl
+from redis import RedisError
+
+from pyus.config import settings
+from pyus.exceptions import InternalServerError
+from pyus.kit.coalescer import WriteCoalescer
+from pyus.kit.db.sqlite import (
+    AsyncReadSession,
+    AsyncSession,
+    AsyncSessionMaker,
+    after_commit,
+    commit,
+)
+from pyus.kit.id import generate_short_codes
+from pyus.kit.utils import as_utc, merge_sorted, utc_now
+from pyus.metrics import (
+    SERVICE_CREATE,
+    SERVICE_CREATE_MANY,
+    SERVICE_GET,
+    SERVICE_GET_REDIRECT,
+)
 from pyus.models.url import ShortenedUrl
+from pyus.redirection.cache import redirect_cache
 from pyus.redis import Redis
-from pyus.url_shortening.repository import ShortenedUrlRepository
+from pyus.sharding import SHARD_IDS, SHARDED, for_shard, group_by_shard, route
+from pyus.url_shortening.filter import short_code_filter
+from pyus.url_shortening.repository import RedirectTarget, ShortenedUrlRepository
+from pyus.url_shortening.schemas import ShortenedUrl as ShortenedUrlSchema
 from pyus.url_shortening.schemas import ShortenedUrlCreate
 
 
 class ShortenedUrlService:
+    def __init__(self) -> None:
+        self._creating: dict[
+            tuple[str, datetime | None], asyncio.Task[list[ShortenedUrl]]
+        ] = {}
+
     async def get(
         self, session: AsyncReadSession, short_code: str
     ) -> ShortenedUrl | None:
@@ -14,18 +50,137 @@ class ShortenedUrlService:
         statement = repository.get_base_statement().where(
             ShortenedUrl.short_code == short_code
         )
-        return await repository.get_one_or_none(statement)
+        with SERVICE_GET.time():
+            return await repository.get_one_or_none(route(statement, short_code))
+
+    async def get_redirect_target(
+        self, session: AsyncReadSession, short_code: str
+    ) -> RedirectTarget | None:
+        repository = ShortenedUrlRepository.from_session(session)
+        with SERVICE_GET_REDIRECT.time():
+            return await repository.get_redirect_target(short_code)
+
+    async def stream_short_codes(
+        self, session: AsyncReadSession, *, batch_size: int = 10_000
+    ) -> AsyncIterator[str]:
+        repository = ShortenedUrlRepository.from_session(session)
+        statement = (
+            repository.get_base_statement()
+            .with_only_columns(ShortenedUrl.short_code)
+            .execution_options(yield_per=batch_size)
+        )
+        async for short_code in await session.stream_scalars(statement):
+            yield short_code
+
+    async def stream_redirects(
+        self,
+        session: AsyncReadSession,
+        *,
+        order: Literal["recent", "clicks"],
+        limit: int,
+        clicks_window: int = 7 * 24 * 3600,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[tuple[str, str, datetime | None]]:
+        """
+        Stream the `(short_code, original_url, expires_at)` of active URLs.
+
+        With sharding, every shard is streamed in order, and the streams are
+        merged so the limit applies to all the URLs, not to each shard.
+
+        Args:
+            order: Whether to stream the most recently created URLs first, or
+            the most clicked ones over the last `clicks_window` seconds.
+            limit: Maximum number of URLs.
+        """
+        repository = ShortenedUrlRepository.from_session(session)
+        if order == "recent":
+            statement = repository.get_most_recent_redirects_statement(limit=limit)
+        else:
+            statement = repository.get_most_clicked_redirects_statement(
+                clicked_since=utc_now() - timedelta(seconds=clicks_window),
+                limit=limit,
+            )
+
+        statement = statement.execution_options(yield_per=batch_size)
+        results = [
+            await session.stream(for_shard(statement, shard_id))
+            for shard_id in (SHARD_IDS if SHARDED else [None])
+        ]
+        try:
+            streamed = 0
+            # Rows are in descending order of their last column
+            async for short_code, original_url, expires_at, _ in merge_sorted(
+                results, key=operator.itemgetter(3), reverse=True
+            ):
+                yield short_code, original_url, expires_at
+                streamed += 1
+                if streamed >= limit:
+                    return
+        finally:
+            for result in results:
+                await result.close()
+
+    async def soft_delete_expired(
+        self, session: AsyncSession, *, expired_before: datetime, limit: int
+    ) -> list[str]:
+        """
+        Soft-delete up to `limit` URLs expired before `expired_before`.
+
+        Returns:
+            The short codes of the deleted URLs.
+        """
+        repository = ShortenedUrlRepository.from_session(session)
+        urls = await repository.get_all_expired(expired_before, limit=limit)
+        for url in urls:
+            await repository.soft_delete(url)
+        await session.flush()
+        return [url.short_code for url in urls]
 
     async def create(
-        self, session: AsyncSession, redis: Redis, create_schema: ShortenedUrlCreate
+        self,
+        session: AsyncSession,
+        sessionmaker: AsyncSessionMaker,
+        redis: Redis,
+        create_schema: ShortenedUrlCreate,
+    ) -> ShortenedUrl:
+        with SERVICE_CREATE.time():
+            return await self._create(session, sessionmaker, redis, create_schema)
+
+    async def _create(
+        self,
+        session: AsyncSession,
+        sessionmaker: AsyncSessionMaker,
+        redis: Redis,
+        create_schema: ShortenedUrlCreate,
     ) -> ShortenedUrl:
+        if settings.URL_DEDUP_ENABLED:
+            if (url := await self._get_cached_duplicate(redis, create_schema)) is None:
+                create_many = (
+                    self._create_many_group_committed
+                    if url_create_coalescer.running
+                    else functools.partial(
+                        self._create_many_committed, sessionmaker, redis
+                    )
+                )
+                (url,) = await self._create_shared([create_schema], create_many)
+            await self._cache_duplicate(redis, url)
+            return url
+
+        if url_create_coalescer.running:
+            return await url_create_coalescer.submit(create_schema)
+
         repository = ShortenedUrlRepository.from_session(session)
 
-        short_code = await generate_short_code(create_schema.original_url, redis)
+        (short_code,) = await self._generate_short_codes(
+            repository, redis, [create_schema.original_url]
+        )
 
         url = await repository.create(
             ShortenedUrl(
                 short_code=short_code,
+                original_url_digest=ShortenedUrl.get_original_url_digest(
+                    create_schema.original_url
+                ),
                 **create_schema.model_dump(),
             ),
             flush=True,
@@ -33,7 +188,317 @@ class ShortenedUrlService:
 
         await session.flush()
 
+        # Read now, the commit expires them
+        short_code, original_url, expires_at = (
+            url.short_code,
+            url.original_url,
+            url.expires_at,
+        )
+
+        async def publish() -> None:
+            short_code_filter.add(short_code)
+            # Newly created URLs are often visited right away
+            await redirect_cache.set(redis, short_code, original_url, expires_at)
+
+        # Only cache the URL once it's committed, not to serve redirects to a
+        # row a failed commit never wrote
+        after_commit(session, publish)
+
         return url
 
+    async def _create_many_group_committed(
+        self, create_schemas: list[ShortenedUrlCreate]
+    ) -> list[ShortenedUrl]:
+        return await asyncio.gather(*map(url_create_coalescer.submit, create_schemas))
+
+    async def _create_many_committed(
+        self,
+        sessionmaker: AsyncSessionMaker,
+        redis: Redis,
+        create_schemas: list[ShortenedUrlCreate],
+    ) -> list[ShortenedUrl]:
+        # The callers read the URLs once the session is gone
+        async with sessionmaker(expire_on_commit=False) as session:
+            urls = await self._create_many(session, redis, create_schemas)
+            await commit(session)
+        return urls
+
+    async def _create_shared(
+        self,
+        create_schemas: list[ShortenedUrlCreate],
+        create_many: Callable[
+            [list[ShortenedUrlCreate]], Awaitable[list[ShortenedUrl]]
+        ],
+    ) -> list[ShortenedUrl]:
+        """
+        Create URLs with `create_many`, sharing the creations in progress.
+
+        Concurrent requests to shorten the same URL would all miss the existing
+        one, and each create their own. Instead, the URLs are created, and
+        committed, by a task that the identical requests coming in meanwhile
+        wait for. This only covers the current process.
+        """
+        keys = [
+            self._get_dedup_key(create_schema.original_url, create_schema.expires_at)
+            for create_schema in create_schemas
+        ]
+        tasks = {
+            key: task for key in keys if (task := self._creating.get(key)) is not None
+        }
+        missing = {
+            key: create_schema
+            for key, create_schema in zip(keys, create_schemas)
+            if key not in tasks
+        }
+        if missing:
+            task = asyncio.create_task(create_many(list(missing.values())))
+            for key in missing:
+                self._creating[key] = tasks[key] = task
+
+            def done(_: asyncio.Task[list[ShortenedUrl]]) -> None:
+                for key in missing:
+                    del self._creating[key]
+
+            task.add_done_callback(done)
+
+        urls: dict[tuple[str, datetime | None], ShortenedUrl] = {}
+        for task in set(tasks.values()):
+            # Cancelling a request doesn't cancel the others sharing the task
+            for url in await asyncio.shield(task):
+                urls[self._get_dedup_key(url.original_url, url.expires_at)] = url
+        return [urls[key] for key in keys]
+
+    async def run_group_commit(
+        self, sessionmaker: AsyncSessionMaker, redis: Redis
+    ) -> None:
+        """
+        Create the URLs submitted by `create` in batches, until cancelled.
+
+        While this runs, `create` no longer writes through the request session:
+        concurrent calls are inserted together, in one transaction, by this task.
+        """
+
+        async def create_many(
+            create_schemas: list[ShortenedUrlCreate],
+        ) -> list[ShortenedUrl]:
+            with SERVICE_CREATE_MANY.time():
+                return await self._create_many_committed(
+                    sessionmaker, redis, create_schemas
+                )
+
+        await url_create_coalescer.run(create_many)
+
+    async def create_many(
+        self,
+        session: AsyncSession,
+        sessionmaker: AsyncSessionMaker,
+        redis: Redis,
+        create_schemas: list[ShortenedUrlCreate],
+    ) -> list[ShortenedUrl]:
+        """
+        Create URLs in batch, in a single transaction.
+
+        With sharding, it's a transaction per shard: SQLite can't commit several
+        database files atomically in WAL mode. Every row is inserted before any
+        shard commits, so insert errors still roll back the whole batch, but a
+        shard failing to commit after others did leaves it partly created.
+        """
+        with SERVICE_CREATE_MANY.time():
+            if settings.URL_DEDUP_ENABLED:
+                return await self._create_shared(
+                    create_schemas,
+                    functools.partial(self._create_many_committed, sessionmaker, redis),
+                )
+            return await self._create_many(session, redis, create_schemas)
+
+    async def _create_many(
+        self,
+        session: AsyncSession,
+        redis: Redis,
+        create_schemas: list[ShortenedUrlCreate],
+    ) -> list[ShortenedUrl]:
+        repository = ShortenedUrlRepository.from_session(session)
+
+        urls: list[ShortenedUrl | None] = [None] * len(create_schemas)
+        if settings.URL_DEDUP_ENABLED:
+            urls = await self._get_duplicates(repository, create_schemas)
+
+        # With dedup, identical items of the batch share the same new URL
+        pending: dict[object, list[int]] = {}
+        for index, (url, create_schema) in enumerate(zip(urls, create_schemas)):
+            if url is not None:
+                continue
+            key = (
+                self._get_dedup_key(
+                    create_schema.original_url, create_schema.expires_at
+                )
+                if settings.URL_DEDUP_ENABLED
+                else index
+            )
+            pending.setdefault(key, []).append(index)
+
+        indexes = [item_indexes[0] for item_indexes in pending.values()]
+        short_codes = await self._generate_short_codes(
+            repository,
+            redis,
+            [create_schemas[index].original_url for index in indexes],
+        )
+
+        created_at = utc_now()
+        values = [
+            {
+                "id": ShortenedUrl.generate_id(),
+                "created_at": created_at,
+                "short_code": short_code,
+                "original_url_digest": ShortenedUrl.get_original_url_digest(
+                    create_schemas[index].original_url
+                ),
+                **create_schemas[index].model_dump(),
+            }
+            for short_code, index in zip(short_codes, indexes)
+        ]
+        for shard_id, shard_values in group_by_shard(
+            values, lambda value: value["short_code"]
+        ).items():
+            await repository.create_many(shard_values, shard_id=shard_id)
+
+        async def publish() -> None:
+            short_code_filter.update(short_codes)
+            await redirect_cache.set_many(
+                redis,
+                (
+                    (value["short_code"], value["original_url"], value["expires_at"])
+                    for value in values
+                ),
+            )
+
+        # Only cache the URLs once they're committed, not to serve redirects to
+        # rows a failed commit never wrote
+        after_commit(session, publish)
+
+        for item_indexes, value in zip(pending.values(), values):
+            url = ShortenedUrl(**value)
+            for index in item_indexes:
+                urls[index] = url
+
+        return [url for url in urls if url is not None]
+
+    def _get_dedup_key(
+        self, original_url: str, expires_at: datetime | None
+    ) -> tuple[str, datetime | None]:
+        return original_url, as_utc(expires_at) if expires_at is not None else None
+
+    async def _get_duplicates(
+        self,
+        repository: ShortenedUrlRepository,
+        create_schemas: list[ShortenedUrlCreate],
+    ) -> list[ShortenedUrl | None]:
+        """
+        Find the existing, non-expired, URLs identical to the ones to create.
+
+        A URL is identical if it has the same original URL and the same
+        expiration date.
+        """
+        digests = {
+            ShortenedUrl.get_original_url_digest(create_schema.original_url)
+            for create_schema in create_schemas
+        }
+        existing = {
+            self._get_dedup_key(url.original_url, url.expires_at): url
+            for url in await repository.get_all_active_by_original_url_digests(
+                list(digests)
+            )
+        }
+        return [
+            existing.get(
+                self._get_dedup_key(
+                    create_schema.original_url, create_schema.expires_at
+                )
+            )
+            for create_schema in create_schemas
+        ]
+
+    def _get_dedup_cache_key(
+        self, original_url: str, expires_at: datetime | None
+    ) -> str:
+        digest = ShortenedUrl.get_original_url_digest(original_url).hex()
+        if expires_at is None:
+            return f"dedup:{digest}"
+        return f"dedup:{digest}:{as_utc(expires_at).timestamp()}"
+
+    async def _get_cached_duplicate(
+        self, redis: Redis, create_schema: ShortenedUrlCreate
+    ) -> ShortenedUrl | None:
+        try:
+            cached = await redis.get(
+                self._get_dedup_cache_key(
+                    create_schema.original_url, create_schema.expires_at
+                )
+            )
+        except RedisError:
+            # The database is checked next anyway
+            return None
+        if cached is None:
+            return None
+
+        url = ShortenedUrlSchema.model_validate_json(cached)
+        if str(url.original_url) != create_schema.original_url:
+            return None
+
+        return ShortenedUrl(
+            id=url.id,
+            created_at=url.created_at,
+            modified_at=url.modified_at,
+            expires_at=url.expires_at,
+            original_url=create_schema.original_url,
+            short_code=url.short_code,
+        )
+
+    async def _cache_duplicate(self, redis: Redis, url: ShortenedUrl) -> None:
+        ttl = float(settings.URL_DEDUP_CACHE_TTL)
+        if url.expires_at is not None:
+            ttl = min(ttl, (as_utc(url.expires_at) - utc_now()).total_seconds())
+        if ttl <= 0:
+            return
+
+        with contextlib.suppress(RedisError):
+            await redis.set(
+                self._get_dedup_cache_key(url.original_url, url.expires_at),
+                ShortenedUrlSchema.model_validate(url).model_dump_json(),
+                px=max(int(ttl * 1000), 1),
+            )
+
+    async def _generate_short_codes(
+        self, repository: ShortenedUrlRepository, redis: Redis, urls: list[HttpUrl]
+    ) -> list[str]:
+        short_codes, collision_free = await generate_short_codes(urls, redis)
+        if collision_free:
+            return short_codes
+
+        for _ in range(settings.SHORT_CODE_MAX_ATTEMPTS):
+            taken = await repository.get_taken_short_codes(short_codes)
+            seen: set[str] = set()
+            collisions: list[int] = []
+            for index, short_code in enumerate(short_codes):
+                if short_code in taken or short_code in seen:
+                    collisions.append(index)
+                seen.add(short_code)
+
+            if not collisions:
+                return short_codes
+
+            retries, _ = await generate_short_codes(
+                [urls[index] for index in collisions], redis
+            )
+            for index, short_code in zip(collisions, retries):
+                short_codes[index] = short_code
+
+        raise InternalServerError("Could not generate a unique short code.")
+
+
+url_create_coalescer = WriteCoalescer[ShortenedUrlCreate, ShortenedUrl](
+    max_latency=settings.URL_GROUP_COMMIT_MAX_LATENCY,
+    max_size=settings.URL_GROUP_COMMIT_MAX_SIZE,
+)
 
 url = ShortenedUrlService()
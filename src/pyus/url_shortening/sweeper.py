@@ -0,0 +1,87 @@
+import asyncio
+from datetime import timedelta
+
+import structlog
+from redis import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+
+from pyus.config import settings
+from pyus.kit.db.sqlite import AsyncSessionMaker
+from pyus.kit.utils import utc_now
+from pyus.redirection.cache import redirect_cache
+from pyus.redis import Redis
+from pyus.url_shortening.service import url as url_service
+
+log = structlog.get_logger()
+
+
+class ExpiredUrlSweeper:
+    """
+    Periodically soft-delete expired URLs and evict them from the redirect cache.
+
+    URLs are deleted in chunks of `chunk_size`, each in its own short
+    transaction, pausing `chunk_pause` seconds in between so the SQLite write
+    lock is regularly released to URL creations.
+
+    URLs are only swept `grace_period` seconds after they expire, until then
+    they're still reported as expired rather than not found.
+
+    Args:
+        interval: Time between two sweeps, in seconds.
+        grace_period: Time after expiration before a URL is swept, in seconds.
+        chunk_size: Maximum number of URLs deleted per transaction.
+        chunk_pause: Time between two chunks, in seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float,
+        grace_period: int,
+        chunk_size: int,
+        chunk_pause: float,
+    ) -> None:
+        self.interval = interval
+        self.grace_period = grace_period
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+
+    async def sweep(self, sessionmaker: AsyncSessionMaker, redis: Redis) -> int:
+        expired_before = utc_now() - timedelta(seconds=self.grace_period)
+        deleted = 0
+        while True:
+            async with sessionmaker() as session:
+                short_codes = await url_service.soft_delete_expired(
+                    session, expired_before=expired_before, limit=self.chunk_size
+                )
+                await session.commit()
+
+            # Evict only once committed, otherwise a concurrent miss could cache
+            # them again
+            await redirect_cache.invalidate(redis, *short_codes)
+
+            deleted += len(short_codes)
+            if len(short_codes) < self.chunk_size:
+                return deleted
+
+            await asyncio.sleep(self.chunk_pause)
+
+    async def run(self, sessionmaker: AsyncSessionMaker, redis: Redis) -> None:
+        """Sweep every `interval` seconds, until cancelled."""
+        while True:
+            try:
+                deleted = await self.sweep(sessionmaker, redis)
+            except (SQLAlchemyError, RedisError) as e:
+                log.warning("expired_url_sweep.error", error=str(e))
+            else:
+                log.info("expired_url_sweep.done", deleted=deleted)
+
+            await asyncio.sleep(self.interval)
+
+
+expired_url_sweeper = ExpiredUrlSweeper(
+    interval=settings.EXPIRED_URL_SWEEP_INTERVAL,
+    grace_period=settings.EXPIRED_URL_SWEEP_GRACE_PERIOD,
+    chunk_size=settings.EXPIRED_URL_SWEEP_CHUNK_SIZE,
+    chunk_pause=settings.EXPIRED_URL_SWEEP_CHUNK_PAUSE,
+)
@@ -0,0 +1,44 @@
+import asyncio
+import signal
+
+import structlog
+import uvloop
+
+from pyus import logging
+from pyus.analytics.consumer import click_rollup_consumer
+from pyus.redis import create_redis
+from pyus.sqlite import (
+    create_async_engines,
+    create_async_sessionmaker,
+    dispose_async_engines,
+)
+
+log = structlog.get_logger()
+
+
+async def main() -> None:
+    log.info("worker.starting")
+
+    async_engines = create_async_engines("worker")
+    async_sessionmaker = create_async_sessionmaker(async_engines)
+    redis = create_redis("worker")
+
+    task = asyncio.create_task(click_rollup_consumer.run(redis, async_sessionmaker))
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, task.cancel)
+
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await redis.close(True)
+        await dispose_async_engines(async_engines)
+
+    log.info("worker.stopped")
+
+
+if __name__ == "__main__":
+    logging.configure()
+    uvloop.run(main())
@@ -0,0 +1,119 @@
+import asyncio
+import contextlib
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from redis import ConnectionError
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from pyus.analytics.consumer import ClickRollupConsumer
+from pyus.analytics.service import clicks as clicks_service
+from pyus.kit.db.sqlite import AsyncSessionMaker
+from pyus.models.url_clicks import ShortenedUrlClicks
+from pyus.redis import Redis
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis(redis: Redis, monkeypatch: pytest.MonkeyPatch) -> Redis:
+    """fakeredis doesn't block on empty reads, wait like Redis instead of spinning."""
+    xreadgroup = redis.xreadgroup
+
+    async def blocking_xreadgroup(*args: Any, block: int | None, **kwargs: Any) -> Any:
+        response = await xreadgroup(*args, block=block, **kwargs)
+        if block is not None and not response:
+            await asyncio.sleep(block / 1000)
+        return response
+
+    monkeypatch.setattr(redis, "xreadgroup", blocking_xreadgroup)
+    return redis
+
+
+@contextlib.asynccontextmanager
+async def running(redis: Redis, sessionmaker: AsyncSessionMaker) -> AsyncIterator[None]:
+    consumer = ClickRollupConsumer(
+        stream="clicks",
+        group="rollup",
+        consumer="test",
+        batch_size=100,
+        block=10,
+        claim_idle=60_000,
+        retry_interval=0.01,
+        max_retry_interval=0.01,
+    )
+    task = asyncio.create_task(consumer.run(redis, sessionmaker))
+    try:
+        yield
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+
+async def add_clicks(redis: Redis, count: int) -> None:
+    await redis.xadd("clicks", {"bucket": "3600", "clicks": json.dumps({"abc": count})})
+
+
+async def get_clicks(redis: Redis, sessionmaker: AsyncSessionMaker) -> int:
+    # Processed entries are deleted from the stream
+    async with asyncio.timeout(5):
+        while await redis.xlen("clicks"):
+            await asyncio.sleep(0.01)
+
+    async with sessionmaker() as session:
+        return await session.scalar(select(func.sum(ShortenedUrlClicks.clicks))) or 0
+
+
+async def test_process(redis: Redis, sessionmaker: AsyncSessionMaker) -> None:
+    await add_clicks(redis, 2)
+    await add_clicks(redis, 3)
+
+    async with running(redis, sessionmaker):
+        assert await get_clicks(redis, sessionmaker) == 5
+
+
+async def test_database_error(
+    redis: Redis, sessionmaker: AsyncSessionMaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    rollup = clicks_service.rollup
+    calls = 0
+
+    async def fail_once(*args: Any) -> None:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise OperationalError("INSERT", None, Exception("database is locked"))
+        await rollup(*args)
+
+    monkeypatch.setattr(clicks_service, "rollup", fail_once)
+    await add_clicks(redis, 2)
+
+    async with running(redis, sessionmaker):
+        # The failed batch is retried from the pending entries
+        assert await get_clicks(redis, sessionmaker) == 2
+    assert calls == 2
+
+
+async def test_redis_error(
+    redis: Redis, sessionmaker: AsyncSessionMaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    xreadgroup = redis.xreadgroup
+    calls = 0
+
+    async def fail_once(*args: Any, **kwargs: Any) -> Any:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ConnectionError
+        return await xreadgroup(*args, **kwargs)
+
+    monkeypatch.setattr(redis, "xreadgroup", fail_once)
+    await add_clicks(redis, 2)
+
+    async with running(redis, sessionmaker):
+        assert await get_clicks(redis, sessionmaker) == 2
+    assert calls > 1
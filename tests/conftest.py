@@ -0,0 +1,35 @@
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import fakeredis
+import pytest
+
+from pyus.kit.db.sqlite import AsyncSessionMaker, create_async_engine
+from pyus.models import Model
+from pyus.models.id_sequence import IdSequence  # noqa: F401
+from pyus.models.url import ShortenedUrl  # noqa: F401
+from pyus.models.url_clicks import ShortenedUrlClicks  # noqa: F401
+from pyus.redis import Redis
+from pyus.sharding import SHARD_IDS
+from pyus.sqlite import create_async_sessionmaker
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def redis() -> AsyncIterator[Redis]:
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    yield redis
+    await redis.aclose()
+
+
+@pytest.fixture
+async def sessionmaker(tmp_path: Path) -> AsyncIterator[AsyncSessionMaker]:
+    engine = create_async_engine(dsn=f"sqlite+aiosqlite:///{tmp_path}/pyus.db")
+    async with engine.begin() as connection:
+        await connection.run_sync(Model.metadata.create_all)
+    yield create_async_sessionmaker({SHARD_IDS[0]: engine})
+    await engine.dispose()
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from pyus.kit.bloom import BloomFilter
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> str:
+    return str(tmp_path / "filter")
+
+
+def test_lookup() -> None:
+    bloom = BloomFilter(1000, 0.01)
+    bloom.update(f"key-{i}" for i in range(1000))
+
+    assert all(f"key-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+    assert false_positives < 300
+
+
+def test_shared_file(path: str) -> None:
+    first = BloomFilter(1000, 0.01, path=path)
+    second = BloomFilter(1000, 0.01, path=path)
+
+    first.add("key")
+
+    assert "key" in second
+
+
+def test_reopen(path: str) -> None:
+    bloom = BloomFilter(1000, 0.01, path=path)
+    bloom.add("key")
+    bloom.close()
+
+    reopened = BloomFilter(1000, 0.01, path=path)
+
+    assert "key" in reopened
+    assert "other" not in reopened
+
+
+def test_reopen_with_other_parameters(path: str) -> None:
+    old = BloomFilter(1000, 0.01, path=path)
+    old.add("key")
+    old.close()
+
+    new = BloomFilter(2000, 0.01, path=path)
+
+    assert "key" not in new
+    assert new.num_bits == BloomFilter(2000, 0.01).num_bits
+
+
+def test_reopen_in_use_with_other_parameters(path: str) -> None:
+    old = BloomFilter(1000, 0.01, path=path)
+    old.add("key")
+
+    with pytest.raises(RuntimeError):
+        BloomFilter(2000, 0.01, path=path)
+
+    # The file is left untouched for the processes still using it
+    old.add("other")
+    assert "key" in old
+    assert "other" in old
+    old.close()
+    assert "key" not in BloomFilter(2000, 0.01, path=path)
+
+
+def test_merge_other_parameters() -> None:
+    with pytest.raises(ValueError):
+        BloomFilter(1000, 0.01).merge(BloomFilter(2000, 0.01))
@@ -0,0 +1,108 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+
+import pytest
+
+from pyus.kit.coalescer import WriteCoalescer
+
+pytestmark = pytest.mark.anyio
+
+Handler = Callable[[list[int]], Awaitable[Sequence[int]]]
+
+
+async def start(coalescer: WriteCoalescer[int, int], handler: Handler) -> asyncio.Task:
+    task = asyncio.create_task(coalescer.run(handler))
+    await asyncio.sleep(0)
+    return task
+
+
+async def stop(task: asyncio.Task) -> None:
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+async def test_batches() -> None:
+    batches: list[list[int]] = []
+
+    async def handler(items: list[int]) -> list[int]:
+        batches.append(items)
+        return [item * 2 for item in items]
+
+    coalescer = WriteCoalescer[int, int](max_latency=0.01, max_size=3)
+    task = await start(coalescer, handler)
+
+    results = await asyncio.gather(*(coalescer.submit(item) for item in range(5)))
+
+    assert results == [0, 2, 4, 6, 8]
+    assert batches == [[0, 1, 2], [3, 4]]
+    assert coalescer.stats.batches == 2
+    assert coalescer.stats.commits_saved == 3
+    await stop(task)
+
+
+async def test_handler_error() -> None:
+    async def handler(items: list[int]) -> list[int]:
+        raise ValueError
+
+    coalescer = WriteCoalescer[int, int](max_latency=0.01, max_size=10)
+    task = await start(coalescer, handler)
+
+    results = await asyncio.gather(
+        coalescer.submit(1), coalescer.submit(2), return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert coalescer.stats.failed_batches == 1
+    await stop(task)
+
+
+async def test_cancelled_submit() -> None:
+    batches: list[list[int]] = []
+    handling = asyncio.Event()
+    release = asyncio.Event()
+
+    async def handler(items: list[int]) -> list[int]:
+        batches.append(items)
+        handling.set()
+        await release.wait()
+        return items
+
+    coalescer = WriteCoalescer[int, int](max_latency=0.01, max_size=10)
+    task = await start(coalescer, handler)
+
+    cancelled = asyncio.create_task(coalescer.submit(1))
+    other = asyncio.create_task(coalescer.submit(2))
+    await handling.wait()
+    cancelled.cancel()
+    release.set()
+
+    # The item is still written, and the rest of the batch isn't affected
+    assert await other == 2
+    assert cancelled.cancelled()
+    assert batches == [[1, 2]]
+    await stop(task)
+
+
+async def test_stop_cancels_pending() -> None:
+    release = asyncio.Event()
+
+    async def handler(items: list[int]) -> list[int]:
+        await release.wait()
+        return items
+
+    coalescer = WriteCoalescer[int, int](max_latency=0.01, max_size=1)
+    task = await start(coalescer, handler)
+
+    handled = asyncio.create_task(coalescer.submit(1))
+    queued = asyncio.create_task(coalescer.submit(2))
+    await asyncio.sleep(0.01)
+    await stop(task)
+
+    with pytest.raises(asyncio.CancelledError):
+        await handled
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    assert not coalescer.running
+    with pytest.raises(RuntimeError):
+        await coalescer.submit(3)
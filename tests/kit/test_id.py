@@ -0,0 +1,144 @@
+import itertools
+from collections.abc import Iterator
+
+import pytest
+from pydantic import HttpUrl
+
+from pyus.config import settings
+from pyus.exceptions import InternalServerError
+from pyus.kit.db.sqlite import AsyncSessionMaker, commit
+from pyus.kit.id import Base62ShortCodeStrategy, base62_decode, base62_encode
+from pyus.redis import Redis
+from pyus.url_shortening.repository import ShortenedUrlRepository
+from pyus.url_shortening.schemas import ShortenedUrlCreate
+from pyus.url_shortening.service import url as url_service
+
+URL = HttpUrl("https://example.com")
+
+
+class StubShortCodeStrategy:
+    def __init__(self, codes: Iterator[str], *, collision_free: bool) -> None:
+        self.codes = codes
+        self.collision_free = collision_free
+        self.generated = 0
+
+    def generate(self, url: HttpUrl, id: int) -> str:
+        self.generated += 1
+        return next(self.codes)
+
+
+@pytest.fixture
+async def taken(sessionmaker: AsyncSessionMaker, redis: Redis) -> str:
+    async with sessionmaker() as session:
+        url = await url_service.create(
+            session,
+            sessionmaker,
+            redis,
+            ShortenedUrlCreate.model_validate({"original_url": str(URL)}),
+        )
+        short_code = url.short_code
+        await commit(session)
+    return short_code
+
+
+async def generate(
+    sessionmaker: AsyncSessionMaker,
+    redis: Redis,
+    monkeypatch: pytest.MonkeyPatch,
+    strategy: StubShortCodeStrategy,
+    count: int = 1,
+) -> list[str]:
+    monkeypatch.setattr("pyus.kit.id.short_code_strategy", strategy)
+    async with sessionmaker() as session:
+        return await url_service._generate_short_codes(
+            ShortenedUrlRepository.from_session(session), redis, [URL] * count
+        )
+
+
+@pytest.mark.parametrize("value", [0, 1, 61, 62, 62**7 - 1, 62**7, 2**63])
+def test_base62_round_trip(value: int) -> None:
+    assert base62_decode(base62_encode(value, 7)) == value
+
+
+def test_base62_padding() -> None:
+    assert base62_encode(1, 7) == "0000001"
+
+
+@pytest.mark.parametrize("secret", [None, "secret"])
+def test_base62_strategy_bijective(secret: str | None) -> None:
+    strategy = Base62ShortCodeStrategy(length=2, secret=secret)
+    domain = 62**2
+
+    codes = [strategy.generate(URL, id) for id in range(domain)]
+
+    assert all(len(code) == 2 for code in codes)
+    assert sorted(base62_decode(code) for code in codes) == list(range(domain))
+
+
+def test_base62_strategy_scrambles() -> None:
+    strategy = Base62ShortCodeStrategy(length=7, secret="secret")
+    other = Base62ShortCodeStrategy(length=7, secret="other")
+
+    codes = [strategy.generate(URL, id) for id in range(100)]
+
+    assert codes != [base62_encode(id, 7) for id in range(100)]
+    assert codes != [other.generate(URL, id) for id in range(100)]
+    assert codes == [strategy.generate(URL, id) for id in range(100)]
+
+
+def test_base62_strategy_beyond_domain() -> None:
+    strategy = Base62ShortCodeStrategy(length=2, secret="secret")
+
+    code = strategy.generate(URL, 62**2 + 1)
+
+    assert base62_decode(code) == 62**2 + 1
+
+
+@pytest.mark.anyio
+async def test_generate_short_codes_collision(
+    sessionmaker: AsyncSessionMaker,
+    redis: Redis,
+    monkeypatch: pytest.MonkeyPatch,
+    taken: str,
+) -> None:
+    strategy = StubShortCodeStrategy(
+        iter([taken, "fresh-1", "fresh-1", "fresh-2"]), collision_free=False
+    )
+
+    # Taken in the database, then twice in the same batch
+    short_codes = await generate(sessionmaker, redis, monkeypatch, strategy, 2)
+
+    assert short_codes == ["fresh-1", "fresh-2"]
+    assert strategy.generated == 4
+
+
+@pytest.mark.anyio
+async def test_generate_short_codes_max_attempts(
+    sessionmaker: AsyncSessionMaker,
+    redis: Redis,
+    monkeypatch: pytest.MonkeyPatch,
+    taken: str,
+) -> None:
+    strategy = StubShortCodeStrategy(itertools.repeat(taken), collision_free=False)
+
+    with pytest.raises(InternalServerError) as excinfo:
+        await generate(sessionmaker, redis, monkeypatch, strategy)
+
+    assert excinfo.value.message == "Could not generate a unique short code."
+    assert strategy.generated == settings.SHORT_CODE_MAX_ATTEMPTS + 1
+
+
+@pytest.mark.anyio
+async def test_generate_short_codes_collision_free(
+    sessionmaker: AsyncSessionMaker,
+    redis: Redis,
+    monkeypatch: pytest.MonkeyPatch,
+    taken: str,
+) -> None:
+    strategy = StubShortCodeStrategy(itertools.repeat(taken), collision_free=True)
+
+    # Trusted without looking for collisions
+    short_codes = await generate(sessionmaker, redis, monkeypatch, strategy)
+
+    assert short_codes == [taken]
+    assert strategy.generated == 1
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from pyus.kit.rate_limit import Limit, TokenBucketLimiter
+from pyus.redis import Redis
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_refill(redis: Redis) -> None:
+    limiter = TokenBucketLimiter(lease_size=1, lease_ttl=1.0, max_keys=100)
+    limit = Limit(rate=20, burst=2)
+
+    assert await limiter.acquire(redis, "key", limit) is None
+    assert await limiter.acquire(redis, "key", limit) is None
+    retry_after = await limiter.acquire(redis, "key", limit)
+    assert retry_after is not None
+    assert 0 < retry_after <= 0.05
+
+    await asyncio.sleep(retry_after + 0.01)
+
+    assert await limiter.acquire(redis, "key", limit) is None
+    assert await limiter.acquire(redis, "key", limit) is not None
+
+
+async def test_keys(redis: Redis) -> None:
+    limiter = TokenBucketLimiter(lease_size=1, lease_ttl=1.0, max_keys=100)
+    limit = Limit(rate=1, burst=1)
+
+    assert await limiter.acquire(redis, "key", limit) is None
+    assert await limiter.acquire(redis, "key", limit) is not None
+    assert await limiter.acquire(redis, "other", limit) is None
+
+
+async def test_lease(redis: Redis) -> None:
+    limiter = TokenBucketLimiter(lease_size=5, lease_ttl=1.0, max_keys=100)
+    limit = Limit(rate=1, burst=10)
+
+    results = await asyncio.gather(
+        *(limiter.acquire(redis, "key", limit) for _ in range(5))
+    )
+
+    assert results == [None] * 5
+    # Taken from Redis in a single lease
+    assert float(await redis.hget("key", "tokens")) == pytest.approx(5, abs=0.1)
@@ -0,0 +1,28 @@
+from collections.abc import AsyncIterator
+
+import pytest
+
+from pyus.kit.utils import merge_sorted
+
+pytestmark = pytest.mark.anyio
+
+
+async def iterate(*values: int) -> AsyncIterator[int]:
+    for value in values:
+        yield value
+
+
+async def test_merge_sorted() -> None:
+    merged = merge_sorted(
+        [iterate(1, 4, 7), iterate(), iterate(2, 2, 8), iterate(3)], key=lambda v: v
+    )
+
+    assert [value async for value in merged] == [1, 2, 2, 3, 4, 7, 8]
+
+
+async def test_merge_sorted_reverse() -> None:
+    merged = merge_sorted(
+        [iterate(7, 4, 1), iterate(8, 2)], key=lambda v: v, reverse=True
+    )
+
+    assert [value async for value in merged] == [8, 7, 4, 2, 1]
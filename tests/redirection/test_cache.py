@@ -0,0 +1,100 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from pyus.exceptions import ResourceNotFound
+from pyus.redirection.cache import RedirectCache
+from pyus.redis import Redis
+
+pytestmark = pytest.mark.anyio
+
+LOCK = "lock:redirect:abc"
+
+
+@pytest.fixture
+def cache() -> RedirectCache:
+    return RedirectCache(
+        maxsize=100,
+        ttl=60,
+        redis_ttl=3600,
+        channel="invalidations",
+        lock_timeout=5.0,
+        lock_wait=1.0,
+        lock_poll_interval=0.01,
+    )
+
+
+async def release(redis: Redis, original_url: str | None) -> None:
+    """Play another process loading the short code, then releasing its lock."""
+    await asyncio.sleep(0.05)
+    if original_url is not None:
+        await redis.set("abc", original_url)
+    await redis.delete(LOCK)
+
+
+async def test_coalesced(cache: RedirectCache, redis: Redis) -> None:
+    loads = 0
+
+    async def loader() -> tuple[str, datetime | None]:
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return "https://example.com", None
+
+    results = await asyncio.gather(
+        *(cache.get_or_load(redis, "abc", loader) for _ in range(10))
+    )
+
+    assert results == ["https://example.com"] * 10
+    assert loads == 1
+    assert await redis.exists(LOCK) == 0
+
+
+async def test_lock_waiter_cached(cache: RedirectCache, redis: Redis) -> None:
+    async def loader() -> tuple[str, datetime | None]:
+        raise AssertionError("Loaded by the lock holder")
+
+    await redis.set(LOCK, "other")
+    task = asyncio.create_task(release(redis, "https://example.com"))
+
+    assert await cache.get_or_load(redis, "abc", loader) == "https://example.com"
+    await task
+
+
+async def test_lock_waiter_not_found(cache: RedirectCache, redis: Redis) -> None:
+    async def loader() -> tuple[str, datetime | None]:
+        raise ResourceNotFound()
+
+    await redis.set(LOCK, "other")
+    task = asyncio.create_task(release(redis, None))
+    start = time.monotonic()
+
+    with pytest.raises(ResourceNotFound):
+        await cache.get_or_load(redis, "abc", loader)
+
+    # Loaded once the lock is released, without waiting for `lock_wait`
+    assert time.monotonic() - start < cache.lock_wait / 2
+    await task
+
+
+async def test_early_refresh_missed(cache: RedirectCache, redis: Redis) -> None:
+    loads = 0
+
+    async def loader() -> tuple[str, datetime | None]:
+        nonlocal loads
+        loads += 1
+        return "https://example.com", None
+
+    # Close enough to its expiration to always be refreshed
+    cache.early_refresh_beta = 1000.0
+    cache.load_time = 1.0
+    await redis.set("abc", "https://example.org", px=10_000)
+
+    assert await cache.get_entry(redis, "abc") is None
+    original_url = await cache.get_or_load(redis, "abc", loader, missed=True)
+
+    assert original_url == "https://example.com"
+    assert loads == 1
+    assert cache.early_refreshes == 1
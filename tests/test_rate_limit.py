@@ -0,0 +1,100 @@
+import fakeredis
+import pytest
+from starlette.types import Message, Receive, Scope, Send
+
+from pyus.kit.rate_limit import TokenBucketLimiter
+from pyus.rate_limit import RateLimitMiddleware, get_rules
+from pyus.redis import Redis
+
+pytestmark = pytest.mark.anyio
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+@pytest.fixture
+def middleware() -> RateLimitMiddleware:
+    return RateLimitMiddleware(
+        app,
+        rules=get_rules(
+            {"GET /urls/{short_code}": (0.5, 1)},
+            {"POST /urls/": (0.5, 1)},
+        ),
+        api_key_header="X-API-Key",
+        limiter=TokenBucketLimiter(lease_size=1, lease_ttl=1.0, max_keys=100),
+    )
+
+
+async def request(
+    middleware: RateLimitMiddleware,
+    redis: Redis,
+    method: str,
+    path: str,
+    *,
+    ip: str = "127.0.0.1",
+    api_key: bytes | None = None,
+) -> tuple[int, dict[bytes, bytes]]:
+    scope: Scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [] if api_key is None else [(b"x-api-key", api_key)],
+        "client": (ip, 50000),
+        "state": {"rate_limit_redis": redis},
+    }
+    messages: list[Message] = []
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+    start = messages[0]
+    return start["status"], dict(start["headers"])
+
+
+async def test_ip_limit(middleware: RateLimitMiddleware, redis: Redis) -> None:
+    status, _ = await request(middleware, redis, "GET", "/urls/abc")
+    assert status == 200
+
+    status, headers = await request(middleware, redis, "GET", "/urls/def")
+    assert status == 429
+    assert headers[b"retry-after"] == b"2"
+
+    status, _ = await request(middleware, redis, "GET", "/urls/abc", ip="10.0.0.1")
+    assert status == 200
+
+
+async def test_api_key_limit(middleware: RateLimitMiddleware, redis: Redis) -> None:
+    status, _ = await request(middleware, redis, "POST", "/urls/", api_key=b"a")
+    assert status == 200
+
+    status, headers = await request(middleware, redis, "POST", "/urls/", api_key=b"a")
+    assert status == 429
+    assert b"retry-after" in headers
+
+    status, _ = await request(middleware, redis, "POST", "/urls/", api_key=b"b")
+    assert status == 200
+    # Without an API key, only limited per IP, which the rule doesn't do
+    status, _ = await request(middleware, redis, "POST", "/urls/")
+    assert status == 200
+
+
+async def test_unmatched(middleware: RateLimitMiddleware, redis: Redis) -> None:
+    for _ in range(3):
+        status, _ = await request(middleware, redis, "DELETE", "/urls/abc")
+        assert status == 200
+
+
+async def test_redis_down(middleware: RateLimitMiddleware) -> None:
+    server = fakeredis.FakeServer()
+    server.connected = False
+    redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+    for _ in range(3):
+        status, _ = await request(middleware, redis, "GET", "/urls/abc")
+        assert status == 200
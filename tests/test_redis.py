@@ -0,0 +1,75 @@
+import pytest
+from redis import ConnectionError
+from redis.backoff import NoBackoff
+
+from pyus.kit.circuit_breaker import CircuitBreaker
+from pyus.redis import CircuitBreakerRetry, CircuitOpenError
+
+pytestmark = pytest.mark.anyio
+
+
+class Command:
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError()
+        return "value"
+
+
+async def fail(error: Exception) -> None:
+    pass
+
+
+@pytest.fixture
+def retry() -> CircuitBreakerRetry:
+    breaker = CircuitBreaker(
+        "test", failure_threshold=3, probe_interval=1.0, probe_timeout=1.0
+    )
+    return CircuitBreakerRetry(breaker, NoBackoff(), 10, (ConnectionError,))
+
+
+async def test_breaker_opens_and_short_circuits(retry: CircuitBreakerRetry) -> None:
+    failing = Command(failures=100)
+
+    # Retries stop as soon as the breaker trips, before running out
+    with pytest.raises(ConnectionError):
+        await retry.call_with_retry(failing, fail)
+    assert failing.calls == 3
+    assert retry.breaker.is_open
+
+    command = Command(failures=0)
+    with pytest.raises(CircuitOpenError):
+        await retry.call_with_retry(command, fail)
+    assert command.calls == 0
+
+    retry.breaker.close()
+    assert await retry.call_with_retry(command, fail) == "value"
+
+
+async def test_success_resets_failures(retry: CircuitBreakerRetry) -> None:
+    flaky = Command(failures=2)
+
+    assert await retry.call_with_retry(flaky, fail) == "value"
+    assert await retry.call_with_retry(Command(failures=2), fail) == "value"
+
+    assert flaky.calls == 3
+    assert not retry.breaker.is_open
+
+
+async def test_retry_on_error(retry: CircuitBreakerRetry) -> None:
+    class OtherError(Exception):
+        pass
+
+    async def command() -> None:
+        raise OtherError()
+
+    # The client extends the errors to retry on with its `retry_on_error`
+    retry.update_supported_errors([OtherError])
+
+    with pytest.raises(OtherError):
+        await retry.call_with_retry(command, fail)
+    assert retry.breaker.is_open
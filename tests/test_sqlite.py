@@ -0,0 +1,31 @@
+import pytest
+
+from pyus.kit.db.sqlite import AsyncSessionMaker
+from pyus.sqlite import LazySession, SessionStats
+
+pytestmark = pytest.mark.anyio
+
+SCOPE = {"type": "http", "method": "GET"}
+
+
+async def test_session_stats(sessionmaker: AsyncSessionMaker) -> None:
+    stats = SessionStats()
+
+    unused = LazySession(sessionmaker, sessionmaker)
+    await unused.close()
+    stats.record(SCOPE, unused)
+
+    read = LazySession(sessionmaker, sessionmaker)
+    read.get_read()
+    await read.close()
+    stats.record(SCOPE, read)
+
+    detached = LazySession(sessionmaker, sessionmaker)
+    async with detached.open_read():
+        pass
+    await detached.close()
+    stats.record(SCOPE, detached)
+
+    assert stats.total.requests == 3
+    assert stats.total.read_sessions == 2
+    assert stats.total.write_sessions == 0
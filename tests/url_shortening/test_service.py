@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from pyus.kit.db.sqlite import AsyncSession, AsyncSessionMaker, commit
+from pyus.redirection.cache import redirect_cache
+from pyus.redis import Redis
+from pyus.url_shortening.schemas import ShortenedUrlCreate
+from pyus.url_shortening.service import url as url_service
+
+pytestmark = pytest.mark.anyio
+
+
+async def fail(*args: object, **kwargs: object) -> None:
+    raise OperationalError("COMMIT", None, Exception("database is locked"))
+
+
+async def test_create_cached_after_commit(
+    sessionmaker: AsyncSessionMaker, redis: Redis
+) -> None:
+    async with sessionmaker() as session:
+        url = await url_service.create(
+            session,
+            sessionmaker,
+            redis,
+            ShortenedUrlCreate.model_validate({"original_url": "https://example.com"}),
+        )
+        short_code, original_url = url.short_code, url.original_url
+        assert await redis.get(short_code) is None
+
+        await commit(session)
+
+    assert await redis.get(short_code) == original_url
+    assert redirect_cache.local.get(short_code) is not None
+
+
+async def test_create_commit_failure(
+    sessionmaker: AsyncSessionMaker, redis: Redis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async with sessionmaker() as session:
+        url = await url_service.create(
+            session,
+            sessionmaker,
+            redis,
+            ShortenedUrlCreate.model_validate({"original_url": "https://example.com"}),
+        )
+        monkeypatch.setattr(session, "commit", fail)
+
+        with pytest.raises(OperationalError):
+            await commit(session)
+
+    assert await redis.get(url.short_code) is None
+    assert redirect_cache.local.get(url.short_code) is None
+
+
+async def test_create_many_commit_failure(
+    sessionmaker: AsyncSessionMaker, redis: Redis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    session: AsyncSession
+    async with sessionmaker() as session:
+        urls = await url_service.create_many(
+            session,
+            sessionmaker,
+            redis,
+            [
+                ShortenedUrlCreate.model_validate({"original_url": f"https://{i}.com"})
+                for i in range(3)
+            ],
+        )
+        monkeypatch.setattr(session, "commit", fail)
+
+        with pytest.raises(OperationalError):
+            await commit(session)
+
+    for url in urls:
+        assert await redis.get(url.short_code) is None
+        assert redirect_cache.local.get(url.short_code) is None